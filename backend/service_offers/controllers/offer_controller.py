@@ -5,6 +5,7 @@ from typing import List, Optional
 from datetime import datetime
 
 from models.offer import OfferDB, OfferCreate, OfferUpdate, OfferStatus
+from controllers.rag_event_publisher import publish_offer_event
 
 
 def _serialize_keywords(keywords: Optional[List[str]]) -> Optional[str]:
@@ -73,6 +74,7 @@ def create_offer(db: Session, payload: OfferCreate) -> dict:
     db.add(offer)
     db.commit()
     db.refresh(offer)
+    publish_offer_event("created", offer)
     return _offer_to_dict(offer)
 
 
@@ -191,6 +193,7 @@ def update_offer(db: Session, offer_id: int, payload: OfferUpdate, recruiter_use
 
     db.commit()
     db.refresh(offer)
+    publish_offer_event("updated", offer)
     return _offer_to_dict(offer)
 
 
@@ -207,6 +210,7 @@ def publish_offer(db: Session, offer_id: int, recruiter_user_id: Optional[int] =
     offer.date_publication = datetime.utcnow()
     db.commit()
     db.refresh(offer)
+    publish_offer_event("published", offer)
     return _offer_to_dict(offer)
 
 
@@ -222,6 +226,7 @@ def close_offer(db: Session, offer_id: int, recruiter_user_id: Optional[int] = N
     offer.statut = OfferStatus.CLOSED
     db.commit()
     db.refresh(offer)
+    publish_offer_event("closed", offer)
     return _offer_to_dict(offer)
 
 
@@ -238,6 +243,7 @@ def delete_offer(db: Session, offer_id: int, recruiter_user_id: Optional[int] =
             raise HTTPException(status_code=403, detail="Action non autorisée pour cet utilisateur")
     db.delete(offer)
     db.commit()
+    publish_offer_event("deleted", offer_id=offer_id)
     return {"detail": "Offre supprimée"}
 
 
@@ -258,6 +264,8 @@ def decrement_offer_places(db: Session, offer_id: int) -> bool:
         # Plus de places disponibles, fermer l'offre
         offer.statut = OfferStatus.CLOSED
         db.commit()
+        db.refresh(offer)
+        publish_offer_event("closed", offer)
         return True
     
     # Décrémenter les places restantes
@@ -269,5 +277,6 @@ def decrement_offer_places(db: Session, offer_id: int) -> bool:
     
     db.commit()
     db.refresh(offer)
+    publish_offer_event("closed" if offer.statut == OfferStatus.CLOSED else "updated", offer)
     
     return offer.statut == OfferStatus.CLOSED
@@ -0,0 +1,120 @@
+"""
+Publication des changements d'offres vers le service RAG (TalentBot)
+Chaque création / modification / publication / fermeture / suppression
+d'offre est envoyée à POST {RAG_SERVICE_URL}/rag/events, pour que l'offre
+soit recherchable par TalentBot en quelques secondes.
+
+Les événements sont envoyés par un thread d'arrière-plan unique, dans
+l'ordre où ils se sont produits et par lots : une requête n'attend jamais
+le service RAG, et une indisponibilité de celui-ci ne bloque rien. Un lot
+refusé faute de service (erreur de connexion, statut 5xx, 429 : redémarrage
+ou chargement de l'index) est renvoyé avec un délai croissant, les suivants
+attendant derrière lui ; les événements perdus malgré tout (lot rejeté en
+4xx, file pleine, arrêt du service) sont rattrapés par la synchronisation
+des bases que le service RAG lance à chaque chargement de l'index.
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+import requests
+
+from models.offer import OfferDB
+
+RAG_SERVICE_URL = os.getenv("RAG_SERVICE_URL", "http://127.0.0.1:8008")
+RAG_EVENTS_ENABLED = os.getenv("RAG_EVENTS_ENABLED", "true").lower() == "true"
+MAX_EVENTS_PER_REQUEST = 100
+MAX_PENDING_EVENTS = 10000
+RETRY_INITIAL_DELAY = 1  # Secondes avant de renvoyer un lot refusé faute de service
+RETRY_MAX_DELAY = 60
+
+_events: "queue.Queue[dict]" = queue.Queue(maxsize=MAX_PENDING_EVENTS)
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+
+def _offer_record(offer: OfferDB) -> dict:
+    """Ligne de la table offers telle que stockée dans SQLite (même forme que la lecture côté RAG)."""
+    record = {}
+    for column in OfferDB.__table__.columns:
+        value = getattr(offer, column.name)
+        if isinstance(value, Enum):
+            value = value.name  # SQLAlchemy stocke le nom du membre
+        elif isinstance(value, datetime):
+            value = value.strftime("%Y-%m-%d %H:%M:%S.%f")
+        elif isinstance(value, bool):
+            value = int(value)
+        record[column.name] = value
+    return record
+
+
+def _send_batch(batch: list) -> bool:
+    """Envoie un lot ; False s'il faut le renvoyer plus tard (service RAG indisponible)."""
+    try:
+        r = requests.post(f"{RAG_SERVICE_URL}/rag/events", json={"events": batch}, timeout=10)
+    except requests.RequestException as e:
+        print(f"[offers] rag events error ({len(batch)} event(s) kept for retry): {e}")
+        return False
+    except Exception as e:
+        # Never break core flow on RAG failure
+        print(f"[offers] rag events error ({len(batch)} event(s) dropped): {e}")
+        return True
+    if r.status_code >= 500 or r.status_code == 429:
+        print(f"[offers] rag events http_status={r.status_code} ({len(batch)} event(s) kept for retry)")
+        return False
+    if r.status_code >= 400:
+        # Lot invalide : le renvoyer ne changerait rien
+        print(f"[offers] rag events http_status={r.status_code} ({len(batch)} event(s) dropped) detail={r.text[:200]}")
+    return True
+
+
+def _send_loop():
+    while True:
+        batch = [_events.get()]
+        while len(batch) < MAX_EVENTS_PER_REQUEST:
+            try:
+                batch.append(_events.get_nowait())
+            except queue.Empty:
+                break
+        # Le même lot est renvoyé jusqu'à ce que le service RAG l'accepte,
+        # pour conserver l'ordre des événements
+        delay = RETRY_INITIAL_DELAY
+        while not _send_batch(batch):
+            time.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX_DELAY)
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None:
+        return
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_send_loop, name="rag-event-publisher", daemon=True)
+            _worker.start()
+
+
+def publish_offer_event(event: str, offer: Optional[OfferDB] = None, offer_id: Optional[int] = None):
+    """
+    Met en file un événement sur une offre : "created", "updated", "published",
+    "closed" (avec l'offre à jour) ou "deleted" (avec son identifiant).
+    """
+    if not RAG_EVENTS_ENABLED:
+        return
+    payload = {
+        "event": event,
+        "service": "service_offers",
+        "table": "offers",
+        "record_id": offer.id if offer is not None else offer_id,
+        "record": _offer_record(offer) if offer is not None else None,
+    }
+    try:
+        _events.put_nowait(payload)
+    except queue.Full:
+        print(f"[offers] rag events queue full; dropping {event} event for offer {payload['record_id']}")
+        return
+    _ensure_worker()
@@ -1,29 +1,47 @@
 """
 Gestionnaire de conversations avec historique et contexte
 """
-import json
 import os
 import uuid
 from datetime import datetime
-from typing import List, Dict, Optional
-from pathlib import Path
+from typing import Callable, List, Dict, Optional
+
+from database.conversation_store import create_conversation_store
+from utils.conversation_cache import ConversationCache
+from utils.token_counter import count_tokens, truncate_to_tokens
+from utils.locks import AsyncKeyedLock
+
+
+# CONFIGURATION
+CONVERSATION_BACKEND = os.getenv("RAG_CONVERSATION_BACKEND", "json")  # "json" ou "sqlite"
+CONVERSATIONS_DIR = "./conversations"
+CONVERSATIONS_DB = os.getenv("RAG_CONVERSATIONS_DB", "./conversations/conversations.db")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))  # Historique injecté dans le prompt
+SUMMARY_MAX_TOKENS = int(os.getenv("RAG_SUMMARY_MAX_TOKENS", "300"))  # Taille max du résumé glissant
+
+HISTORY_HEADER = "Historique de la conversation précédente :\n"
 
 
 class ConversationManager:
-    """Gère les conversations avec persistance en JSON."""
+    """
+    Gère les conversations avec persistance (JSON ou SQLite, voir database/conversation_store.py).
     
-    def __init__(self, storage_path: str = "./conversations"):
-        self.storage_path = Path(storage_path)
-        self.storage_path.mkdir(exist_ok=True)
-        self.active_conversations = {}  # Cache en mémoire
+    Les écritures d'une conversation se font sous le verrou du stockage
+    (partagé entre workers), à partir d'une copie relue si elle a changé.
+    Une conversation en cache n'est réutilisée que si sa version dans le
+    stockage n'a pas changé depuis sa mise en cache.
+    """
     
-    def _get_conversation_file(self, conversation_id: str) -> Path:
-        """Retourne le chemin du fichier de conversation."""
-        return self.storage_path / f"{conversation_id}.json"
-    
-    def _get_user_index_file(self, user_id: str) -> Path:
-        """Retourne le chemin du fichier d'index utilisateur."""
-        return self.storage_path / f"user_{user_id}_index.json"
+    def __init__(
+        self,
+        storage_path: str = CONVERSATIONS_DIR,
+        backend: str = CONVERSATION_BACKEND,
+        db_path: str = CONVERSATIONS_DB
+    ):
+        self.store = create_conversation_store(backend, storage_path, db_path)
+        self.active_conversations = ConversationCache()  # Cache LRU borné en mémoire
+        self.turn_locks = AsyncKeyedLock()  # Un tour de conversation à la fois (dans ce worker)
+        self._stale_reloads = 0
     
     def create_conversation(self, user_id: Optional[str] = None, title: str = "Nouvelle conversation") -> str:
         """Crée une nouvelle conversation."""
@@ -39,60 +57,68 @@ class ConversationManager:
             "is_active": True
         }
         
-        # Sauvegarder la conversation
-        self._save_conversation(conversation)
+        # Sauvegarder la conversation (et l'index utilisateur)
+        self.store.create_conversation(conversation)
         
         # Mettre en cache
-        self.active_conversations[conversation_id] = conversation
-        
-        # Mettre à jour l'index utilisateur
-        if user_id:
-            self._update_user_index(user_id, conversation_id)
+        self._cache_conversation(conversation)
         
         print(f"✅ Conversation créée: {conversation_id}")
         return conversation_id
     
     def add_message(self, conversation_id: str, role: str, content: str, sources: List[dict] = None):
         """Ajoute un message à une conversation."""
-        conversation = self.get_conversation(conversation_id)
-        
-        if not conversation:
-            raise ValueError(f"Conversation {conversation_id} introuvable")
-        
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-            "sources": sources or []
-        }
-        
-        conversation["messages"].append(message)
-        conversation["updated_at"] = datetime.now().isoformat()
-        
-        # Générer un titre automatique pour la première question
-        if len(conversation["messages"]) == 1 and role == "user":
-            conversation["title"] = content[:50] + ("..." if len(content) > 50 else "")
-        
-        self._save_conversation(conversation)
-        self.active_conversations[conversation_id] = conversation
+        with self.store.lock(conversation_id):
+            conversation = self.get_conversation(conversation_id)
+            
+            if not conversation:
+                raise ValueError(f"Conversation {conversation_id} introuvable")
+            
+            message = {
+                "role": role,
+                "content": content,
+                "timestamp": datetime.now().isoformat(),
+                "sources": sources or []
+            }
+            
+            conversation["messages"].append(message)
+            conversation["updated_at"] = datetime.now().isoformat()
+            
+            # Générer un titre automatique pour la première question
+            if len(conversation["messages"]) == 1 and role == "user":
+                conversation["title"] = content[:50] + ("..." if len(content) > 50 else "")
+            
+            self.store.append_message(conversation, message)
+            self._cache_conversation(conversation)
         
         return message
     
     def get_conversation(self, conversation_id: str) -> Optional[Dict]:
-        """Récupère une conversation."""
+        """Récupère une conversation (relue si un autre worker l'a modifiée)."""
+        version = self.store.get_version(conversation_id)
+        if version is None:
+            self.active_conversations.pop(conversation_id)
+            return None
+        
         # Vérifier le cache
-        if conversation_id in self.active_conversations:
-            return self.active_conversations[conversation_id]
-        
-        # Charger depuis le fichier
-        file_path = self._get_conversation_file(conversation_id)
-        if file_path.exists():
-            with open(file_path, 'r', encoding='utf-8') as f:
-                conversation = json.load(f)
-                self.active_conversations[conversation_id] = conversation
+        conversation, cached_version = self.active_conversations.get_with_version(conversation_id)
+        if conversation is not None:
+            if cached_version == version:
                 return conversation
+            self._stale_reloads += 1
+        
+        # Charger depuis le stockage (la version est lue avant : une écriture
+        # concurrente provoquera au pire une relecture supplémentaire)
+        conversation = self.store.load_conversation(conversation_id)
+        if conversation:
+            self.active_conversations.put(conversation_id, conversation, version)
         
-        return None
+        return conversation
+    
+    def _cache_conversation(self, conversation: Dict):
+        """Met en cache une conversation qui vient d'être écrite (verrou détenu)."""
+        conversation_id = conversation["conversation_id"]
+        self.active_conversations.put(conversation_id, conversation, self.store.get_version(conversation_id))
     
     def get_conversation_history(self, conversation_id: str, limit: int = None) -> List[Dict]:
         """Récupère l'historique d'une conversation."""
@@ -105,108 +131,163 @@ class ConversationManager:
             return messages[-limit:]
         return messages
     
-    def get_user_conversations(self, user_id: str, limit: int = None) -> List[Dict]:
-        """Récupère toutes les conversations d'un utilisateur."""
-        index_file = self._get_user_index_file(user_id)
+    def get_messages_page(self, conversation_id: str, before: Optional[int] = None, limit: int = 20) -> Optional[Dict]:
+        """
+        Page de messages précédant l'indice `before` (par défaut : la fin de la conversation).
         
-        if not index_file.exists():
-            return []
+        Retourne None si la conversation n'existe pas.
+        """
+        conversation = self.get_conversation(conversation_id)
+        if not conversation:
+            return None
         
-        with open(index_file, 'r', encoding='utf-8') as f:
-            index = json.load(f)
-        
-        conversations = []
-        for conv_id in index.get("conversation_ids", []):
-            conv = self.get_conversation(conv_id)
-            if conv:
-                # Retourner seulement les métadonnées
-                conversations.append({
-                    "conversation_id": conv["conversation_id"],
-                    "title": conv["title"],
-                    "created_at": conv["created_at"],
-                    "updated_at": conv["updated_at"],
-                    "message_count": len(conv.get("messages", [])),
-                    "is_active": conv.get("is_active", True)
-                })
-        
-        # Trier par date de mise à jour (plus récent en premier)
-        conversations.sort(key=lambda x: x["updated_at"], reverse=True)
+        messages = conversation.get("messages", [])
+        end = len(messages) if before is None else max(0, min(before, len(messages)))
+        start = max(0, end - max(1, limit))
         
-        if limit:
-            return conversations[:limit]
-        return conversations
+        return {
+            "conversation_id": conversation_id,
+            "messages": messages[start:end],
+            "start_index": start,
+            "total": len(messages),
+            "has_more": start > 0
+        }
+    
+    def get_user_conversations(self, user_id: str, limit: int = None) -> List[Dict]:
+        """Récupère les métadonnées des conversations d'un utilisateur (plus récentes en premier)."""
+        return self.store.list_user_conversations(user_id, limit=limit)
+    
+    def get_user_conversations_page(self, user_id: str, limit: int = 20, cursor: Optional[str] = None) -> Dict:
+        """
+        Page de métadonnées des conversations d'un utilisateur.
+        
+        Retourne `conversations` et `next_cursor` (à repasser pour obtenir la page suivante).
+        Lève ValueError si le curseur est invalide.
+        """
+        return self.store.page_user_conversations(user_id, limit=limit, cursor=cursor)
     
     def delete_conversation(self, conversation_id: str) -> bool:
         """Supprime une conversation."""
-        file_path = self._get_conversation_file(conversation_id)
-        
-        if file_path.exists():
+        if self.store.exists(conversation_id):
             # Marquer comme inactive au lieu de supprimer
-            conversation = self.get_conversation(conversation_id)
-            if conversation:
-                conversation["is_active"] = False
-                self._save_conversation(conversation)
-            
-            # Retirer du cache
-            if conversation_id in self.active_conversations:
-                del self.active_conversations[conversation_id]
+            with self.store.lock(conversation_id):
+                conversation = self.get_conversation(conversation_id)
+                if conversation:
+                    conversation["is_active"] = False
+                    self.store.save_conversation(conversation)
+                
+                # Retirer du cache
+                self.active_conversations.pop(conversation_id)
             
             print(f"✅ Conversation {conversation_id} marquée comme inactive")
             return True
         
         return False
     
-    def build_context_from_history(self, conversation_id: str, max_messages: int = 10) -> str:
-        """Construit un contexte à partir de l'historique de conversation."""
-        messages = self.get_conversation_history(conversation_id, limit=max_messages)
+    def build_context_from_history(
+        self,
+        conversation_id: str,
+        max_messages: int = 10,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        model_name: str = "",
+        summarizer: Optional[Callable[[str, List[Dict]], str]] = None
+    ) -> str:
+        """
+        Construit un contexte à partir de l'historique de conversation.
         
-        if not messages:
+        Les messages les plus récents sont repris tels quels tant qu'ils tiennent
+        dans `token_budget` (comptés avec le tokenizer de `model_name`). Les plus
+        anciens sont remplacés par un résumé glissant, enregistré dans la
+        conversation : `summarizer(résumé_précédent, messages)` n'est appelé que
+        pour les messages qui viennent de sortir de la fenêtre. Le dernier
+        message (la question en cours) est toujours repris, tronqué s'il
+        dépasse à lui seul le budget, et n'entre jamais dans le résumé.
+        """
+        conversation = self.get_conversation(conversation_id)
+        if not conversation or not conversation.get("messages"):
             return ""
         
-        context_parts = ["Historique de la conversation précédente :\n"]
+        messages = conversation["messages"]
+        lines = [self._format_message(msg) for msg in messages]
+        budget = token_budget - count_tokens(HISTORY_HEADER, model_name)
         
-        for msg in messages:
-            role = "Utilisateur" if msg["role"] == "user" else "Assistant"
-            content = msg["content"]
-            context_parts.append(f"{role}: {content}\n")
+        start = self._select_window(lines, budget, max_messages, model_name)
+        if start > 0:
+            # Réserver la place du résumé des messages plus anciens
+            start = self._select_window(lines, budget - SUMMARY_MAX_TOKENS, max_messages, model_name)
         
-        return "\n".join(context_parts)
-    
-    def _save_conversation(self, conversation: Dict):
-        """Sauvegarde une conversation sur disque."""
-        file_path = self._get_conversation_file(conversation["conversation_id"])
+        summary = conversation.get("summary") or {}
+        covered_until = summary.get("covered_until", 0)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(conversation, f, ensure_ascii=False, indent=2)
-    
-    def _update_user_index(self, user_id: str, conversation_id: str):
-        """Met à jour l'index des conversations d'un utilisateur."""
-        index_file = self._get_user_index_file(user_id)
-        
-        if index_file.exists():
-            with open(index_file, 'r', encoding='utf-8') as f:
-                index = json.load(f)
-        else:
-            index = {
-                "user_id": user_id,
-                "conversation_ids": []
-            }
+        if start > covered_until and summarizer is not None:
+            try:
+                # Appel au LLM hors verrou ; seul l'enregistrement est sérialisé
+                text = summarizer(summary.get("text", ""), messages[covered_until:start])
+                summary = {
+                    "text": truncate_to_tokens(text.strip(), SUMMARY_MAX_TOKENS, model_name),
+                    "covered_until": start
+                }
+                with self.store.lock(conversation_id):
+                    latest = self.get_conversation(conversation_id)
+                    current = (latest or {}).get("summary") or {}
+                    if latest and current.get("covered_until", 0) < start:
+                        latest["summary"] = summary
+                        self.store.save_summary(latest)
+                        self._cache_conversation(latest)
+            except Exception as e:
+                print(f"⚠️ Résumé de la conversation {conversation_id} non mis à jour: {e}")
         
-        if conversation_id not in index["conversation_ids"]:
-            index["conversation_ids"].append(conversation_id)
+        # Les messages déjà couverts par le résumé ne sont pas répétés (sauf le dernier)
+        start = min(max(start, summary.get("covered_until", 0)), len(messages) - 1)
         
-        with open(index_file, 'w', encoding='utf-8') as f:
-            json.dump(index, f, ensure_ascii=False, indent=2)
+        recent = lines[start:]
+        if len(recent) == 1:
+            # Seul message de la fenêtre : il peut dépasser le budget à lui seul
+            window_budget = budget - (SUMMARY_MAX_TOKENS if summary.get("text") else 0)
+            recent = [truncate_to_tokens(recent[0], max(window_budget, 0), model_name)]
+        
+        context_parts = [HISTORY_HEADER]
+        if summary.get("text"):
+            context_parts.append(f"Résumé des échanges précédents : {summary['text']}\n")
+        context_parts.extend(recent)
+        
+        return "\n".join(context_parts)
+    
+    @staticmethod
+    def _format_message(msg: Dict) -> str:
+        role = "Utilisateur" if msg["role"] == "user" else "Assistant"
+        return f"{role}: {msg['content']}\n"
+    
+    @staticmethod
+    def _select_window(lines: List[str], budget: int, max_messages: int, model_name: str) -> int:
+        """
+        Indice du plus ancien message de la fenêtre récente tenant dans le budget.
+
+        Le dernier message fait toujours partie de la fenêtre, même s'il dépasse le budget.
+        """
+        start = len(lines)
+        used = 0
+        while start > 0 and len(lines) - start < max_messages:
+            tokens = count_tokens(lines[start - 1], model_name)
+            if used + tokens > budget and start < len(lines):
+                break
+            used += tokens
+            start -= 1
+        return start
     
     def get_statistics(self) -> Dict:
         """Retourne les statistiques des conversations."""
-        total_conversations = len(list(self.storage_path.glob("*.json"))) - len(list(self.storage_path.glob("user_*_index.json")))
-        active_conversations = len(self.active_conversations)
+        total_conversations = self.store.count_conversations()
+        cache_stats = self.active_conversations.get_stats()
         
         return {
             "total_conversations": total_conversations,
-            "active_in_memory": active_conversations,
-            "storage_path": str(self.storage_path)
+            "active_in_memory": cache_stats["size"],
+            "memory_cache": cache_stats,
+            "stale_reloads": self._stale_reloads,
+            "turns_in_progress": len(self.turn_locks),
+            "storage_backend": self.store.backend,
+            "storage_path": self.store.describe()
         }
 
 
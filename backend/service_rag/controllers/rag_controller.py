@@ -2,30 +2,121 @@
 Contrôleur pour les opérations RAG (Retrieval-Augmented Generation)
 Avec support des conversations et historique
 """
+import asyncio
+import itertools
+import json
+import logging
 import os
-import shutil
-from typing import List
+import threading
+import time
+from contextlib import aclosing
+from typing import Any, Dict, List, Optional
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
 from llama_index.core import (
     VectorStoreIndex,
-    SimpleDirectoryReader,
     load_index_from_storage,
     StorageContext
 )
+from llama_index.core.indices.utils import embed_nodes
+from llama_index.core.ingestion import run_transformations
 from llama_index.core.prompts import PromptTemplate
-from llama_index.llms.openai import OpenAI
-from llama_index.llms.ollama import Ollama
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+from llama_index.core.vector_stores import (
+    SimpleVectorStore,
+    MetadataFilters,
+    MetadataFilter,
+    FilterOperator,
+    VectorStoreQuery
+)
 
-from models.rag_models import QueryRequest, QueryResponse, SourceInfo
+from models.rag_models import (
+    QueryRequest,
+    QueryResponse,
+    BatchQueryRequest,
+    BatchQueryItem,
+    BatchQueryResponse,
+    SourceInfo,
+    RetrieveRequest,
+    RetrieveResponse,
+    RetrievedNode,
+    RecordEvent
+)
 from models.conversation_models import QueryWithContext, ConversationResponse
-from controllers.conversation_manager import conversation_manager
+from controllers.conversation_manager import conversation_manager, SUMMARY_MAX_TOKENS
+from utils.query_executor import query_executor
+from utils.model_pool import ModelPool
+from utils.semantic_cache import semantic_cache, normalize_question
+from utils.single_flight import SingleFlight
+from utils.locks import ReadWriteLock, FileLock
+from utils.index_manifest import (
+    load_manifest,
+    save_manifest,
+    build_manifest,
+    group_doc_ids_by_file
+)
+from utils.index_storage import (
+    has_index,
+    get_active_dir,
+    LOCK_FILE,
+    new_build_dir,
+    copy_index_files,
+    activate_dir,
+    discard_build_dir
+)
+from utils.index_journal import (
+    append_journal,
+    read_journal,
+    journal_size,
+    journal_file_size,
+    EVENTS_JOURNAL_MAX
+)
+from utils.reindex_jobs import reindex_jobs
+from utils.mmap_vector_store import MmapVectorStore
+from utils.sharded_vector_store import (
+    ShardedVectorStore,
+    SHARDS,
+    SHARDS_ENABLED,
+    SHARD_BY_SERVICE,
+    DEFAULT_SHARD,
+    shard_for
+)
+from utils.db_sync import (
+    DB_SOURCES,
+    iter_database_changes,
+    record_event_change,
+    load_database_documents,
+    load_sync_state,
+    save_sync_state,
+    normalize_metadata_value,
+    RecordNodeParser
+)
+from utils.query_filters import infer_metadata_filters
+from utils.shard_router import route_shards, validate_shards
+from utils.document_cache import parsed_documents
+from utils.record_events import RecordEventBuffer, EVENTS_BATCH_WINDOW, EVENTS_BATCH_SIZE
+from utils.offline_backends import (
+    HashEmbedding,
+    create_offline_llm,
+    OFFLINE_LLM_MODELS,
+    HASH_EMBEDDING_DIM
+)
+
+
+logger = logging.getLogger("service_rag")
 
 
 # CONSTANTES
-PERSIST_DIR = "./storage"
+PERSIST_DIR = "./storage"  # Racine des versions de l'index (voir utils/index_storage.py)
 DATA_DIR = "./data"
+VECTOR_STORE_BACKEND = os.getenv("RAG_VECTOR_STORE", "simple")  # "simple" (JSON) ou "mmap"
+EMBEDDING_BACKEND = os.getenv("RAG_EMBEDDING_BACKEND", "openai")  # "openai", "ollama" ou "offline" (tests, benchmarks)
+DB_SYNC_INTERVAL = float(os.getenv("RAG_DB_SYNC_INTERVAL", "0"))  # Secondes entre deux synchronisations des bases (0 = seulement au chargement de l'index)
+BATCH_MAX_QUESTIONS = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "100"))  # Questions par appel à /query/batch
+BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "4"))  # Générations simultanées max pour un lot
+EVENTS_MAX_RETRY_DELAY = 60  # Secondes max entre deux tentatives d'application d'un lot d'événements
+INDEX_REFRESH_INTERVAL = float(os.getenv("RAG_INDEX_REFRESH_INTERVAL", "2"))  # Secondes entre deux vérifications de la version active (plusieurs workers ; 0 = désactivé)
 
 # PROMPT PERSONNALISÉ AVEC CONTEXTE DE CONVERSATION
 TEXT_QR_TEMPLATE_STR = (
@@ -39,7 +130,30 @@ TEXT_QR_TEMPLATE_STR = (
     "Réponse:"
 )
 
-TEXT_QR_TEMPLATE = PromptTemplate(TEXT_QR_TEMPLATE_STR)
+TEXT_QR_TEMPLATE = PromptTemplate(TEXT_QR_TEMPLATE_STR).partial_format(conversation_context="")
+
+# Découpage des documents : un nœud par enregistrement de base, découpeur par défaut pour les fichiers
+INDEX_TRANSFORMATIONS = [RecordNodeParser()]
+
+# RÉSUMÉ GLISSANT DES ANCIENS ÉCHANGES D'UNE CONVERSATION
+SUMMARY_PROMPT_STR = (
+    "Résume la conversation ci-dessous entre un utilisateur et TalentBot en moins de {max_words} mots.\n"
+    "Conserve les faits, noms, critères et demandes utiles pour la suite de l'échange.\n\n"
+    "Résumé précédent : {previous_summary}\n\n"
+    "Nouveaux échanges :\n{messages}\n\n"
+    "Résumé :"
+)
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Formate un événement Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _scope_uses_shard(scope: str, shard: str) -> bool:
+    """Vrai si les réponses de cette portée du cache ont pu interroger ce domaine (sans domaines : tout l'index)."""
+    _, _, shards = scope.partition("|shards=")
+    return not shards or shard in shards.split(",")
 
 
 class RAGController:
@@ -47,10 +161,39 @@ class RAGController:
     
     def __init__(self):
         self.index = None
+        self.embed_model = None
+        # Version de l'index chargée par ce worker et lots de son journal déjà appliqués
+        self.index_dir = None
+        self._journal_applied = 0
+        self._journal_bytes = 0
+        # Tâches qui modifient le stockage de l'index, sérialisées entre workers uvicorn
+        self.storage_lock = FileLock(os.path.join(PERSIST_DIR, LOCK_FILE))
+        self._refresh_task = None
+        # Écritures en place sur l'index courant (événements) / recherches en cours
+        self.index_lock = ReadWriteLock()
+        self.model_pool = ModelPool(self.create_llm, self.index_lock)
+        self._reindex_task = None
+        self._db_sync_task = None
+        self.record_events = RecordEventBuffer()
+        self._events_task = None
+        self.inflight_queries = SingleFlight()
+        self._init_task = None
+        self.startup = {
+            "status": "pending",  # pending, loading, ready ou failed
+            "error": None,
+            "duration_seconds": None
+        }
     
     def get_llm(self, model_type: str, model_name: str):
-        """Crée et retourne le LLM selon le type et le nom du modèle."""
+        """Retourne le LLM partagé pour ce type et ce nom de modèle."""
+        return self.model_pool.get_llm(model_type, model_name)
+    
+    def create_llm(self, model_type: str, model_name: str):
+        """Crée un nouveau LLM selon le type et le nom du modèle."""
+        # Les clients sont importés à la première utilisation de leur backend
+        # (le démarrage ne charge pas OpenAI, Ollama ni HuggingFace s'ils ne servent pas)
         if model_type == "openai":
+            from llama_index.llms.openai import OpenAI
             llm = OpenAI(
                 model=model_name,
                 temperature=0.1,
@@ -58,6 +201,7 @@ class RAGController:
             )
             print(f"✅ LLM OpenAI {model_name} créé avec succès.")
         elif model_type == "ollama":
+            from llama_index.llms.ollama import Ollama
             llm = Ollama(
                 model=model_name,
                 base_url="http://localhost:11434",
@@ -65,6 +209,9 @@ class RAGController:
                 request_timeout=120.0
             )
             print(f"✅ LLM Ollama {model_name} créé avec succès.")
+        elif model_type == "offline":
+            llm = create_offline_llm(model_name)
+            print(f"✅ LLM hors ligne {model_name} créé avec succès.")
         else:
             raise ValueError(f"Type de modèle inconnu: {model_type}")
         
@@ -73,79 +220,336 @@ class RAGController:
     def get_embedding_model(self, model_type: str):
         """Crée et retourne le modèle d'embedding selon le type choisi."""
         if model_type == "openai":
+            from llama_index.embeddings.openai import OpenAIEmbedding
             embedding_model = OpenAIEmbedding(
                 model="text-embedding-3-small",
                 embed_batch_size=100
             )
             print("✅ Modèle d'embedding OpenAI configuré avec succès.")
         elif model_type == "ollama":
+            from llama_index.embeddings.huggingface import HuggingFaceEmbedding
             embedding_model = HuggingFaceEmbedding(
                 model_name="BAAI/bge-small-en-v1.5"
             )
             print("✅ Modèle d'embedding HuggingFace configuré avec succès.")
+        elif model_type == "offline":
+            embedding_model = HashEmbedding()
+            print("✅ Modèle d'embedding hors ligne (hachage) configuré avec succès.")
         else:
             raise ValueError(f"Type d'embedding inconnu: {model_type}")
         
         return embedding_model
     
+    def start_initialization(self):
+        """
+        Lance le chargement (ou la construction) de l'index en arrière-plan.
+        
+        Le serveur accepte les connexions immédiatement : /rag/health répond
+        pendant le chargement et /rag/ready indique quand l'index est utilisable.
+        """
+        if self._init_task is None:
+            self._init_task = asyncio.create_task(self.initialize_index())
+    
     async def initialize_index(self):
-        """Initialise l'index au démarrage de l'application."""
+        """Initialise l'index au démarrage de l'application (dans un thread dédié)."""
         print("🚀 Démarrage de l'application et initialisation de l'index...")
-
-        embedding_model = self.get_embedding_model("openai")  # Par défaut OpenAI
+        self.startup.update(status="loading", error=None)
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(self._initialize_index)
+        except Exception as e:
+            print(f"❌ Erreur lors de l'initialisation de l'index: {str(e)}")
+            self.startup.update(status="failed", error=str(e))
+            return
+        finally:
+            self.startup["duration_seconds"] = round(time.monotonic() - started, 3)
+        
+        # Rattraper les changements des bases survenus pendant l'arrêt ou le
+        # chargement (événements que les services n'ont pas pu publier)
+        try:
+            await self.reindex_documents("db")
+        except HTTPException as e:
+            logger.debug("Synchronisation des bases au démarrage reportée: %s", e.detail)
+    
+    def _initialize_index(self):
+        """Charge l'index persistant, ou le construit à partir des documents."""
+        embedding_model = self.get_embedding_model(EMBEDDING_BACKEND)
 
         # Créer les répertoires s'ils n'existent pas
         os.makedirs(PERSIST_DIR, exist_ok=True)
         os.makedirs(DATA_DIR, exist_ok=True)
 
-        # Vérifier si l'index existe déjà (docstore.json)
-        docstore_path = os.path.join(PERSIST_DIR, "docstore.json")
-        
-        if not os.path.exists(docstore_path):
-            # Si le répertoire n'existe pas, créer les indices
-            print("📚 Création des indices à partir des documents...")
-            
-            # Charger les documents
-            documents = SimpleDirectoryReader(
-                DATA_DIR,
-                filename_as_id=True
-            ).load_data()
-            
-            if len(documents) == 0:
-                print(f"⚠️ Aucun document trouvé dans le dossier {DATA_DIR}.")
-                print("📝 Création d'un index vide...")
-                # Créer un index vide
-                self.index = VectorStoreIndex.from_documents(
-                    [],
-                    embed_model=embedding_model
-                )
-            else:
-                print(f"📄 {len(documents)} document(s) chargé(s)")
-                # Créer l'index vectoriel
-                self.index = VectorStoreIndex.from_documents(
-                    documents,
-                    embed_model=embedding_model,
-                    show_progress=True
-                )
-            
-            # Sauvegarder l'index
-            self.index.storage_context.persist(persist_dir=PERSIST_DIR)
-            print(f"✅ Index créé et sauvegardé dans {PERSIST_DIR}")
+        # Vérifier si l'index existe déjà (docstore.json de la version active) ;
+        # un seul worker le construit, les autres attendent puis le chargent
+        with self.storage_lock:
+            if not has_index(get_active_dir(PERSIST_DIR)):
+                self._build_initial_index(embedding_model)
         
-        else:
+        if self.index is None:
             # Charger l'index existant
             print("📂 Chargement de l'index depuis le stockage persistant...")
-            storage_context = StorageContext.from_defaults(persist_dir=PERSIST_DIR)
-            
-            self.index = load_index_from_storage(
-                storage_context,
-                embed_model=embedding_model
-            )
-            
+            self._load_active_index(embedding_model)
             print("✅ Index chargé avec succès")
         
+        self.startup["status"] = "ready"
         print("✨ Application démarrée avec succès!")
     
+    def _build_initial_index(self, embedding_model):
+        """Construit la première version de l'index à partir des documents et des bases."""
+        print("📚 Création des indices à partir des documents...")
+        
+        # Charger les documents (fichiers de ./data et enregistrements des bases)
+        file_hashes = parsed_documents.scan_data_dir(DATA_DIR)
+        file_documents = parsed_documents.load_documents(DATA_DIR, list(file_hashes), file_hashes)
+        db_state = {"tables": {}}
+        documents = file_documents + load_database_documents(db_state)
+        
+        if len(documents) == 0:
+            print(f"⚠️ Aucun document trouvé dans le dossier {DATA_DIR}.")
+            print("📝 Création d'un index vide...")
+            # Créer un index vide
+            index = VectorStoreIndex.from_documents(
+                [],
+                embed_model=embedding_model,
+                storage_context=self._new_storage_context(),
+                transformations=INDEX_TRANSFORMATIONS
+            )
+        else:
+            print(f"📄 {len(documents)} document(s) chargé(s)")
+            # Créer l'index vectoriel
+            index = VectorStoreIndex.from_documents(
+                documents,
+                embed_model=embedding_model,
+                storage_context=self._new_storage_context(),
+                transformations=INDEX_TRANSFORMATIONS,
+                show_progress=True
+            )
+        
+        # Sauvegarder l'index, le manifeste des fichiers et l'état de synchronisation des bases
+        build_dir = new_build_dir(PERSIST_DIR)
+        index.storage_context.persist(persist_dir=build_dir)
+        save_manifest(build_dir, build_manifest(file_hashes, file_documents))
+        save_sync_state(build_dir, db_state)
+        activate_dir(PERSIST_DIR, build_dir)
+        print(f"✅ Index créé et sauvegardé dans {build_dir}")
+        
+        self._swap_index(index, embedding_model, build_dir)
+    
+    def _load_active_index(self, embedding_model):
+        """
+        Charge la version active de l'index (journal compris) et la met en service.
+        
+        Si un autre worker active une nouvelle version pendant le chargement,
+        les fichiers lus ont pu être supprimés : le chargement reprend sur la
+        nouvelle version.
+        """
+        while True:
+            active_dir = get_active_dir(PERSIST_DIR)
+            # Taille lue avant le journal : un lot ajouté pendant le chargement sera rejoué ensuite
+            journal_bytes = journal_file_size(active_dir)
+            try:
+                index = self._load_index(active_dir, embedding_model)
+                replayed = self._replay_journal(active_dir, index)
+            except Exception:
+                if get_active_dir(PERSIST_DIR) == active_dir:
+                    raise
+                continue
+            self._swap_index(index, embedding_model, active_dir)
+            self._journal_applied = len(replayed)
+            self._journal_bytes = journal_bytes
+            return
+    
+    def _new_storage_context(self) -> StorageContext:
+        """Crée un stockage vide avec le vector store configuré (RAG_VECTOR_STORE, RAG_INDEX_SHARDS)."""
+        if SHARDS_ENABLED:
+            return StorageContext.from_defaults(vector_store=ShardedVectorStore(backend=VECTOR_STORE_BACKEND))
+        if VECTOR_STORE_BACKEND == "mmap":
+            return StorageContext.from_defaults(vector_store=MmapVectorStore())
+        return StorageContext.from_defaults()
+    
+    def _load_vector_store(self, persist_dir: str):
+        """
+        Ouvre le vector store persistant d'un répertoire.
+        
+        Retourne None pour laisser StorageContext charger le store JSON par défaut.
+        Un index JSON existant est converti lorsque le backend "mmap" est configuré,
+        un index non partitionné est réparti par domaine avec RAG_INDEX_SHARDS.
+        """
+        if ShardedVectorStore.exists(persist_dir):
+            return ShardedVectorStore.from_persist_dir(persist_dir, VECTOR_STORE_BACKEND)
+        if SHARDS_ENABLED:
+            print("🔁 Répartition du vector store par domaine...")
+            if MmapVectorStore.exists(persist_dir):
+                vector_store = MmapVectorStore.from_persist_dir(persist_dir)
+            else:
+                vector_store = SimpleVectorStore.from_persist_dir(persist_dir)
+            return ShardedVectorStore.from_vector_store(vector_store, VECTOR_STORE_BACKEND)
+        if MmapVectorStore.exists(persist_dir):
+            return MmapVectorStore.from_persist_dir(persist_dir)
+        if VECTOR_STORE_BACKEND == "mmap":
+            print("🔁 Conversion du vector store JSON vers le format mmap...")
+            return MmapVectorStore.from_simple_vector_store(
+                SimpleVectorStore.from_persist_dir(persist_dir)
+            )
+        return None
+    
+    def _load_index(self, persist_dir: str, embedding_model):
+        """Charge un index persistant depuis un répertoire."""
+        storage_context = StorageContext.from_defaults(
+            persist_dir=persist_dir,
+            vector_store=self._load_vector_store(persist_dir)
+        )
+        return load_index_from_storage(
+            storage_context,
+            embed_model=embedding_model,
+            transformations=INDEX_TRANSFORMATIONS
+        )
+    
+    def _copy_active_index(self, active_dir: str, build_dir: str):
+        """
+        Copie l'index actif dans `build_dir` et le charge, journal des
+        événements compris : la nouvelle version intègre les changements
+        appliqués en place et repart sans journal.
+        """
+        copy_index_files(active_dir, build_dir)
+        index = self._load_index(build_dir, self.embed_model)
+        if self._replay_journal(active_dir, index):
+            save_sync_state(build_dir, self._load_sync_state(active_dir))
+        return index
+    
+    def _load_sync_state(self, active_dir: str) -> Dict:
+        """État de synchronisation de la version active, événements du journal compris."""
+        state = load_sync_state(active_dir)
+        for entry in read_journal(active_dir):
+            for event in entry["events"]:
+                record_event_change(state, event)
+        return state
+    
+    def _replay_journal(self, persist_dir: str, index, start: int = 0) -> List[Dict]:
+        """Rejoue sur `index` les lots du journal à partir du n° `start` (embeddings enregistrés) ; retourne ces lots."""
+        entries = read_journal(persist_dir)[start:]
+        for entry in entries:
+            self._commit_record_changes(
+                index,
+                entry["deleted"],
+                [json_to_doc(node) for node in entry["nodes"]],
+                entry["hashes"]
+            )
+        if entries:
+            print(f"📜 {len(entries)} lot(s) d'événements rejoué(s) depuis le journal")
+        return entries
+    
+    def _extract_sources(self, response) -> List[dict]:
+        """Extrait les sources (avec métadonnées) d'une réponse du query engine."""
+        sources = []
+        if hasattr(response, 'source_nodes'):
+            for i, node in enumerate(response.source_nodes):
+                metadata = node.node.metadata if hasattr(node.node, 'metadata') else {}
+                
+                sources.append({
+                    "index": i,
+                    "score": float(node.score) if hasattr(node, 'score') else None,
+                    "text": node.text[:300] + "..." if len(node.text) > 300 else node.text,
+                    "document_name": metadata.get("file_name", "Inconnu"),
+                    "page_number": metadata.get("page_number", None)
+                })
+        return sources
+    
+    async def _lookup_cached_answer(self, question: str, scope: str):
+        """
+        Cherche une réponse dans le cache sémantique.
+        
+        Retourne (entrée ou None, question normalisée, embedding). L'embedding
+        n'est calculé que si la question exacte n'est pas déjà en cache ; il est
+        renvoyé pour la recherche (voir `_query_bundle`) et la mise en cache de
+        la nouvelle réponse.
+        """
+        normalized = normalize_question(question)
+        if not semantic_cache.enabled or self.embed_model is None:
+            return None, normalized, None
+        
+        cached = semantic_cache.get_exact(normalized, scope)
+        if cached is not None:
+            return cached, normalized, None
+        
+        embedding = await query_executor.run(
+            "embedding",
+            self.embed_model.get_query_embedding,
+            normalized
+        )
+        return semantic_cache.get_similar(embedding, scope), normalized, embedding
+    
+    def _query_bundle(self, question: str, embedding: Optional[List[float]]) -> QueryBundle:
+        """Question à rechercher, avec l'embedding déjà calculé pour le cache (pas de second appel au modèle)."""
+        return QueryBundle(query_str=question, embedding=embedding)
+    
+    def _start_conversation_turn(self, request: QueryWithContext):
+        """
+        Crée ou reprend la conversation et y ajoute la question de l'utilisateur.
+        
+        Écrit dans le stockage des conversations sous son verrou (fichier,
+        partagé entre workers) : à exécuter hors de la boucle d'événements.
+        Retourne (conversation_id, is_new_conversation, turn_index), où
+        `turn_index` est l'indice de la question dans l'historique.
+        """
+        if request.conversation_id:
+            conversation_id = request.conversation_id
+            logger.debug("Reprise de la conversation: %s", conversation_id)
+            turn_index = len(conversation_manager.get_conversation_history(conversation_id))
+            is_new_conversation = turn_index == 0
+        else:
+            conversation_id = conversation_manager.create_conversation(
+                user_id=request.user_id,
+                title=request.question[:50]
+            )
+            logger.debug("Nouvelle conversation créée: %s", conversation_id)
+            turn_index = 0
+            is_new_conversation = True
+        
+        # Ajouter la question de l'utilisateur
+        conversation_manager.add_message(
+            conversation_id=conversation_id,
+            role="user",
+            content=request.question
+        )
+        return conversation_id, is_new_conversation, turn_index
+    
+    def _summarize_history(self, model_type: str, model_name: str, previous_summary: str, messages: List[dict]) -> str:
+        """Met à jour le résumé glissant avec les messages sortis de la fenêtre récente."""
+        prompt = SUMMARY_PROMPT_STR.format(
+            max_words=SUMMARY_MAX_TOKENS * 3 // 4,
+            previous_summary=previous_summary or "(aucun)",
+            messages="\n".join(
+                f"{'Utilisateur' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+                for msg in messages
+            )
+        )
+        llm = self.get_llm(model_type, model_name)
+        return llm.complete(prompt).text
+    
+    def _build_conversation_prompt(self, conversation_id: str, model_type: str, model_name: str) -> PromptTemplate:
+        """
+        Crée un prompt personnalisé avec le contexte de conversation.
+        
+        Peut appeler le LLM pour mettre à jour le résumé glissant : à exécuter
+        hors de la boucle d'événements.
+        """
+        conversation_context = conversation_manager.build_context_from_history(
+            conversation_id=conversation_id,
+            max_messages=10,
+            model_name=model_name,
+            summarizer=lambda previous, messages: self._summarize_history(
+                model_type, model_name, previous, messages
+            )
+        )
+        return PromptTemplate(
+            TEXT_QR_TEMPLATE_STR.format(
+                conversation_context=conversation_context + "\n\n" if conversation_context else "",
+                context_str="{context_str}",
+                query_str="{query_str}"
+            )
+        )
+    
     async def query_with_conversation(self, request: QueryWithContext) -> ConversationResponse:
         """Traite une requête avec contexte de conversation."""
         
@@ -161,111 +565,599 @@ class RAGController:
                 detail="La question ne peut pas être vide."
             )
         
-        try:
-            # Créer ou récupérer la conversation
-            if request.conversation_id:
-                conversation_id = request.conversation_id
-                print(f"📖 Reprise de la conversation: {conversation_id}")
-            else:
-                conversation_id = conversation_manager.create_conversation(
-                    user_id=request.user_id,
-                    title=request.question[:50]
+        # Un seul tour à la fois par conversation : les questions concurrentes
+        # sur une même conversation sont traitées dans leur ordre d'arrivée
+        async with conversation_manager.turn_locks.hold(request.conversation_id):
+            try:
+                conversation_id, is_new_conversation, turn_index = await asyncio.to_thread(
+                    self._start_conversation_turn, request
+                )
+                
+                # Le cache n'est utilisé que sans historique préalable
+                filters = self._resolve_filters(request.question, request.filters)
+                shards = self._resolve_shards(request.question, filters, request.shards)
+                scope = self._cache_scope(request, filters, shards)
+                generation = semantic_cache.generation
+                cached, normalized, embedding = None, None, None
+                if is_new_conversation:
+                    cached, normalized, embedding = await self._lookup_cached_answer(request.question, scope)
+                
+                if cached is not None:
+                    answer = cached["answer"]
+                    sources = cached["sources"]
+                    logger.debug("Réponse servie depuis le cache sémantique")
+                else:
+                    def run_query():
+                        custom_prompt = self._build_conversation_prompt(
+                            conversation_id, request.model_type, request.model_name
+                        )
+                        
+                        # Assembler le query engine à partir du LLM et du retriever partagés
+                        query_engine = self.model_pool.get_query_engine(
+                            self.index,
+                            request.model_type,
+                            request.model_name,
+                            request.top_k,
+                            text_qa_template=custom_prompt,
+                            cache_key=None,
+                            filters=self._build_metadata_filters(filters),
+                            shards=shards
+                        )
+                        return query_engine.query(self._query_bundle(request.question, embedding))
+                    
+                    async def compute():
+                        logger.debug("Question: %s (%s/%s)", request.question, request.model_type, request.model_name)
+                        
+                        # Exécuter la requête (et l'éventuel résumé) hors de la boucle d'événements
+                        response = await query_executor.run(request.model_type, run_query)
+                        
+                        sources = self._extract_sources(response)
+                        answer = str(response)
+                        
+                        if embedding is not None:
+                            semantic_cache.put(normalized, embedding, scope, answer, sources, generation=generation)
+                        return answer, sources
+                    
+                    if is_new_conversation:
+                        # Sans historique, le prompt ne dépend que de la question :
+                        # les nouvelles conversations identiques simultanées partagent le calcul
+                        answer, sources = await self.inflight_queries.run(f"{scope}|{normalized}", compute)
+                    else:
+                        answer, sources = await compute()
+                
+                # Ajouter la réponse de l'assistant (écriture sous verrou, hors de la boucle d'événements)
+                await asyncio.to_thread(
+                    conversation_manager.add_message,
+                    conversation_id=conversation_id,
+                    role="assistant",
+                    content=answer,
+                    sources=sources
+                )
+                
+                # Par défaut, seuls les messages de ce tour sont renvoyés
+                history = await asyncio.to_thread(conversation_manager.get_conversation_history, conversation_id)
+                if request.include_history:
+                    history_start = 0
+                elif request.since_index is not None:
+                    history_start = max(0, min(request.since_index, len(history)))
+                else:
+                    history_start = turn_index
+                
+                logger.debug("Réponse générée avec %d source(s)", len(sources))
+                
+                return ConversationResponse(
+                    conversation_id=conversation_id,
+                    question=request.question,
+                    answer=answer,
+                    model_used=f"{request.model_type}/{request.model_name}",
+                    sources=sources,
+                    conversation_history=[
+                        {
+                            "role": msg["role"],
+                            "content": msg["content"],
+                            "timestamp": msg["timestamp"]
+                        }
+                        for msg in history[history_start:]
+                    ],
+                    history_start_index=history_start,
+                    message_count=len(history)
                 )
-                print(f"✨ Nouvelle conversation créée: {conversation_id}")
             
-            # Ajouter la question de l'utilisateur
-            conversation_manager.add_message(
-                conversation_id=conversation_id,
-                role="user",
-                content=request.question
+            except HTTPException:
+                raise
+            except Exception as e:
+                print(f"❌ Erreur: {str(e)}")
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Erreur interne: {str(e)}"
+                )
+    
+    async def stream_with_conversation(self, request: QueryWithContext) -> StreamingResponse:
+        """
+        Variante en streaming (Server-Sent Events) de `query_with_conversation`.
+        
+        Événements émis dans l'ordre : `conversation` (identifiant), `sources`,
+        puis un `token` par fragment généré et enfin `done` (ou `error`).
+        La réponse est enregistrée dans la conversation à la fin du flux,
+        y compris si le client se déconnecte en cours de route. Une erreur à
+        l'ouverture du tour est signalée par un événement `error`.
+        """
+        if self.index is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Le moteur de requête n'est pas initialisé."
             )
-            
-            # Construire le contexte de conversation
-            conversation_context = conversation_manager.build_context_from_history(
-                conversation_id=conversation_id,
-                max_messages=10
+        
+        if not request.question.strip():
+            raise HTTPException(
+                status_code=400,
+                detail="La question ne peut pas être vide."
             )
-            
-            # Créer le LLM
-            llm = self.get_llm(request.model_type, request.model_name)
-            
-            # Créer un prompt personnalisé avec le contexte de conversation
-            custom_prompt = PromptTemplate(
-                TEXT_QR_TEMPLATE_STR.format(
-                    conversation_context=conversation_context + "\n\n" if conversation_context else "",
-                    context_str="{context_str}",
-                    query_str="{query_str}"
+        
+        return StreamingResponse(
+            self._stream_turn(request),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    async def _stream_turn(self, request: QueryWithContext):
+        """
+        Tour de conversation en streaming, sérialisé avec les autres tours de
+        la même conversation (le verrou est pris et rendu dans le générateur).
+        """
+        async with conversation_manager.turn_locks.hold(request.conversation_id):
+            try:
+                conversation_id, is_new_conversation, _ = await asyncio.to_thread(
+                    self._start_conversation_turn, request
                 )
-            )
+            except Exception as e:
+                print(f"❌ Erreur: {str(e)}")
+                yield _sse_event("error", {"detail": f"Erreur interne: {str(e)}"})
+                return
             
-            # Créer le query engine
-            query_engine = self.index.as_query_engine(
-                llm=llm,
-                text_qa_template=custom_prompt,
-                similarity_top_k=request.top_k,
-                response_mode="compact"
-            )
+            # aclosing : la réponse est enregistrée avant de rendre le verrou,
+            # même si le client se déconnecte
+            async with aclosing(self._stream_events(request, conversation_id, is_new_conversation)) as events:
+                async for event in events:
+                    yield event
+    
+    async def _stream_events(self, request: QueryWithContext, conversation_id: str, is_new_conversation: bool):
+        """Générateur des événements SSE d'un tour de conversation."""
+        answer_parts = []
+        sources = []
+        completed = False
+        cancelled = threading.Event()
+        
+        try:
+            yield _sse_event("conversation", {"conversation_id": conversation_id})
             
-            print(f"❓ Question: {request.question}")
-            print(f"🤖 Modèle: {request.model_type}/{request.model_name}")
+            filters = self._resolve_filters(request.question, request.filters)
+            shards = self._resolve_shards(request.question, filters, request.shards)
+            scope = self._cache_scope(request, filters, shards)
+            generation = semantic_cache.generation
+            cached, normalized, embedding = None, None, None
+            if is_new_conversation:
+                cached, normalized, embedding = await self._lookup_cached_answer(request.question, scope)
             
-            # Exécuter la requête
-            response = query_engine.query(request.question)
+            if cached is not None:
+                sources = cached["sources"]
+                answer_parts.append(cached["answer"])
+                yield _sse_event("sources", {"sources": sources})
+                yield _sse_event("token", {"token": cached["answer"]})
+            else:
+                # Le LLM est consommé dans un thread du pool ; les fragments
+                # sont transmis à la boucle d'événements via une file
+                loop = asyncio.get_running_loop()
+                queue: asyncio.Queue = asyncio.Queue()
+                
+                def emit(kind, payload):
+                    loop.call_soon_threadsafe(queue.put_nowait, (kind, payload))
+                
+                def produce():
+                    query_engine = self.model_pool.get_query_engine(
+                        self.index,
+                        request.model_type,
+                        request.model_name,
+                        request.top_k,
+                        text_qa_template=self._build_conversation_prompt(
+                            conversation_id, request.model_type, request.model_name
+                        ),
+                        cache_key=None,
+                        streaming=True,
+                        filters=self._build_metadata_filters(filters),
+                        shards=shards
+                    )
+                    response = query_engine.query(self._query_bundle(request.question, embedding))
+                    emit("sources", self._extract_sources(response))
+                    for token in response.response_gen:
+                        if cancelled.is_set():
+                            break
+                        emit("token", token)
+                
+                task = asyncio.ensure_future(query_executor.run(request.model_type, produce))
+                task.add_done_callback(lambda t: queue.put_nowait(("end", t)))
+                
+                while True:
+                    kind, payload = await queue.get()
+                    if kind == "sources":
+                        sources = payload
+                        yield _sse_event("sources", {"sources": sources})
+                    elif kind == "token":
+                        answer_parts.append(payload)
+                        yield _sse_event("token", {"token": payload})
+                    else:
+                        error = payload.exception()
+                        if error is not None:
+                            detail = error.detail if isinstance(error, HTTPException) else str(error)
+                            print(f"❌ Erreur: {detail}")
+                            yield _sse_event("error", {"detail": detail})
+                            return
+                        break
+                
+                if embedding is not None:
+                    semantic_cache.put(normalized, embedding, scope, "".join(answer_parts), sources, generation=generation)
             
-            # Extraire les sources
-            sources = []
-            if hasattr(response, 'source_nodes'):
-                for i, node in enumerate(response.source_nodes):
-                    metadata = node.node.metadata if hasattr(node.node, 'metadata') else {}
-                    
-                    sources.append({
-                        "index": i,
-                        "score": float(node.score) if hasattr(node, 'score') else None,
-                        "text": node.text[:300] + "..." if len(node.text) > 300 else node.text,
-                        "document_name": metadata.get("file_name", "Inconnu"),
-                        "page_number": metadata.get("page_number", None)
-                    })
+            completed = True
+            yield _sse_event("done", {
+                "conversation_id": conversation_id,
+                "model_used": f"{request.model_type}/{request.model_name}",
+                "answer": "".join(answer_parts)
+            })
+        
+        finally:
+            # Arrête la génération si le client s'est déconnecté
+            cancelled.set()
+            answer = "".join(answer_parts)
+            if answer:
+                # Écriture hors de la boucle d'événements, menée à terme même si le flux est annulé
+                await asyncio.shield(asyncio.to_thread(
+                    conversation_manager.add_message,
+                    conversation_id=conversation_id,
+                    role="assistant",
+                    content=answer,
+                    sources=sources
+                ))
+            if not completed:
+                logger.debug("Flux interrompu pour la conversation %s", conversation_id)
+    
+    async def query_documents(self, request: QueryRequest) -> QueryResponse:
+        """Traite une requête simple sans contexte de conversation (legacy)."""
+        
+        if self.index is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Le moteur de requête n'est pas initialisé."
+            )
+        
+        if not request.question.strip():
+            raise HTTPException(
+                status_code=400,
+                detail="La question ne peut pas être vide."
+            )
+        
+        try:
+            filters = self._resolve_filters(request.question, request.filters)
+            shards = self._resolve_shards(request.question, filters, request.shards)
+            scope = self._cache_scope(request, filters, shards)
+            generation = semantic_cache.generation
+            cached, normalized, embedding = await self._lookup_cached_answer(request.question, scope)
             
-            answer = str(response)
+            if cached is not None:
+                logger.debug("Réponse servie depuis le cache sémantique")
+                return QueryResponse(
+                    question=request.question,
+                    answer=cached["answer"],
+                    model_used=f"{request.model_type}/{request.model_name}",
+                    sources=[SourceInfo(**source) for source in cached["sources"]]
+                )
             
-            # Ajouter la réponse de l'assistant
-            conversation_manager.add_message(
-                conversation_id=conversation_id,
-                role="assistant",
-                content=answer,
-                sources=sources
-            )
+            async def compute():
+                # Récupérer le query engine partagé pour ce modèle et ce top_k
+                # (dédié si la recherche est restreinte par des filtres)
+                query_engine = self.model_pool.get_query_engine(
+                    self.index,
+                    request.model_type,
+                    request.model_name,
+                    request.top_k,
+                    text_qa_template=TEXT_QR_TEMPLATE,
+                    filters=self._build_metadata_filters(filters),
+                    shards=shards
+                )
+                
+                logger.debug("Question reçue: %s (%s/%s)", request.question, request.model_type, request.model_name)
+                
+                # Exécuter la requête hors de la boucle d'événements
+                response = await query_executor.run(
+                    request.model_type,
+                    query_engine.query,
+                    self._query_bundle(request.question, embedding)
+                )
+                
+                # Extraire les sources avec métadonnées
+                sources = self._extract_sources(response)
+                answer = str(response)
+                
+                if embedding is not None:
+                    semantic_cache.put(normalized, embedding, scope, answer, sources, generation=generation)
+                return answer, sources
             
-            # Récupérer l'historique complet
-            history = conversation_manager.get_conversation_history(conversation_id)
+            # Les requêtes identiques simultanées partagent le même calcul
+            answer, sources = await self.inflight_queries.run(f"{scope}|{normalized}", compute)
             
-            print(f"✅ Réponse générée avec {len(sources)} source(s)")
+            logger.debug("Réponse générée avec %d source(s) utilisée(s)", len(sources))
             
-            return ConversationResponse(
-                conversation_id=conversation_id,
+            return QueryResponse(
                 question=request.question,
                 answer=answer,
                 model_used=f"{request.model_type}/{request.model_name}",
-                sources=sources,
-                conversation_history=[
-                    {
-                        "role": msg["role"],
-                        "content": msg["content"],
-                        "timestamp": msg["timestamp"]
-                    }
-                    for msg in history
-                ]
+                sources=[SourceInfo(**source) for source in sources]
             )
         
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"❌ Erreur: {str(e)}")
+            print(f"❌ Erreur lors du traitement de la requête: {str(e)}")
             raise HTTPException(
                 status_code=500,
-                detail=f"Erreur interne: {str(e)}"
+                detail=f"Erreur interne du serveur: {str(e)}"
             )
     
-    async def query_documents(self, request: QueryRequest) -> QueryResponse:
-        """Traite une requête simple sans contexte de conversation (legacy)."""
+    def _embed_questions(self, questions: List[str]) -> List[List[float]]:
+        """
+        Embeddings de plusieurs questions en un appel par lot.
+        
+        Le lot passe par le mode "texte" du modèle, utilisé seulement s'il
+        embedde requêtes et textes de la même façon (cas d'OpenAI) ; sinon
+        chaque question est embeddée en mode "requête".
+        """
+        model = self.embed_model
+        query_engine = getattr(model, "_query_engine", None)
+        if query_engine is not None and query_engine == getattr(model, "_text_engine", None):
+            return model.get_text_embedding_batch(questions)
+        return [model.get_query_embedding(question) for question in questions]
+    
+    def _retrieve_batch(
+        self,
+        index,
+        embeddings: List[List[float]],
+        top_k: int,
+        filters: Optional[MetadataFilters],
+        shards: Optional[List[str]] = None
+    ) -> List[List[NodeWithScore]]:
+        """
+        Recherche vectorielle de plusieurs questions déjà embeddées.
+        
+        Avec le store mmap, toutes les questions sont notées par un seul
+        produit matriciel ; le store JSON est interrogé question par question.
+        Un index partitionné interroge les domaines `shards` en parallèle.
+        """
+        # Recherche puis lecture des nœuds sans écriture en place concurrente (événements)
+        with self.index_lock.read():
+            vector_store = index.vector_store
+            if isinstance(vector_store, ShardedVectorStore):
+                results = vector_store.query_batch(embeddings, top_k, filters, shards=shards)
+            elif isinstance(vector_store, MmapVectorStore):
+                results = vector_store.query_batch(embeddings, top_k, filters)
+            else:
+                results = [
+                    vector_store.query(VectorStoreQuery(
+                        query_embedding=embedding,
+                        similarity_top_k=top_k,
+                        filters=filters
+                    ))
+                    for embedding in embeddings
+                ]
+            
+            nodes_dict = index.index_struct.nodes_dict
+            retrieved = []
+            for result in results:
+                nodes = result.nodes
+                if nodes is None:
+                    nodes = index.docstore.get_nodes([nodes_dict.get(vector_id, vector_id) for vector_id in result.ids])
+                retrieved.append([
+                    NodeWithScore(node=node, score=score)
+                    for node, score in zip(nodes, result.similarities)
+                ])
+        return retrieved
+    
+    async def query_documents_batch(self, request: BatchQueryRequest) -> BatchQueryResponse:
+        """
+        Traite un lot de questions sans contexte de conversation.
+        
+        Toutes les questions sont embeddées en un lot puis recherchées
+        ensemble ; les réponses sont générées en parallèle, au plus
+        `max_concurrency` à la fois. Une erreur sur une question (génération
+        échouée, file pleine...) est renvoyée dans son résultat sans
+        interrompre les autres.
+        """
+        if self.index is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Le moteur de requête n'est pas initialisé."
+            )
+        
+        if not request.questions:
+            raise HTTPException(
+                status_code=400,
+                detail="Le lot ne contient aucune question."
+            )
+        
+        if len(request.questions) > BATCH_MAX_QUESTIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Un lot est limité à {BATCH_MAX_QUESTIONS} questions."
+            )
+        
+        # Modèle et domaines communs au lot : une configuration invalide rejette tout le lot
+        try:
+            validate_shards(request.shards or [])
+            synthesizer = self.model_pool.get_synthesizer(
+                request.model_type,
+                request.model_name,
+                text_qa_template=TEXT_QR_TEMPLATE
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        index = self.index  # Même version de l'index pour tout le lot
+        generation = semantic_cache.generation
+        results = [
+            BatchQueryItem(index=position, question=question)
+            for position, question in enumerate(request.questions)
+        ]
+        
+        # Cache exact d'abord ; les autres questions poursuivent le traitement
+        pending = []
+        for item in results:
+            if not item.question.strip():
+                item.error = "La question ne peut pas être vide."
+                continue
+            filters = self._resolve_filters(item.question, request.filters)
+            shards = self._resolve_shards(item.question, filters, request.shards)
+            normalized = normalize_question(item.question)
+            scope = self._cache_scope(request, filters, shards)
+            cached = semantic_cache.get_exact(normalized, scope)
+            if cached is not None:
+                item.answer = cached["answer"]
+                item.sources = [SourceInfo(**source) for source in cached["sources"]]
+            else:
+                pending.append({
+                    "item": item,
+                    "normalized": normalized,
+                    "filters": filters,
+                    "shards": shards,
+                    "scope": scope
+                })
+        
+        if pending:
+            def embed_and_retrieve():
+                embeddings = self._embed_questions([entry["normalized"] for entry in pending])
+                misses = []
+                for entry, embedding in zip(pending, embeddings):
+                    entry["embedding"] = embedding
+                    cached = semantic_cache.get_similar(embedding, entry["scope"])
+                    if cached is not None:
+                        entry["item"].answer = cached["answer"]
+                        entry["item"].sources = [SourceInfo(**source) for source in cached["sources"]]
+                    else:
+                        misses.append(entry)
+                
+                # Une recherche groupée par jeu de filtres et de domaines
+                groups: Dict[str, List[Dict]] = {}
+                for entry in misses:
+                    groups.setdefault(
+                        json.dumps([entry["filters"], entry["shards"]], sort_keys=True), []
+                    ).append(entry)
+                for group in groups.values():
+                    nodes_per_question = self._retrieve_batch(
+                        index,
+                        [entry["embedding"] for entry in group],
+                        request.top_k,
+                        self._build_metadata_filters(group[0]["filters"]),
+                        shards=group[0]["shards"]
+                    )
+                    for entry, nodes in zip(group, nodes_per_question):
+                        entry["nodes"] = nodes
+                return misses
+            
+            try:
+                pending = await query_executor.run("embedding", embed_and_retrieve)
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                print(f"❌ Erreur lors de la recherche du lot: {detail}")
+                for entry in pending:
+                    entry["item"].error = detail
+                pending = []
+        
+        max_concurrency = max(1, min(request.max_concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def answer(entry):
+            item = entry["item"]
+            async with semaphore:
+                try:
+                    response = await query_executor.run(
+                        request.model_type,
+                        synthesizer.synthesize,
+                        item.question,
+                        entry["nodes"]
+                    )
+                except Exception as e:
+                    item.error = e.detail if isinstance(e, HTTPException) else str(e)
+                    return
+            sources = self._extract_sources(response)
+            item.answer = str(response)
+            item.sources = [SourceInfo(**source) for source in sources]
+            semantic_cache.put(
+                entry["normalized"], entry["embedding"], entry["scope"], item.answer, sources, generation=generation
+            )
+        
+        await asyncio.gather(*(answer(entry) for entry in pending))
+        
+        logger.debug(
+            "Lot de %d question(s) traité (%d génération(s), %d erreur(s))",
+            len(results), len(pending), sum(1 for item in results if item.error)
+        )
+        
+        return BatchQueryResponse(
+            model_used=f"{request.model_type}/{request.model_name}",
+            results=results
+        )
+    
+    def _resolve_filters(self, question: str, filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Filtres explicites de la requête, sinon ceux déduits de la question (ex. "offres publiées")."""
+        if filters:
+            return filters
+        inferred = infer_metadata_filters(question)
+        if inferred:
+            logger.debug("Filtres déduits de la question: %s", inferred)
+        return inferred
+    
+    def _resolve_shards(
+        self,
+        question: str,
+        filters: Optional[Dict[str, Any]],
+        shards: Optional[List[str]]
+    ) -> Optional[List[str]]:
+        """
+        Domaines de l'index partitionné à interroger (voir utils/shard_router.py),
+        ou None pour tout l'index (y compris lorsqu'il n'est pas partitionné).
+        """
+        try:
+            routed = route_shards(question, filters, shards)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if routed is None or not isinstance(self.index.vector_store, ShardedVectorStore):
+            return None
+        logger.debug("Domaines interrogés: %s", routed)
+        return routed
+    
+    def _cache_scope(self, request, filters: Optional[Dict[str, Any]], shards: Optional[List[str]] = None) -> str:
+        """Portée du cache sémantique : modèle, top_k, filtres appliqués et domaines interrogés."""
+        scope = f"{request.model_type}/{request.model_name}/{request.top_k}"
+        if filters:
+            scope += "/" + json.dumps(filters, sort_keys=True, ensure_ascii=False)
+        if shards:
+            scope += "|shards=" + ",".join(shards)
+        return scope
+    
+    def _build_metadata_filters(self, filters: Optional[Dict[str, Any]]) -> Optional[MetadataFilters]:
+        """Convertit {"cle": valeur | [valeurs]} en filtres llama_index (conditions ET)."""
+        if not filters:
+            return None
+        return MetadataFilters(filters=[
+            MetadataFilter(
+                key=key,
+                value=[normalize_metadata_value(key, item) for item in value],
+                operator=FilterOperator.IN
+            )
+            if isinstance(value, list)
+            else MetadataFilter(key=key, value=normalize_metadata_value(key, value), operator=FilterOperator.EQ)
+            for key, value in filters.items()
+        ])
+    
+    async def retrieve_documents(self, request: RetrieveRequest) -> RetrieveResponse:
+        """Retourne les passages les plus proches de la question, sans appel au LLM."""
         
         if self.index is None:
             raise HTTPException(
@@ -280,107 +1172,774 @@ class RAGController:
             )
         
         try:
-            # Créer le LLM selon le choix de l'utilisateur
-            llm = self.get_llm(request.model_type, request.model_name)
-            
-            # Créer le query engine avec le LLM et le prompt personnalisé
-            query_engine = self.index.as_query_engine(
-                llm=llm,
-                text_qa_template=TEXT_QR_TEMPLATE,
-                similarity_top_k=request.top_k,
-                response_mode="compact"
+            filters = self._resolve_filters(request.question, request.filters)
+            retriever = self.model_pool.get_retriever(
+                self.index,
+                request.top_k,
+                filters=self._build_metadata_filters(filters),
+                shards=self._resolve_shards(request.question, filters, request.shards)
             )
             
-            print(f"❓ Question reçue: {request.question}")
-            print(f"🤖 Utilisation du modèle {request.model_type}/{request.model_name}")
-            
-            # Exécuter la requête
-            response = query_engine.query(request.question)
-            
-            # Extraire les sources avec métadonnées
-            sources = []
-            if hasattr(response, 'source_nodes'):
-                for i, node in enumerate(response.source_nodes):
-                    metadata = node.node.metadata if hasattr(node.node, 'metadata') else {}
-                    
-                    file_name = metadata.get("file_name", "Inconnu")
-                    page_number = metadata.get("page_number", None)
-                    score = float(node.score) if hasattr(node, 'score') else None
-                    text = node.text[:300] + "..." if len(node.text) > 300 else node.text
-                    
-                    sources.append(SourceInfo(
-                        index=i,
-                        score=score,
-                        text=text,
-                        document_name=file_name,
-                        page_number=page_number
-                    ))
+            # Un embedding et une recherche vectorielle, hors de la boucle d'événements
+            scored_nodes = await query_executor.run(
+                "embedding",
+                retriever.retrieve,
+                request.question
+            )
             
-            print(f"✅ Réponse générée avec {len(sources)} source(s) utilisée(s).")
+            nodes = []
+            for node in scored_nodes:
+                metadata = node.node.metadata or {}
+                nodes.append(RetrievedNode(
+                    node_id=node.node.node_id,
+                    score=float(node.score) if node.score is not None else None,
+                    text=node.node.get_content(),
+                    document_name=metadata.get("file_name", "Inconnu"),
+                    page_number=metadata.get("page_number", None),
+                    metadata=metadata
+                ))
             
-            return QueryResponse(
-                question=request.question,
-                answer=str(response),
-                model_used=f"{request.model_type}/{request.model_name}",
-                sources=sources
-            )
+            return RetrieveResponse(question=request.question, nodes=nodes)
         
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"❌ Erreur lors du traitement de la requête: {str(e)}")
+            print(f"❌ Erreur lors de la recherche: {str(e)}")
             raise HTTPException(
                 status_code=500,
                 detail=f"Erreur interne du serveur: {str(e)}"
             )
     
-    async def reindex_documents(self):
-        """Réindexe les documents dans le dossier ./data."""
+    async def reindex_documents(self, mode: str = "incremental", shard: Optional[str] = None):
+        """
+        Lance la réindexation des documents du dossier ./data en arrière-plan.
+        
+        - mode "incremental": ne ré-embedde que les fichiers ajoutés ou modifiés
+          (empreinte de contenu) et retire les documents des fichiers supprimés
+        - mode "db": applique les enregistrements des bases des services
+          ajoutés, modifiés ou supprimés depuis la dernière synchronisation
+        - mode "full": reconstruit l'index à partir de tous les documents
+          et de tous les enregistrements des bases ; avec `shard`, ne
+          reconstruit que ce domaine d'un index partitionné
+        
+        La nouvelle version est construite dans un répertoire séparé ; les
+        requêtes continuent d'être servies par l'index courant jusqu'à la
+        bascule atomique. Retourne la tâche créée (voir `get_reindex_job`).
+        """
+        if mode not in ("incremental", "db", "full"):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Mode de réindexation inconnu: {mode}"
+            )
+        
+        if self.startup["status"] in ("pending", "loading"):
+            # Une réindexation reconstruirait l'index en parallèle du chargement
+            raise HTTPException(
+                status_code=503,
+                detail="L'index est en cours d'initialisation, réessayez dans quelques instants."
+            )
+        
+        if shard is not None:
+            if shard not in SHARDS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Domaine d'index inconnu: {shard} (domaines disponibles: {', '.join(SHARDS)})"
+                )
+            if mode != "full":
+                raise HTTPException(
+                    status_code=400,
+                    detail="La reconstruction d'un domaine n'existe qu'en mode \"full\"."
+                )
+            if self.index is None or not isinstance(self.index.vector_store, ShardedVectorStore):
+                raise HTTPException(
+                    status_code=400,
+                    detail="L'index n'est pas partitionné par domaine (RAG_INDEX_SHARDS=false)."
+                )
+        
+        job = reindex_jobs.create(mode)
+        if job is None:
+            active = reindex_jobs.get_active()
+            raise HTTPException(
+                status_code=409,
+                detail=f"Une réindexation est déjà en cours (job {active['job_id'] if active else 'inconnu'})."
+            )
+        if shard is not None:
+            reindex_jobs.update(job["job_id"], shard=shard)
+            job["shard"] = shard
+        
+        self._reindex_task = asyncio.create_task(
+            asyncio.to_thread(self._run_reindex_job, job["job_id"], mode, shard=shard)
+        )
+        return job
+    
+    def get_reindex_job(self, job_id: str):
+        """Retourne l'état d'une tâche de réindexation."""
+        job = reindex_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Tâche de réindexation introuvable")
+        return job
+    
+    def list_reindex_jobs(self):
+        """Retourne les dernières tâches de réindexation (plus récentes en premier)."""
+        return reindex_jobs.list_jobs()
+    
+    def _run_reindex_job(
+        self,
+        job_id: str,
+        mode: str,
+        events: Optional[List[Dict]] = None,
+        shard: Optional[str] = None
+    ):
+        """
+        Exécute une tâche de réindexation (dans un thread dédié).
+        
+        Les tâches de tous les workers sont sérialisées par `storage_lock` ;
+        chacune part de la dernière version active, que ce worker recharge
+        au besoin (activée par un autre worker).
+        """
+        try:
+            with self.storage_lock:
+                reindex_jobs.start(job_id)
+                self._refresh_index()
+                active_dir = self.index_dir if self.index is not None else get_active_dir(PERSIST_DIR)
+                manifest = load_manifest(active_dir)
+                if shard is not None and self.index is not None and has_index(active_dir):
+                    result = self._reindex_shard(job_id, active_dir, shard)
+                elif mode == "incremental" and self.index is not None and manifest:
+                    result = self._reindex_incremental(job_id, active_dir, manifest)
+                elif mode == "db" and self.index is not None and has_index(active_dir):
+                    result = self._sync_databases(job_id, active_dir)
+                elif mode == "events" and self.index is not None and has_index(active_dir):
+                    result = self._apply_record_events(job_id, active_dir, events)
+                else:
+                    result = self._reindex_full(job_id)
+            reindex_jobs.succeed(job_id, result)
+        except Exception as e:
+            print(f"❌ Erreur lors de la réindexation: {str(e)}")
+            reindex_jobs.fail(job_id, str(e))
+    
+    def _reindex_full(self, job_id: str):
+        """Reconstruit l'index à partir de tous les documents, dans une nouvelle version."""
+        print("🔄 Réindexation complète des documents en cours...")
+        
+        # Recharger les documents (fichiers de ./data et enregistrements des bases)
+        reindex_jobs.update(job_id, stage="lecture des documents")
+        file_hashes = parsed_documents.scan_data_dir(DATA_DIR)
+        file_documents = parsed_documents.load_documents(DATA_DIR, list(file_hashes), file_hashes)
+        db_state = {"tables": {}}
+        documents = file_documents + load_database_documents(db_state)
+        
+        if len(documents) == 0:
+            raise ValueError(f"Aucun document trouvé dans {DATA_DIR}")
+        
+        # Créer un nouvel index (l'index courant reste en service)
+        reindex_jobs.update(
+            job_id,
+            stage="calcul des embeddings",
+            progress={"files_total": len(file_hashes), "documents_total": len(documents)}
+        )
+        embedding_model = self.get_embedding_model(EMBEDDING_BACKEND)
+        new_index = VectorStoreIndex.from_documents(
+            documents,
+            embed_model=embedding_model,
+            storage_context=self._new_storage_context(),
+            transformations=INDEX_TRANSFORMATIONS,
+            show_progress=True
+        )
+        
+        reindex_jobs.update(job_id, stage="sauvegarde")
+        build_dir = new_build_dir(PERSIST_DIR)
+        try:
+            new_index.storage_context.persist(persist_dir=build_dir)
+            save_manifest(build_dir, build_manifest(file_hashes, file_documents))
+            save_sync_state(build_dir, db_state)
+        except Exception:
+            discard_build_dir(build_dir)
+            raise
+        
+        reindex_jobs.update(job_id, stage="bascule")
+        activate_dir(PERSIST_DIR, build_dir)
+        self._swap_index(new_index, embedding_model, build_dir)
+        print("✅ Réindexation terminée avec succès.")
+        
+        return {
+            "message": "Réindexation terminée avec succès.",
+            "mode": "full",
+            "count": len(documents)
+        }
+    
+    def _reindex_shard(self, job_id: str, active_dir: str, shard: str):
+        """
+        Reconstruit un seul domaine de l'index partitionné, dans une nouvelle version.
+        
+        Les documents du domaine sont retirés d'une copie de l'index actif puis
+        recalculés à partir de leurs sources (fichiers de ./data pour "docs",
+        tables du service pour les autres domaines). Les fichiers des autres
+        domaines ne sont pas réécrits et leurs réponses en cache sont conservées.
+        """
+        print(f"🔄 Reconstruction du domaine {shard} de l'index en cours...")
+        
+        reindex_jobs.update(job_id, stage="copie de l'index actif")
+        build_dir = new_build_dir(PERSIST_DIR)
         try:
-            print("🔄 Réindexation des documents en cours...")
+            new_index = self._copy_active_index(active_dir, build_dir)
             
-            # Supprimer l'ancien index
-            if os.path.exists(PERSIST_DIR):
-                shutil.rmtree(PERSIST_DIR)
-                print("🗑️ Ancien index supprimé")
+            # Vider le domaine, puis retirer ses documents du docstore et de l'index
+            reindex_jobs.update(job_id, stage="suppression des documents du domaine")
+            ref_doc_ids = [
+                ref_doc_id for ref_doc_id in new_index.ref_doc_info
+                if shard_for(None, ref_doc_id) == shard
+            ]
+            new_index.vector_store.reset_shard(shard)
+            for ref_doc_id in ref_doc_ids:
+                new_index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
             
-            # Recharger les documents
-            documents = SimpleDirectoryReader(
-                DATA_DIR,
-                filename_as_id=True
-            ).load_data()
+            reindex_jobs.update(job_id, stage="lecture des documents")
+            if shard == DEFAULT_SHARD:
+                file_hashes = parsed_documents.scan_data_dir(DATA_DIR)
+                documents = parsed_documents.load_documents(DATA_DIR, list(file_hashes), file_hashes)
+            else:
+                # Tables des services du domaine relues entièrement (état de synchronisation remis à zéro)
+                services = [service for service, name in SHARD_BY_SERVICE.items() if name == shard]
+                state = self._load_sync_state(active_dir)
+                for service in services:
+                    for table in DB_SOURCES[service]["tables"]:
+                        state.setdefault("tables", {}).pop(f"{service}.{table}", None)
+                documents = load_database_documents(state, services=services)
             
-            if len(documents) == 0:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Aucun document trouvé dans {DATA_DIR}"
+            stats = {
+                "records_inserted": 0,
+                "records_updated": 0,
+                "records_deleted": 0
+            }
+            reindex_jobs.update(
+                job_id,
+                stage="calcul des embeddings",
+                progress={"documents_removed": len(ref_doc_ids), "documents_total": len(documents)}
+            )
+            self._apply_record_changes(job_id, new_index, (("upsert", document) for document in documents), stats)
+            
+            reindex_jobs.update(job_id, stage="sauvegarde")
+            new_index.storage_context.persist(persist_dir=build_dir)
+            if shard == DEFAULT_SHARD:
+                save_manifest(build_dir, build_manifest(file_hashes, documents))
+            else:
+                save_sync_state(build_dir, state)
+        except Exception:
+            discard_build_dir(build_dir)
+            raise
+        
+        reindex_jobs.update(job_id, stage="bascule")
+        activate_dir(PERSIST_DIR, build_dir)
+        self._swap_index(new_index, self.embed_model, build_dir, shards=[shard])
+        print(f"✅ Domaine {shard} reconstruit: {len(documents)} document(s).")
+        
+        return {
+            "message": f"Domaine {shard} reconstruit avec succès.",
+            "mode": "full",
+            "shard": shard,
+            "count": len(documents),
+            "documents_removed": len(ref_doc_ids)
+        }
+    
+    def _reindex_incremental(self, job_id: str, active_dir: str, manifest: dict):
+        """
+        Ré-embedde uniquement les fichiers dont l'empreinte a changé.
+        
+        Les modifications sont appliquées à une copie de l'index actif, chargée
+        dans une nouvelle version, puis basculées d'un coup.
+        """
+        print("🔄 Réindexation incrémentale des documents en cours...")
+        
+        reindex_jobs.update(job_id, stage="comparaison des empreintes")
+        file_hashes = parsed_documents.scan_data_dir(DATA_DIR)
+        added = [name for name in file_hashes if name not in manifest]
+        changed = [
+            name for name in file_hashes
+            if name in manifest and manifest[name]["hash"] != file_hashes[name]
+        ]
+        removed = [name for name in manifest if name not in file_hashes]
+        skipped = len(file_hashes) - len(added) - len(changed)
+        
+        stats = {
+            "files_added": len(added),
+            "files_updated": len(changed),
+            "files_deleted": len(removed),
+            "files_skipped": skipped,
+            "documents_inserted": 0,
+            "documents_updated": 0,
+            "documents_deleted": 0,
+            "documents_skipped": 0
+        }
+        reindex_jobs.update(job_id, progress=dict(stats))
+        
+        to_load = added + changed
+        if not to_load and not removed:
+            print("✅ Aucun changement détecté, index inchangé.")
+            return {
+                "message": "Aucun changement détecté.",
+                "mode": "incremental",
+                "count": len(file_hashes),
+                **stats
+            }
+        
+        # Préparer une copie de l'index actif dans une nouvelle version
+        reindex_jobs.update(job_id, stage="copie de l'index actif")
+        build_dir = new_build_dir(PERSIST_DIR)
+        try:
+            new_index = self._copy_active_index(active_dir, build_dir)
+            
+            # Retirer les documents des fichiers supprimés
+            for name in removed:
+                for doc_id in manifest[name]["doc_ids"]:
+                    new_index.delete_ref_doc(doc_id, delete_from_docstore=True)
+                    stats["documents_deleted"] += 1
+                del manifest[name]
+            
+            if to_load:
+                reindex_jobs.update(job_id, stage="lecture des documents modifiés")
+                documents = parsed_documents.load_documents(DATA_DIR, to_load, file_hashes)
+                doc_ids_by_file = group_doc_ids_by_file(documents)
+                
+                # Retirer les pages/parties qui n'existent plus dans les fichiers modifiés
+                for name in changed:
+                    new_ids = set(doc_ids_by_file.get(name, []))
+                    for doc_id in manifest[name]["doc_ids"]:
+                        if doc_id not in new_ids:
+                            new_index.delete_ref_doc(doc_id, delete_from_docstore=True)
+                            stats["documents_deleted"] += 1
+                
+                # Insère les nouveaux documents, met à jour ceux dont le hash diffère
+                # et ignore les documents inchangés
+                reindex_jobs.update(
+                    job_id,
+                    stage="calcul des embeddings",
+                    progress={"documents_total": len(documents), "documents_processed": 0}
                 )
+                for processed, document in enumerate(documents, start=1):
+                    existing_hash = new_index.docstore.get_document_hash(document.doc_id)
+                    if existing_hash is None:
+                        new_index.insert(document)
+                        stats["documents_inserted"] += 1
+                    elif existing_hash != document.hash:
+                        new_index.update_ref_doc(document)
+                        stats["documents_updated"] += 1
+                    else:
+                        stats["documents_skipped"] += 1
+                    reindex_jobs.update(job_id, progress={"documents_processed": processed})
+                
+                for name in to_load:
+                    manifest[name] = {
+                        "hash": file_hashes[name],
+                        "doc_ids": doc_ids_by_file.get(name, [])
+                    }
             
-            # Créer un nouvel index
-            embedding_model = self.get_embedding_model("openai")
-            self.index = VectorStoreIndex.from_documents(
-                documents,
-                embed_model=embedding_model,
-                show_progress=True
-            )
+            reindex_jobs.update(job_id, stage="sauvegarde", progress=dict(stats))
+            new_index.storage_context.persist(persist_dir=build_dir)
+            save_manifest(build_dir, manifest)
+        except Exception:
+            discard_build_dir(build_dir)
+            raise
+        
+        reindex_jobs.update(job_id, stage="bascule")
+        activate_dir(PERSIST_DIR, build_dir)
+        self._swap_index(new_index, self.embed_model, build_dir)
+        
+        print(f"✅ Réindexation incrémentale terminée: {stats}")
+        
+        return {
+            "message": "Réindexation incrémentale terminée avec succès.",
+            "mode": "incremental",
+            "count": len(file_hashes),
+            **stats
+        }
+    
+    def _sync_databases(self, job_id: str, active_dir: str):
+        """
+        Applique à l'index les enregistrements modifiés depuis le dernier watermark.
+        
+        Les changements sont lus en flux ; l'index actif n'est copié que s'il y
+        en a au moins un. L'état de synchronisation est enregistré avec la
+        nouvelle version de l'index, et n'avance donc que si elle est activée.
+        """
+        print("🔄 Synchronisation des bases de données en cours...")
+        
+        reindex_jobs.update(job_id, stage="lecture des changements")
+        state = self._load_sync_state(active_dir)
+        changes = iter_database_changes(state)
+        first_change = next(changes, None)
+        
+        stats = {
+            "records_inserted": 0,
+            "records_updated": 0,
+            "records_deleted": 0
+        }
+        if first_change is None:
+            print("✅ Aucun changement dans les bases, index inchangé.")
+            return {
+                "message": "Aucun changement détecté.",
+                "mode": "db",
+                **stats
+            }
+        
+        reindex_jobs.update(job_id, stage="copie de l'index actif")
+        build_dir = new_build_dir(PERSIST_DIR)
+        try:
+            new_index = self._copy_active_index(active_dir, build_dir)
             
-            self.index.storage_context.persist(persist_dir=PERSIST_DIR)
-            print("✅ Réindexation terminée avec succès.")
+            reindex_jobs.update(job_id, stage="application des changements")
+            self._apply_record_changes(job_id, new_index, itertools.chain([first_change], changes), stats)
             
+            reindex_jobs.update(job_id, stage="sauvegarde")
+            new_index.storage_context.persist(persist_dir=build_dir)
+            save_sync_state(build_dir, state)
+        except Exception:
+            discard_build_dir(build_dir)
+            raise
+        
+        reindex_jobs.update(job_id, stage="bascule")
+        activate_dir(PERSIST_DIR, build_dir)
+        self._swap_index(new_index, self.embed_model, build_dir)
+        
+        print(f"✅ Synchronisation des bases terminée: {stats}")
+        
+        return {
+            "message": "Synchronisation des bases terminée avec succès.",
+            "mode": "db",
+            **stats
+        }
+    
+    def _apply_record_changes(self, job_id: str, index, changes, stats: Dict):
+        """
+        Applique des changements d'enregistrements ("upsert" / "delete") à un index.
+        
+        Les changements sont traités par lots de EVENTS_BATCH_SIZE : les nœuds
+        des enregistrements ajoutés ou modifiés d'un lot sont insérés ensemble,
+        soit un appel au modèle d'embedding par lot plutôt que par enregistrement.
+        """
+        changes = iter(changes)
+        while True:
+            batch = list(itertools.islice(changes, EVENTS_BATCH_SIZE))
+            if not batch:
+                break
+            self._commit_record_changes(index, *self._prepare_record_changes(index, batch, stats))
+            reindex_jobs.update(job_id, progress=dict(stats))
+    
+    def _prepare_record_changes(self, index, changes, stats: Dict):
+        """
+        Prépare un lot de changements sans modifier l'index : documents à
+        retirer, nœuds à insérer (embeddings calculés) et empreintes des
+        documents insérés.
+        """
+        deleted: List[str] = []
+        upserts: Dict[str, Any] = {}
+        for kind, payload in changes:
+            doc_id = payload if kind == "delete" else payload.doc_id
+            upserts.pop(doc_id, None)
+            if doc_id not in deleted and index.docstore.get_document_hash(doc_id) is not None:
+                deleted.append(doc_id)
+                stats["records_deleted" if kind == "delete" else "records_updated"] += 1
+            elif kind != "delete":
+                stats["records_inserted"] += 1
+            if kind != "delete":
+                upserts[doc_id] = payload
+        
+        nodes = run_transformations(list(upserts.values()), INDEX_TRANSFORMATIONS) if upserts else []
+        if nodes:
+            embeddings = embed_nodes(nodes, self.embed_model)
+            for node in nodes:
+                node.embedding = embeddings[node.node_id]
+        hashes = {doc_id: document.hash for doc_id, document in upserts.items()}
+        return deleted, nodes, hashes
+    
+    def _commit_record_changes(self, index, deleted: List[str], nodes: List, hashes: Dict[str, str]):
+        """Applique à l'index un lot préparé par `_prepare_record_changes` (sans appel au modèle d'embedding)."""
+        for doc_id in deleted:
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+        if nodes:
+            index.insert_nodes(nodes)
+        for doc_id, doc_hash in hashes.items():
+            index.docstore.set_document_hash(doc_id, doc_hash)
+    
+    def _apply_record_events(self, job_id: str, active_dir: str, events: List[Dict]):
+        """
+        Applique un lot d'événements publiés par les services à l'index courant.
+        
+        Le lot est appliqué en place (pas de copie de l'index) : les embeddings
+        sont calculés, le lot est ajouté au journal de la version chargée par ce
+        worker (la version active : la tâche s'exécute sous `storage_lock`, après
+        `_refresh_index`), puis l'index est modifié sous `index_lock` (les
+        recherches attendent quelques millisecondes) ; les autres workers
+        rejouent le lot depuis le journal. Seules les réponses en cache ayant pu interroger les
+        domaines concernés sont invalidées. Au-delà de EVENTS_JOURNAL_MAX
+        enregistrements journalisés, le lot est appliqué à une nouvelle
+        version de l'index, qui intègre le journal (compaction).
+        """
+        stats = {
+            "events": len(events),
+            "records_inserted": 0,
+            "records_updated": 0,
+            "records_deleted": 0
+        }
+        
+        state = self._load_sync_state(active_dir)
+        changes = [change for change in (record_event_change(state, event) for event in events) if change]
+        if not changes:
             return {
-                "message": "Réindexation terminée avec succès.",
-                "count": len(documents)
+                "message": "Enregistrements déjà à jour dans l'index.",
+                "mode": "events",
+                **stats
             }
+        shards = sorted({SHARD_BY_SERVICE[event["service"]] for event in events})
         
-        except Exception as e:
-            print(f"❌ Erreur lors de la réindexation: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
+        if journal_size(read_journal(self.index_dir)) + len(changes) <= EVENTS_JOURNAL_MAX:
+            reindex_jobs.update(job_id, stage="calcul des embeddings")
+            deleted, nodes, hashes = self._prepare_record_changes(self.index, changes, stats)
+            
+            reindex_jobs.update(job_id, stage="journalisation")
+            append_journal(self.index_dir, {
+                "events": events,
+                "deleted": deleted,
+                "nodes": [doc_to_json(node) for node in nodes],
+                "hashes": hashes
+            })
+            
+            reindex_jobs.update(job_id, stage="application des changements")
+            with self.index_lock.write():
+                self._commit_record_changes(self.index, deleted, nodes, hashes)
+            self._journal_applied += 1
+            self._journal_bytes = journal_file_size(self.index_dir)
+            self._invalidate_cache(shards)
+            logger.debug("Événements appliqués en place à l'index: %s", stats)
+            
+            return {
+                "message": "Événements appliqués à l'index.",
+                "mode": "events",
+                **stats
+            }
+        
+        reindex_jobs.update(job_id, stage="copie de l'index actif")
+        build_dir = new_build_dir(PERSIST_DIR)
+        try:
+            new_index = self._copy_active_index(active_dir, build_dir)
+            
+            reindex_jobs.update(job_id, stage="application des changements")
+            self._apply_record_changes(job_id, new_index, changes, stats)
+            
+            reindex_jobs.update(job_id, stage="sauvegarde")
+            new_index.storage_context.persist(persist_dir=build_dir)
+            save_sync_state(build_dir, state)
+        except Exception:
+            discard_build_dir(build_dir)
+            raise
+        
+        reindex_jobs.update(job_id, stage="bascule")
+        activate_dir(PERSIST_DIR, build_dir)
+        self._swap_index(new_index, self.embed_model, build_dir, shards=shards)
+        logger.debug("Événements appliqués à une nouvelle version de l'index (journal intégré): %s", stats)
+        
+        return {
+            "message": "Événements appliqués à l'index (journal intégré à une nouvelle version).",
+            "mode": "events",
+            **stats
+        }
+    
+    async def ingest_record_events(self, events: List[RecordEvent]):
+        """
+        Reçoit des événements de changement et planifie leur application.
+        
+        Les événements sont mis en attente puis appliqués par lots en
+        arrière-plan (un lot toutes les EVENTS_BATCH_WINDOW secondes au plus).
+        """
+        unknown = sorted({
+            f"{event.service}.{event.table}" for event in events
+            if event.table not in DB_SOURCES.get(event.service, {}).get("tables", {})
+        })
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Table(s) non indexée(s): {', '.join(unknown)}"
+            )
+        if any(event.event != "deleted" and not event.record for event in events):
+            raise HTTPException(
+                status_code=400,
+                detail="Le champ record est requis sauf pour les événements \"deleted\"."
+            )
+        
+        pending = self.record_events.add([event.dict() for event in events])
+        if self._events_task is None or self._events_task.done():
+            self._events_task = asyncio.create_task(self._flush_record_events())
+        return {"accepted": len(events), "pending": pending}
+    
+    async def _flush_record_events(self):
+        """Applique les événements en attente, lot par lot, jusqu'à vider le tampon."""
+        retry_delay = EVENTS_BATCH_WINDOW
+        while len(self.record_events):
+            # Laisser arriver les événements suivants pour les grouper
+            await asyncio.sleep(retry_delay)
+            if self.index is None:
+                if self.startup["status"] == "failed":
+                    # Aucun index à mettre à jour : les enregistrements seront repris par
+                    # la synchronisation des bases lancée au prochain chargement de l'index
+                    dropped = self.record_events.discard()
+                    print(f"⚠️ Index indisponible, {dropped} événement(s) ignoré(s)")
+                    return
+                # Index en cours de chargement : les événements restent en attente
+                continue
+            batch = self.record_events.drain()
+            
+            job = reindex_jobs.create("events")
+            if job is None:
+                # Une réindexation est en cours : le lot attend la suivante
+                self.record_events.requeue(batch)
+                continue
+            
+            self._reindex_task = asyncio.create_task(
+                asyncio.to_thread(self._run_reindex_job, job["job_id"], "events", batch)
+            )
+            await self._reindex_task
+            
+            if (reindex_jobs.get(job["job_id"]) or {}).get("status") == "failed":
+                self.record_events.requeue(batch)
+                retry_delay = min(retry_delay * 2, EVENTS_MAX_RETRY_DELAY)
+            else:
+                retry_delay = EVENTS_BATCH_WINDOW
+    
+    def start_db_sync_schedule(self, interval: float = DB_SYNC_INTERVAL):
+        """Lance la synchronisation périodique des bases (si `interval` > 0)."""
+        if interval <= 0 or self._db_sync_task is not None:
+            return
+        print(f"⏱️ Synchronisation des bases toutes les {interval:g} s")
+        self._db_sync_task = asyncio.create_task(self._db_sync_loop(interval))
+    
+    async def _db_sync_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reindex_documents("db")
+            except HTTPException as e:
+                # Une réindexation est déjà en cours : on attend le prochain passage
+                logger.debug("Synchronisation des bases reportée: %s", e.detail)
+    
+    def start_index_refresh(self, interval: float = INDEX_REFRESH_INTERVAL):
+        """
+        Lance la vérification périodique de la version active et de son journal (si `interval` > 0).
+        
+        Avec plusieurs workers uvicorn, une réindexation n'est exécutée que par
+        l'un d'eux : les autres chargent la nouvelle version dès qu'elle est activée
+        et rejouent les événements que l'autre worker a journalisés.
+        """
+        if interval <= 0 or self._refresh_task is not None:
+            return
+        self._refresh_task = asyncio.create_task(self._index_refresh_loop(interval))
+    
+    async def _index_refresh_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            if self.index is None:
+                continue
+            try:
+                await asyncio.to_thread(self._sync_with_storage)
+            except Exception as e:
+                print(f"⚠️ Mise à jour de l'index depuis le stockage impossible: {str(e)}")
+    
+    def _version_changed(self) -> bool:
+        """Vrai si la version active n'est plus celle chargée par ce worker (sans verrou)."""
+        return os.path.abspath(get_active_dir(PERSIST_DIR)) != os.path.abspath(self.index_dir)
+    
+    def _index_changed(self) -> bool:
+        """Vrai si la version active ou son journal ont changé depuis le chargement (sans verrou)."""
+        return self._version_changed() or journal_file_size(self.index_dir) != self._journal_bytes
+    
+    def _sync_with_storage(self):
+        """Met à jour l'index si un autre worker a activé une version ou journalisé des événements."""
+        if self._index_changed():
+            with self.storage_lock:
+                self._refresh_index()
+    
+    def _refresh_index(self):
+        """
+        Met ce worker à jour d'après le stockage (appelé sous `storage_lock`).
+        
+        Une nouvelle version active est chargée ; les lots ajoutés au journal
+        de la version chargée par un autre worker sont rejoués en place.
+        """
+        if self.index is None or not self._index_changed():
+            return
+        if self._version_changed():
+            print("🔁 Nouvelle version de l'index activée par un autre worker, chargement...")
+            self._load_active_index(self.embed_model)
+            return
+        
+        journal_bytes = journal_file_size(self.index_dir)
+        with self.index_lock.write():
+            entries = self._replay_journal(self.index_dir, self.index, start=self._journal_applied)
+        self._journal_applied += len(entries)
+        self._journal_bytes = journal_bytes
+        if entries:
+            self._invalidate_cache(sorted({
+                SHARD_BY_SERVICE[event["service"]] for entry in entries for event in entry["events"]
+            }))
+    
+    def _swap_index(self, new_index, embedding_model, index_dir: str, shards: Optional[List[str]] = None):
+        """
+        Remplace l'index courant (chargé depuis `index_dir`) et invalide tout ce qui en dépend.
+        
+        L'affectation de la référence est atomique : une requête en cours
+        termine sur l'ancien index, les suivantes utilisent le nouveau.
+        Quand seuls certains domaines ont changé (`shards`), seules les
+        réponses en cache ayant pu les interroger sont invalidées.
+        """
+        self.index = new_index
+        self.index_dir = index_dir
+        self._journal_applied = 0
+        self._journal_bytes = 0
+        self.embed_model = embedding_model
+        self.model_pool.reset_index()
+        self._invalidate_cache(shards)
+    
+    def _invalidate_cache(self, shards: Optional[List[str]] = None):
+        """Vide le cache sémantique, ou seulement les portées ayant pu interroger `shards`."""
+        if shards is None:
+            semantic_cache.clear()
+        else:
+            semantic_cache.invalidate(lambda scope: any(_scope_uses_shard(scope, shard) for shard in shards))
+    
+    def _get_vector_store_stats(self):
+        """Retourne les informations du vector store de l'index courant."""
+        if self.index is None:
+            return None
+        vector_store = self.index.vector_store
+        if isinstance(vector_store, (MmapVectorStore, ShardedVectorStore)):
+            return vector_store.get_stats()
+        return {"backend": "simple"}
     
     def get_health_status(self):
         """Retourne le statut de santé du service."""
         return {
             "status": "OK",
-            "index_loaded": self.index is not None
+            "index_loaded": self.index is not None,
+            "startup": self.startup,
+            "vector_store": self._get_vector_store_stats(),
+            "reindex_job": reindex_jobs.get_active(),
+            "record_events": self.record_events.get_stats(),
+            "query_executor": query_executor.get_stats(),
+            "model_pool": self.model_pool.get_stats(),
+            "semantic_cache": semantic_cache.get_stats(),
+            "parsed_documents": parsed_documents.get_stats(),
+            "single_flight": self.inflight_queries.get_stats()
         }
     
+    def get_readiness_status(self):
+        """Indique si le service peut répondre aux requêtes (index chargé) ; 503 sinon."""
+        if self.index is None:
+            raise HTTPException(
+                status_code=503,
+                detail={"ready": False, "startup": self.startup},
+                headers={"Retry-After": "5"}
+            )
+        return {"ready": True, "startup": self.startup}
+    
     def get_supported_models(self):
         """Retourne la liste des modèles supportés."""
         return {
@@ -395,6 +1954,11 @@ class RAGController:
                 "installation": "curl -fsSL https://ollama.ai/install.sh | sh",
                 "pull_models": "ollama pull llama3.2",
                 "embeddings": "BAAI/bge-small-en-v1.5 (HuggingFace)"
+            },
+            "offline": {
+                "models": OFFLINE_LLM_MODELS,
+                "requires": "Aucun (réponses simulées, pour les tests et benchmarks)",
+                "embeddings": f"hachage des mots, {HASH_EMBEDDING_DIM} dimensions (RAG_EMBEDDING_BACKEND=offline)"
             }
         }
 
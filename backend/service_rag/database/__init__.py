@@ -0,0 +1,14 @@
+"""
+Stockage des conversations pour le service RAG
+"""
+from .conversation_store import (
+    JsonConversationStore,
+    SQLiteConversationStore,
+    create_conversation_store
+)
+
+__all__ = [
+    "JsonConversationStore",
+    "SQLiteConversationStore",
+    "create_conversation_store"
+]
@@ -0,0 +1,493 @@
+"""
+Backends de stockage des conversations de TalentBot
+- JsonConversationStore : un fichier JSON par conversation (format historique)
+- SQLiteConversationStore : base SQLite en mode WAL, ajout de message en O(1)
+  et liste des conversations d'un utilisateur par requête indexée
+
+Les deux backends listent les conversations d'un utilisateur sans lire les
+messages, triées par `updated_at` décroissant, avec une pagination par curseur.
+
+Plusieurs workers peuvent partager le même stockage : `lock(conversation_id)`
+sérialise les écritures d'une conversation entre threads et entre processus,
+et `get_version(conversation_id)` permet de détecter qu'une copie en cache
+a été modifiée par un autre worker.
+"""
+import base64
+import binascii
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.locks import LockStripes
+
+
+LOCKS_DIRNAME = ".locks"
+
+
+class JsonConversationStore:
+    """Stockage historique : la conversation complète est réécrite à chaque message."""
+
+    backend = "json"
+
+    def __init__(self, storage_path: str):
+        self.storage_path = Path(storage_path)
+        self.storage_path.mkdir(exist_ok=True)
+        lock_dir = str(self.storage_path / LOCKS_DIRNAME)
+        self._conversation_locks = LockStripes(lock_dir, "conversation")
+        self._user_locks = LockStripes(lock_dir, "user")
+
+    def lock(self, conversation_id: str):
+        """Verrou d'écriture d'une conversation (threads et processus)."""
+        return self._conversation_locks.lock(conversation_id)
+
+    def get_version(self, conversation_id: str) -> Optional[Tuple]:
+        """Jeton qui change à chaque réécriture du fichier de la conversation."""
+        try:
+            stat = os.stat(self._get_conversation_file(conversation_id))
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _get_conversation_file(self, conversation_id: str) -> Path:
+        """Retourne le chemin du fichier de conversation."""
+        return self.storage_path / f"{conversation_id}.json"
+
+    def _get_user_index_file(self, user_id: str) -> Path:
+        """Retourne le chemin du fichier d'index utilisateur."""
+        return self.storage_path / f"user_{user_id}_index.json"
+
+    def create_conversation(self, conversation: Dict):
+        self.save_conversation(conversation)
+
+    def append_message(self, conversation: Dict, message: Dict):
+        """`conversation` contient déjà le message ajouté."""
+        self.save_conversation(conversation)
+
+    def save_summary(self, conversation: Dict):
+        """Enregistre le résumé glissant (`conversation["summary"]`)."""
+        self.save_conversation(conversation)
+
+    def save_conversation(self, conversation: Dict):
+        """Sauvegarde une conversation sur disque et met à jour l'index utilisateur."""
+        file_path = self._get_conversation_file(conversation["conversation_id"])
+        _write_json_atomic(file_path, conversation)
+
+        if conversation.get("user_id"):
+            self._update_user_index(conversation)
+
+    def load_conversation(self, conversation_id: str) -> Optional[Dict]:
+        file_path = self._get_conversation_file(conversation_id)
+        if not file_path.exists():
+            return None
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def exists(self, conversation_id: str) -> bool:
+        return self._get_conversation_file(conversation_id).exists()
+
+    def list_user_conversations(self, user_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Métadonnées des conversations d'un utilisateur, plus récentes en premier."""
+        return self.page_user_conversations(user_id, limit=limit)["conversations"]
+
+    def page_user_conversations(
+        self,
+        user_id: str,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        Page de métadonnées lue depuis l'index utilisateur (déjà trié),
+        sans ouvrir les fichiers de conversation.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        index = self._load_user_index(user_id)
+        return paginate_summaries(index["conversations"], limit, after)
+
+    def count_conversations(self) -> int:
+        return len(list(self.storage_path.glob("*.json"))) - len(list(self.storage_path.glob("user_*_index.json")))
+
+    def _load_user_index(self, user_id: str) -> Dict:
+        """
+        Charge l'index d'un utilisateur : ses conversations (métadonnées
+        seulement), triées par `updated_at` décroissant.
+        """
+        index_file = self._get_user_index_file(user_id)
+
+        if index_file.exists():
+            with open(index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        else:
+            index = {
+                "user_id": user_id,
+                "conversations": []
+            }
+
+        if "conversations" not in index:
+            # Ancien format (liste d'identifiants) : reconstruire une seule fois
+            conversations = []
+            for conv_id in index.get("conversation_ids", []):
+                conv = self.load_conversation(conv_id)
+                if conv:
+                    conversations.append(conversation_summary(conv))
+            index = {
+                "user_id": user_id,
+                "conversations": sort_summaries(conversations)
+            }
+            self._save_user_index(user_id, index)
+
+        return index
+
+    def _save_user_index(self, user_id: str, index: Dict):
+        _write_json_atomic(self._get_user_index_file(user_id), index)
+
+    def _update_user_index(self, conversation: Dict):
+        """Met à jour les métadonnées d'une conversation dans l'index de son utilisateur."""
+        user_id = conversation["user_id"]
+        with self._user_locks.lock(user_id):
+            index = self._load_user_index(user_id)
+
+            conversations = [
+                summary for summary in index["conversations"]
+                if summary["conversation_id"] != conversation["conversation_id"]
+            ]
+            conversations.append(conversation_summary(conversation))
+            index["conversations"] = sort_summaries(conversations)
+
+            self._save_user_index(user_id, index)
+
+    def describe(self) -> str:
+        return str(self.storage_path)
+
+
+class SQLiteConversationStore:
+    """
+    Stockage SQLite (mode WAL) : une ligne par conversation, une ligne par message.
+
+    Ajouter un message est un INSERT plus une mise à jour de la ligne de la
+    conversation, indépendamment de la longueur de l'historique.
+    """
+
+    backend = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS conversations (
+            conversation_id TEXT PRIMARY KEY,
+            user_id TEXT,
+            title TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            is_active INTEGER NOT NULL DEFAULT 1,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            summary TEXT,
+            summary_until INTEGER NOT NULL DEFAULT 0
+        );
+        DROP INDEX IF EXISTS idx_conversations_user_updated;
+        CREATE INDEX IF NOT EXISTS idx_conversations_user_page
+            ON conversations (user_id, updated_at DESC, conversation_id DESC);
+        CREATE TABLE IF NOT EXISTS messages (
+            conversation_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            sources TEXT NOT NULL DEFAULT '[]',
+            PRIMARY KEY (conversation_id, seq)
+        );
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._local = threading.local()
+        self._conversation_locks = LockStripes(
+            os.path.join(os.path.dirname(os.path.abspath(db_path)), LOCKS_DIRNAME),
+            "conversation"
+        )
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+            self._migrate_schema(conn)
+
+    def lock(self, conversation_id: str):
+        """
+        Verrou d'écriture d'une conversation (threads et processus).
+
+        Chaque écriture est déjà une transaction ; le verrou rend atomique la
+        séquence lecture-modification-écriture du gestionnaire de conversations.
+        """
+        return self._conversation_locks.lock(conversation_id)
+
+    def get_version(self, conversation_id: str) -> Optional[Tuple]:
+        """Jeton qui change à chaque écriture (lecture d'une ligne par clé primaire)."""
+        row = self._connect().execute(
+            "SELECT message_count, updated_at, title, is_active, summary_until "
+            "FROM conversations WHERE conversation_id = ?",
+            (conversation_id,)
+        ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def _migrate_schema(self, conn: sqlite3.Connection):
+        """Ajoute les colonnes du résumé glissant aux bases créées avant leur introduction."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(conversations)")}
+        if "summary" not in columns:
+            conn.execute("ALTER TABLE conversations ADD COLUMN summary TEXT")
+        if "summary_until" not in columns:
+            conn.execute("ALTER TABLE conversations ADD COLUMN summary_until INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Une connexion par thread (sqlite3 ne partage pas les connexions entre threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def create_conversation(self, conversation: Dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO conversations (conversation_id, user_id, title, created_at, updated_at, is_active, message_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (
+                    conversation["conversation_id"],
+                    conversation.get("user_id"),
+                    conversation["title"],
+                    conversation["created_at"],
+                    conversation["updated_at"],
+                    int(conversation.get("is_active", True))
+                )
+            )
+            for message in conversation.get("messages", []):
+                self._insert_message(conn, conversation, message)
+        if conversation.get("summary"):
+            self.save_summary(conversation)
+
+    def _insert_message(self, conn: sqlite3.Connection, conversation: Dict, message: Dict):
+        conn.execute(
+            "INSERT INTO messages (conversation_id, seq, role, content, timestamp, sources) "
+            "SELECT ?, message_count, ?, ?, ?, ? FROM conversations WHERE conversation_id = ?",
+            (
+                conversation["conversation_id"],
+                message["role"],
+                message["content"],
+                message["timestamp"],
+                json.dumps(message.get("sources") or [], ensure_ascii=False),
+                conversation["conversation_id"]
+            )
+        )
+        conn.execute(
+            "UPDATE conversations SET message_count = message_count + 1, updated_at = ?, title = ? "
+            "WHERE conversation_id = ?",
+            (conversation["updated_at"], conversation["title"], conversation["conversation_id"])
+        )
+
+    def append_message(self, conversation: Dict, message: Dict):
+        """Ajoute un seul message (l'historique existant n'est pas réécrit)."""
+        with self._connect() as conn:
+            self._insert_message(conn, conversation, message)
+
+    def save_summary(self, conversation: Dict):
+        """Enregistre le résumé glissant (`conversation["summary"]`)."""
+        summary = conversation.get("summary") or {}
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE conversations SET summary = ?, summary_until = ? WHERE conversation_id = ?",
+                (summary.get("text"), summary.get("covered_until", 0), conversation["conversation_id"])
+            )
+
+    def save_conversation(self, conversation: Dict):
+        """Met à jour les métadonnées d'une conversation (titre, état...)."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE conversations SET title = ?, updated_at = ?, is_active = ? WHERE conversation_id = ?",
+                (
+                    conversation["title"],
+                    conversation["updated_at"],
+                    int(conversation.get("is_active", True)),
+                    conversation["conversation_id"]
+                )
+            )
+
+    def load_conversation(self, conversation_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        # Lecture de la conversation et de ses messages dans un même instantané
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute(
+                "SELECT * FROM conversations WHERE conversation_id = ?",
+                (conversation_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            messages = conn.execute(
+                "SELECT role, content, timestamp, sources FROM messages WHERE conversation_id = ? ORDER BY seq",
+                (conversation_id,)
+            ).fetchall()
+        finally:
+            conn.commit()
+        conversation = self._row_to_conversation(row)
+        conversation["messages"] = [
+            {
+                "role": message["role"],
+                "content": message["content"],
+                "timestamp": message["timestamp"],
+                "sources": json.loads(message["sources"])
+            }
+            for message in messages
+        ]
+        return conversation
+
+    def exists(self, conversation_id: str) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM conversations WHERE conversation_id = ?",
+            (conversation_id,)
+        ).fetchone()
+        return row is not None
+
+    def list_user_conversations(self, user_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Métadonnées des conversations d'un utilisateur (requête indexée, sans les messages)."""
+        return self.page_user_conversations(user_id, limit=limit)["conversations"]
+
+    def page_user_conversations(
+        self,
+        user_id: str,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """Page de métadonnées, parcourue le long de l'index (user_id, updated_at, conversation_id)."""
+        query = "SELECT * FROM conversations WHERE user_id = ?"
+        params = [user_id]
+        if cursor:
+            updated_at, conversation_id = decode_cursor(cursor)
+            query += " AND (updated_at < ? OR (updated_at = ? AND conversation_id < ?))"
+            params.extend([updated_at, updated_at, conversation_id])
+        query += " ORDER BY updated_at DESC, conversation_id DESC"
+        if limit:
+            # Une ligne de plus pour savoir s'il existe une page suivante
+            query += " LIMIT ?"
+            params.append(limit + 1)
+
+        rows = self._connect().execute(query, params).fetchall()
+        summaries = [
+            {
+                "conversation_id": row["conversation_id"],
+                "title": row["title"],
+                "created_at": row["created_at"],
+                "updated_at": row["updated_at"],
+                "message_count": row["message_count"],
+                "is_active": bool(row["is_active"])
+            }
+            for row in rows
+        ]
+        return paginate_summaries(summaries, limit)
+
+    def count_conversations(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def _row_to_conversation(self, row: sqlite3.Row) -> Dict:
+        conversation = {
+            "conversation_id": row["conversation_id"],
+            "user_id": row["user_id"],
+            "title": row["title"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "is_active": bool(row["is_active"])
+        }
+        if row["summary"]:
+            conversation["summary"] = {
+                "text": row["summary"],
+                "covered_until": row["summary_until"]
+            }
+        return conversation
+
+    def describe(self) -> str:
+        return self.db_path
+
+
+def conversation_summary(conversation: Dict) -> Dict:
+    """Retourne seulement les métadonnées d'une conversation."""
+    return {
+        "conversation_id": conversation["conversation_id"],
+        "title": conversation["title"],
+        "created_at": conversation["created_at"],
+        "updated_at": conversation["updated_at"],
+        "message_count": len(conversation.get("messages", [])),
+        "is_active": conversation.get("is_active", True)
+    }
+
+
+def _write_json_atomic(path: Path, data: Dict):
+    """Écrit un fichier JSON via un fichier temporaire : les lecteurs ne voient jamais un fichier partiel."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def sort_summaries(summaries: List[Dict]) -> List[Dict]:
+    """Trie des métadonnées par `updated_at` décroissant (puis identifiant)."""
+    return sorted(
+        summaries,
+        key=lambda summary: (summary["updated_at"], summary["conversation_id"]),
+        reverse=True
+    )
+
+
+def encode_cursor(summary: Dict) -> str:
+    """Curseur opaque désignant la position d'une conversation dans la liste."""
+    raw = f"{summary['updated_at']}|{summary['conversation_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Retourne (updated_at, conversation_id), ou lève ValueError si le curseur est invalide."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError(f"Curseur invalide: {cursor}") from e
+    updated_at, sep, conversation_id = raw.partition("|")
+    if not sep or not updated_at or not conversation_id:
+        raise ValueError(f"Curseur invalide: {cursor}")
+    return updated_at, conversation_id
+
+
+def paginate_summaries(
+    summaries: List[Dict],
+    limit: Optional[int] = None,
+    after: Optional[Tuple[str, str]] = None
+) -> Dict:
+    """
+    Découpe une liste triée de métadonnées après la position `after`.
+
+    Retourne la page et le curseur de la page suivante (None s'il n'y en a pas).
+    """
+    if after is not None:
+        summaries = [
+            summary for summary in summaries
+            if (summary["updated_at"], summary["conversation_id"]) < after
+        ]
+
+    next_cursor = None
+    if limit and len(summaries) > limit:
+        summaries = summaries[:limit]
+        next_cursor = encode_cursor(summaries[-1])
+
+    return {
+        "conversations": summaries,
+        "next_cursor": next_cursor
+    }
+
+
+def create_conversation_store(backend: str, storage_path: str, db_path: str):
+    """Instancie le backend de stockage configuré ("json" ou "sqlite")."""
+    if backend == "sqlite":
+        return SQLiteConversationStore(db_path)
+    if backend == "json":
+        return JsonConversationStore(storage_path)
+    raise ValueError(f"Backend de conversations inconnu: {backend}")
@@ -0,0 +1,92 @@
+"""
+Migration des conversations JSON (./conversations/*.json) vers SQLite
+Les conversations déjà présentes dans la base sont ignorées : le script peut
+être relancé sans risque. Les fichiers JSON ne sont pas supprimés.
+
+Usage (depuis backend/service_rag) :
+    python database/migrate_conversations.py
+    python database/migrate_conversations.py --source ./conversations --db ./conversations/conversations.db
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# Permet l'import de database.* quand le script est lancé directement
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_RAG_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SERVICE_RAG_DIR)
+
+from database.conversation_store import SQLiteConversationStore  # noqa: E402
+
+
+DEFAULT_SOURCE = os.path.join(SERVICE_RAG_DIR, "conversations")
+DEFAULT_DB = os.path.join(SERVICE_RAG_DIR, "conversations", "conversations.db")
+
+
+def migrate_conversations(source_dir: str, db_path: str):
+    """Importe chaque fichier de conversation JSON dans la base SQLite."""
+    print("=" * 60)
+    print("🚀 MIGRATION DES CONVERSATIONS JSON VERS SQLITE")
+    print("=" * 60)
+
+    source = Path(source_dir)
+    if not source.exists():
+        print(f"❌ Erreur: Le dossier source '{source_dir}' n'existe pas")
+        return
+
+    store = SQLiteConversationStore(db_path)
+    print(f"📁 Source: {source_dir}")
+    print(f"🗄️  Base de données: {db_path}\n")
+
+    migrated_count = 0
+    skipped_count = 0
+    message_count = 0
+    error_count = 0
+
+    files = sorted(
+        path for path in source.glob("*.json")
+        if not (path.name.startswith("user_") and path.name.endswith("_index.json"))
+    )
+
+    for file_path in files:
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                conversation = json.load(f)
+
+            if store.exists(conversation["conversation_id"]):
+                skipped_count += 1
+                continue
+
+            conversation.setdefault("title", "Nouvelle conversation")
+            conversation.setdefault("is_active", True)
+            conversation.setdefault("updated_at", conversation.get("created_at"))
+            store.create_conversation(conversation)
+
+            migrated_count += 1
+            message_count += len(conversation.get("messages", []))
+        except Exception as e:
+            print(f"   ❌ {file_path.name} - Erreur: {e}")
+            error_count += 1
+
+    # Résumé
+    print("=" * 60)
+    print("✅ Migration terminée!")
+    print(f"💬 {migrated_count} conversation(s) migrée(s) ({message_count} message(s))")
+    print(f"⏭️  {skipped_count} conversation(s) déjà présente(s)")
+    if error_count > 0:
+        print(f"❌ {error_count} erreur(s)")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migration des conversations JSON vers SQLite")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="Dossier des conversations JSON")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Chemin de la base SQLite")
+    args = parser.parse_args()
+
+    migrate_conversations(args.source, args.db)
+
+    print("\n💡 Prochaine étape:")
+    print("   Définir RAG_CONVERSATION_BACKEND=sqlite puis redémarrer le service RAG")
@@ -6,12 +6,14 @@ import os
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from controllers.rag_controller import rag_controller
-from routes import router
 
-# Charger les variables d'environnement
+# Charger les variables d'environnement (avant les contrôleurs qui lisent leur configuration)
 load_dotenv()
 
+from controllers.rag_controller import rag_controller
+from routes import router
+from utils.query_executor import query_executor
+
 # Configuration de l'application FastAPI
 app = FastAPI(
     title="Service RAG - TalentLink",
@@ -35,8 +37,16 @@ app.include_router(router, prefix="/rag", tags=["RAG"])
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialisation de l'index au démarrage de l'application."""
-    await rag_controller.initialize_index()
+    """Chargement de l'index en arrière-plan : le serveur accepte les connexions sans attendre."""
+    rag_controller.start_initialization()
+    rag_controller.start_db_sync_schedule()
+    rag_controller.start_index_refresh()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Arrêt propre du pool d'exécution des requêtes."""
+    query_executor.shutdown()
 
 
 if __name__ == "__main__":
@@ -1,22 +1,44 @@
 """
 Modèles pour le service RAG
 """
-from .rag_models import QueryRequest, SourceInfo, QueryResponse
+from .rag_models import (
+    QueryRequest,
+    SourceInfo,
+    QueryResponse,
+    BatchQueryRequest,
+    BatchQueryItem,
+    BatchQueryResponse,
+    RetrieveRequest,
+    RetrievedNode,
+    RetrieveResponse,
+    RecordEvent,
+    RecordEventBatch
+)
 from .conversation_models import (
     Message, 
     Conversation, 
     QueryWithContext, 
     ConversationListResponse,
-    ConversationResponse
+    ConversationResponse,
+    MessagesPageResponse
 )
 
 __all__ = [
     "QueryRequest", 
     "SourceInfo", 
     "QueryResponse",
+    "BatchQueryRequest",
+    "BatchQueryItem",
+    "BatchQueryResponse",
+    "RetrieveRequest",
+    "RetrievedNode",
+    "RetrieveResponse",
+    "RecordEvent",
+    "RecordEventBatch",
     "Message",
     "Conversation",
     "QueryWithContext",
     "ConversationListResponse",
-    "ConversationResponse"
+    "ConversationResponse",
+    "MessagesPageResponse"
 ]
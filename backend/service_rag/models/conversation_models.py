@@ -1,7 +1,7 @@
 """
 Modèles pour les conversations avec historique
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -33,19 +33,41 @@ class QueryWithContext(BaseModel):
     top_k: int = 5
     model_type: str = "openai"
     model_name: str = "gpt-4o-mini"
+    filters: Optional[Dict[str, Any]] = None  # Filtres sur les métadonnées (voir QueryRequest)
+    shards: Optional[List[str]] = None  # Domaines interrogés d'un index partitionné (voir QueryRequest)
+    include_history: bool = False  # True : renvoyer tout l'historique
+    since_index: Optional[int] = None  # Renvoyer les messages à partir de cet indice
 
 
 class ConversationListResponse(BaseModel):
     """Modèle pour la liste des conversations."""
     conversations: List[dict]
     total: int
+    next_cursor: Optional[str] = None
 
 
 class ConversationResponse(BaseModel):
-    """Modèle de réponse avec conversation complète."""
+    """
+    Modèle de réponse d'un tour de conversation.
+    
+    Par défaut, `conversation_history` ne contient que les messages de ce tour
+    (question et réponse) ; `history_start_index` est l'indice du premier
+    d'entre eux et `message_count` le nombre total de messages.
+    """
     conversation_id: str
     question: str
     answer: str
     model_used: str
     sources: List[dict] = []
     conversation_history: List[dict] = []
+    history_start_index: int = 0
+    message_count: int = 0
+
+
+class MessagesPageResponse(BaseModel):
+    """Page de messages d'une conversation (des plus anciens aux plus récents)."""
+    conversation_id: str
+    messages: List[dict]
+    start_index: int
+    total: int
+    has_more: bool  # Des messages plus anciens existent avant `start_index`
@@ -1,7 +1,7 @@
 """
 Modèles de données pour le service RAG
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional, Union
 from pydantic import BaseModel
 
 
@@ -9,8 +9,14 @@ class QueryRequest(BaseModel):
     """Modèle de requête pour poser une question."""
     question: str
     top_k: int = 5  # Nombre de passages similaires à récupérer
-    model_type: str = "openai"  # Type de modèle: 'openai' ou 'ollama'
+    model_type: str = "openai"  # Type de modèle: 'openai', 'ollama' ou 'offline'
     model_name: str = "gpt-4o-mini"  # Nom du modèle
+    # Filtres sur les métadonnées (ex. {"entity_type": "offre", "statut": "published"}) ;
+    # sans filtre, ils sont déduits de la question lorsque c'est possible
+    filters: Optional[Dict[str, Any]] = None
+    # Domaines interrogés d'un index partitionné ("docs", "offers", "profiles", "appointments") ;
+    # sans précision, ils sont choisis d'après les filtres et la question
+    shards: Optional[List[str]] = None
 
 
 class SourceInfo(BaseModel):
@@ -28,3 +34,69 @@ class QueryResponse(BaseModel):
     answer: str
     model_used: str
     sources: List[SourceInfo] = []
+
+
+class BatchQueryRequest(BaseModel):
+    """Modèle de requête pour poser plusieurs questions en un appel."""
+    questions: List[str]
+    top_k: int = 5
+    model_type: str = "openai"
+    model_name: str = "gpt-4o-mini"
+    filters: Optional[Dict[str, Any]] = None  # Appliqués à toutes les questions (voir QueryRequest)
+    shards: Optional[List[str]] = None  # Domaines interrogés pour toutes les questions (voir QueryRequest)
+    max_concurrency: Optional[int] = None  # Générations simultanées (plafonnées par RAG_BATCH_CONCURRENCY)
+
+
+class BatchQueryItem(BaseModel):
+    """Résultat d'une question du lot : réponse ou erreur propre à cette question."""
+    index: int
+    question: str
+    answer: Optional[str] = None
+    sources: List[SourceInfo] = []
+    error: Optional[str] = None
+
+
+class BatchQueryResponse(BaseModel):
+    """Modèle de réponse d'un lot (résultats dans l'ordre des questions)."""
+    model_used: str
+    results: List[BatchQueryItem] = []
+
+
+class RetrieveRequest(BaseModel):
+    """Modèle de requête pour une recherche sans génération (retrieval seul)."""
+    question: str
+    top_k: int = 5
+    # Filtres sur les métadonnées : {"cle": valeur} (égalité) ou {"cle": [v1, v2]} (appartenance)
+    filters: Optional[Dict[str, Any]] = None
+    shards: Optional[List[str]] = None  # Domaines interrogés (voir QueryRequest)
+
+
+class RetrievedNode(BaseModel):
+    """Modèle pour un passage retrouvé."""
+    node_id: str
+    score: Optional[float] = None
+    text: str
+    document_name: str
+    page_number: Optional[int] = None
+    metadata: Dict[str, Any] = {}
+
+
+class RetrieveResponse(BaseModel):
+    """Modèle de réponse pour une recherche sans génération."""
+    question: str
+    nodes: List[RetrievedNode] = []
+
+
+class RecordEvent(BaseModel):
+    """Changement d'un enregistrement publié par un service (ex. offre créée ou fermée)."""
+    event: Literal["created", "updated", "published", "closed", "deleted"]
+    service: str  # ex. "service_offers"
+    table: str  # ex. "offers"
+    record_id: Union[int, str]
+    # Ligne de la table après le changement (absente pour "deleted")
+    record: Optional[Dict[str, Any]] = None
+
+
+class RecordEventBatch(BaseModel):
+    """Lot d'événements, dans l'ordre où ils se sont produits."""
+    events: List[RecordEvent]
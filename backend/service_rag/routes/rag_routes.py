@@ -1,15 +1,28 @@
 """
 Routes pour le service RAG avec support des conversations
 """
+import asyncio
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
-from models.rag_models import QueryRequest, QueryResponse
+from models.rag_models import (
+    QueryRequest,
+    QueryResponse,
+    BatchQueryRequest,
+    BatchQueryResponse,
+    RetrieveRequest,
+    RetrieveResponse,
+    RecordEventBatch
+)
 from models.conversation_models import (
     QueryWithContext,
     ConversationResponse,
-    ConversationListResponse
+    ConversationListResponse,
+    MessagesPageResponse
 )
 from controllers.rag_controller import rag_controller
 from controllers.conversation_manager import conversation_manager
+from utils.semantic_cache import semantic_cache
 
 router = APIRouter()
 
@@ -29,16 +42,53 @@ async def root():
 
 @router.get("/health")
 async def health_check():
-    """Endpoint pour vérifier la santé de l'API."""
+    """
+    Endpoint pour vérifier la santé de l'API (liveness).
+    
+    Répond dès le démarrage du serveur, y compris pendant le chargement de l'index.
+    """
     return rag_controller.get_health_status()
 
 
+@router.get("/ready")
+async def readiness_check():
+    """Endpoint de disponibilité (readiness) : 200 une fois l'index chargé, 503 avant."""
+    return rag_controller.get_readiness_status()
+
+
 @router.post("/query", response_model=QueryResponse)
 async def query_documents(request: QueryRequest):
     """Endpoint pour poser une question simple (sans conversation)."""
     return await rag_controller.query_documents(request)
 
 
+@router.post("/query/batch", response_model=BatchQueryResponse)
+async def query_documents_batch(request: BatchQueryRequest):
+    """
+    Endpoint pour poser plusieurs questions en un appel (outils internes, évaluations).
+    
+    Les questions sont embeddées en un seul lot et recherchées ensemble ;
+    les réponses sont générées en parallèle (au plus **max_concurrency** à la fois).
+    Les résultats sont renvoyés dans l'ordre des questions, avec une
+    erreur par question le cas échéant.
+    """
+    return await rag_controller.query_documents_batch(request)
+
+
+@router.post("/retrieve", response_model=RetrieveResponse)
+async def retrieve_documents(request: RetrieveRequest):
+    """
+    Endpoint de recherche seule : retourne les passages les plus pertinents
+    (score et métadonnées) sans génération par le LLM.
+    
+    - **question**: Le texte à rechercher
+    - **top_k**: Nombre de passages à retourner
+    - **filters** (optionnel): Filtres sur les métadonnées, ex. {"entity_type": "offre", "statut": "published"}
+    - **shards** (optionnel): Domaines interrogés d'un index partitionné, ex. ["offers", "profiles"]
+    """
+    return await rag_controller.retrieve_documents(request)
+
+
 @router.post("/chat", response_model=ConversationResponse)
 async def chat_with_context(request: QueryWithContext):
     """
@@ -53,15 +103,33 @@ async def chat_with_context(request: QueryWithContext):
     return await rag_controller.query_with_conversation(request)
 
 
+@router.post("/chat/stream")
+async def chat_with_context_stream(request: QueryWithContext):
+    """
+    Variante en streaming de /chat (Server-Sent Events).
+    
+    Émet `conversation`, `sources`, puis les `token` au fil de la génération,
+    et enfin `done` avec la réponse complète (ou `error`).
+    """
+    return await rag_controller.stream_with_conversation(request)
+
+
 @router.get("/conversations/{user_id}", response_model=ConversationListResponse)
-async def get_user_conversations(user_id: str, limit: int = 20):
-    """Récupère la liste des conversations d'un utilisateur."""
+async def get_user_conversations(user_id: str, limit: int = 20, cursor: Optional[str] = None):
+    """
+    Récupère la liste des conversations d'un utilisateur (plus récentes en premier).
+    
+    Passer `next_cursor` de la réponse comme `cursor` pour obtenir la page suivante.
+    """
     try:
-        conversations = conversation_manager.get_user_conversations(user_id, limit=limit)
+        page = conversation_manager.get_user_conversations_page(user_id, limit=limit, cursor=cursor)
         return ConversationListResponse(
-            conversations=conversations,
-            total=len(conversations)
+            conversations=page["conversations"],
+            total=len(page["conversations"]),
+            next_cursor=page["next_cursor"]
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -86,6 +154,35 @@ async def get_conversation(user_id: str, conversation_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/conversations/{user_id}/{conversation_id}/messages", response_model=MessagesPageResponse)
+async def get_conversation_messages(
+    user_id: str,
+    conversation_id: str,
+    before: Optional[int] = None,
+    limit: int = 20
+):
+    """
+    Récupère une page de l'historique d'une conversation.
+    
+    Sans `before`, retourne les `limit` derniers messages ; passer ensuite
+    `before=start_index` pour remonter vers les messages plus anciens.
+    """
+    try:
+        page = conversation_manager.get_messages_page(conversation_id, before=before, limit=limit)
+        
+        if page is None:
+            raise HTTPException(status_code=404, detail="Conversation introuvable")
+        
+        if conversation_manager.get_conversation(conversation_id).get("user_id") != user_id:
+            raise HTTPException(status_code=403, detail="Accès refusé")
+        
+        return MessagesPageResponse(**page)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/conversations/{user_id}/{conversation_id}")
 async def delete_conversation(user_id: str, conversation_id: str):
     """Supprime une conversation."""
@@ -98,7 +195,7 @@ async def delete_conversation(user_id: str, conversation_id: str):
         if conversation.get("user_id") != user_id:
             raise HTTPException(status_code=403, detail="Accès refusé")
         
-        success = conversation_manager.delete_conversation(conversation_id)
+        success = await asyncio.to_thread(conversation_manager.delete_conversation, conversation_id)
         
         if success:
             return {"message": "Conversation supprimée", "conversation_id": conversation_id}
@@ -117,10 +214,60 @@ async def get_conversation_stats():
     return conversation_manager.get_statistics()
 
 
-@router.post("/reindex")
-async def reindex_documents():
-    """Endpoint pour réindexer les documents dans le dossier ./data."""
-    return await rag_controller.reindex_documents()
+@router.post("/reindex", status_code=202)
+async def reindex_documents(mode: str = "incremental", shard: Optional[str] = None):
+    """
+    Endpoint pour lancer la réindexation des documents du dossier ./data
+    et des bases de données des services.
+    
+    La réindexation s'exécute en arrière-plan ; l'index courant continue de
+    répondre jusqu'à la bascule. Suivre l'avancement via /reindex/{job_id}.
+    
+    - **mode**: "incremental" (fichiers ajoutés/modifiés/supprimés seulement),
+      "db" (enregistrements des bases modifiés depuis la dernière synchronisation)
+      ou "full"
+    - **shard** (optionnel, avec mode "full"): ne reconstruire que ce domaine
+      d'un index partitionné ("docs", "offers", "profiles" ou "appointments")
+    """
+    return await rag_controller.reindex_documents(mode=mode, shard=shard)
+
+
+@router.get("/reindex/jobs")
+async def list_reindex_jobs():
+    """Liste les dernières tâches de réindexation."""
+    return rag_controller.list_reindex_jobs()
+
+
+@router.get("/reindex/{job_id}")
+async def get_reindex_job(job_id: str):
+    """Récupère l'état et la progression d'une tâche de réindexation."""
+    return rag_controller.get_reindex_job(job_id)
+
+
+@router.post("/events", status_code=202)
+async def ingest_record_events(batch: RecordEventBatch):
+    """
+    Endpoint appelé par les services (ex. service_offers) à chaque changement
+    d'un enregistrement indexé : l'index est mis à jour en quelques secondes,
+    sans réindexation complète.
+    
+    Les événements sont regroupés puis appliqués par lots en arrière-plan.
+    - **events**: liste de {event, service, table, record_id, record}
+    """
+    return await rag_controller.ingest_record_events(batch.events)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Récupère les compteurs du cache sémantique des réponses."""
+    return semantic_cache.get_stats()
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """Vide le cache sémantique des réponses."""
+    semantic_cache.clear()
+    return {"message": "Cache vidé"}
 
 
 @router.get("/models")
@@ -0,0 +1,76 @@
+"""
+Synchronisation des bases de données des services vers l'index RAG
+Remplace les anciens scripts 1_extract_db_to_json / 2_move_data_extract_at_data /
+3_convert_json_to_text suivis d'une réindexation complète : le service RAG lit
+directement les enregistrements modifiés depuis la dernière synchronisation
+(voir utils/db_sync.py) et les applique à son index.
+
+Pour une synchronisation automatique toutes les N secondes, définir plutôt
+RAG_DB_SYNC_INTERVAL=N dans le .env du service.
+
+Usage (service RAG démarré) :
+    python sequence_update_info_rag/sync_db_to_rag.py
+    python sequence_update_info_rag/sync_db_to_rag.py --url http://localhost:8008 --full
+"""
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+
+DEFAULT_URL = os.getenv("RAG_SERVICE_URL", f"http://localhost:{os.getenv('RAG_SERVICE_PORT', 8008)}")
+POLL_INTERVAL = 2
+
+
+def sync_databases(base_url: str, mode: str) -> bool:
+    """Lance la tâche de synchronisation puis suit son avancement jusqu'à la fin."""
+    print("=" * 60)
+    print("🚀 SYNCHRONISATION DES BASES DE DONNÉES VERS LE RAG")
+    print("=" * 60)
+
+    response = requests.post(f"{base_url}/rag/reindex", params={"mode": mode}, timeout=30)
+    if response.status_code == 409:
+        print(f"⚠️  {response.json().get('detail')}")
+        return False
+    response.raise_for_status()
+
+    job = response.json()
+    print(f"📋 Tâche {job['job_id']} lancée (mode {mode})")
+
+    last_stage = None
+    while job["status"] in ("pending", "running"):
+        time.sleep(POLL_INTERVAL)
+        job = requests.get(f"{base_url}/rag/reindex/{job['job_id']}", timeout=30).json()
+        if job["stage"] != last_stage:
+            print(f"   ⏳ {job['stage']}")
+            last_stage = job["stage"]
+
+    print("=" * 60)
+    if job["status"] != "succeeded":
+        print(f"❌ Échec: {job['error']}")
+        print("=" * 60)
+        return False
+
+    result = job["result"]
+    print(f"✅ {result['message']}")
+    for key in ("records_inserted", "records_updated", "records_deleted", "count"):
+        if key in result:
+            print(f"   {key}: {result[key]}")
+    print("=" * 60)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synchronisation des bases de données vers l'index RAG")
+    parser.add_argument("--url", default=DEFAULT_URL, help="URL du service RAG")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Reconstruire tout l'index (fichiers de ./data et toutes les bases)"
+    )
+    args = parser.parse_args()
+
+    success = sync_databases(args.url.rstrip("/"), "full" if args.full else "db")
+    sys.exit(0 if success else 1)
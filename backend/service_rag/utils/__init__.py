@@ -0,0 +1,6 @@
+"""
+Utilitaires pour le service RAG
+"""
+from .query_executor import query_executor
+
+__all__ = ["query_executor"]
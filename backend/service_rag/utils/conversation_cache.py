@@ -0,0 +1,148 @@
+"""
+Cache LRU borné des conversations actives de TalentBot
+Limite le nombre de conversations et la mémoire occupée par leurs messages,
+et évince les conversations inactives depuis trop longtemps
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+# CONFIGURATION
+CONVERSATION_CACHE_MAX_ENTRIES = int(os.getenv("RAG_CONVERSATION_CACHE_MAX_ENTRIES", "1000"))
+CONVERSATION_CACHE_MAX_BYTES = int(os.getenv("RAG_CONVERSATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CONVERSATION_CACHE_IDLE_TTL = float(os.getenv("RAG_CONVERSATION_CACHE_IDLE_TTL", "1800"))
+
+
+def estimate_conversation_size(conversation: Dict) -> int:
+    """Estime la taille en octets d'une conversation (contenu des messages et sources)."""
+    size = len(conversation.get("title", "").encode("utf-8"))
+    size += len((conversation.get("summary") or {}).get("text", "").encode("utf-8"))
+    for message in conversation.get("messages", []):
+        size += len(message.get("content", "").encode("utf-8"))
+        if message.get("sources"):
+            size += len(json.dumps(message["sources"], ensure_ascii=False).encode("utf-8"))
+    return size
+
+
+class ConversationCache:
+    """
+    Cache LRU des conversations, borné en nombre d'entrées et en octets.
+
+    Une conversation non consultée depuis `idle_ttl` secondes est évincée ;
+    elle reste disponible dans le stockage et sera rechargée à la demande.
+    Chaque entrée garde la version du stockage au moment de sa mise en cache.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CONVERSATION_CACHE_MAX_ENTRIES,
+        max_bytes: int = CONVERSATION_CACHE_MAX_BYTES,
+        idle_ttl: float = CONVERSATION_CACHE_IDLE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "idle_evictions": 0
+        }
+
+    def _is_idle(self, entry: Dict, now: float) -> bool:
+        return self.idle_ttl > 0 and now - entry["last_access"] > self.idle_ttl
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        """Retourne la conversation en cache (et la marque comme récemment utilisée)."""
+        return self.get_with_version(conversation_id)[0]
+
+    def get_with_version(self, conversation_id: str) -> Tuple[Optional[Dict], Any]:
+        """Retourne (conversation, version), ou (None, None) si absente."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, None
+            if self._is_idle(entry, now):
+                self._remove(conversation_id)
+                self._stats["idle_evictions"] += 1
+                self._stats["misses"] += 1
+                return None, None
+            entry["last_access"] = now
+            self._entries.move_to_end(conversation_id)
+            self._stats["hits"] += 1
+            return entry["conversation"], entry["version"]
+
+    def put(self, conversation_id: str, conversation: Dict, version: Any = None):
+        """Ajoute ou met à jour une conversation, puis applique les limites."""
+        size = estimate_conversation_size(conversation)
+        now = time.time()
+        with self._lock:
+            if conversation_id in self._entries:
+                self._remove(conversation_id)
+            self._entries[conversation_id] = {
+                "conversation": conversation,
+                "version": version,
+                "size": size,
+                "last_access": now
+            }
+            self._bytes += size
+            self._evict(now)
+
+    def pop(self, conversation_id: str) -> Optional[Dict]:
+        """Retire une conversation du cache."""
+        with self._lock:
+            entry = self._remove(conversation_id)
+            return entry["conversation"] if entry else None
+
+    def _remove(self, conversation_id: str) -> Optional[Dict]:
+        """Retire une entrée (appelé avec le verrou acquis)."""
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+        return entry
+
+    def _evict(self, now: float):
+        """Évince les conversations inactives puis les moins récentes (verrou acquis)."""
+        idle = [conv_id for conv_id, entry in self._entries.items() if self._is_idle(entry, now)]
+        for conv_id in idle:
+            self._remove(conv_id)
+        self._stats["idle_evictions"] += len(idle)
+
+        # La conversation qui vient d'être ajoutée est toujours conservée
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            conv_id = next(iter(self._entries))
+            self._remove(conv_id)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """Retourne la taille et les compteurs du cache."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "idle_ttl": self.idle_ttl,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                **self._stats
+            }
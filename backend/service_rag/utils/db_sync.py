@@ -0,0 +1,507 @@
+"""
+Synchronisation incrémentale des bases SQLite des services vers l'index RAG
+Remplace la séquence extract → move → convert de sequence_update_info_rag :
+chaque table est lue en flux (fetchmany) depuis un watermark, et seuls les
+enregistrements ajoutés, modifiés ou supprimés depuis la dernière
+synchronisation produisent un changement (un document par enregistrement).
+Chaque enregistrement devient un seul nœud de l'index, portant des
+métadonnées structurées (entity_type, entity_id, ville, statut) utilisables
+comme filtres de recherche.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from llama_index.core import Document, Settings
+from llama_index.core.schema import BaseNode, NodeRelationship, TextNode, TransformComponent
+
+
+# CONFIGURATION
+# Pour chaque table : colonne de date de modification servant de watermark,
+# ou None si la table n'en a pas (comparaison du contenu de chaque ligne)
+DB_SOURCES = {
+    "service_offers": {
+        "db_path": os.getenv("RAG_DB_OFFERS_PATH", "../service_offers/database/database.db"),
+        "tables": {
+            "offers": "updated_at",
+            "applications": "updated_at"
+        }
+    },
+    "service_profile": {
+        "db_path": os.getenv("RAG_DB_PROFILE_PATH", "../service_profile/database/database.db"),
+        "tables": {
+            "candidats": "date_modification",
+            "recruteurs": "date_modification",
+            "profile_views": None
+        }
+    },
+    "service_appointment": {
+        "db_path": os.getenv("RAG_DB_APPOINTMENT_PATH", "../service_appointment/database/appointments.db"),
+        "tables": {
+            "appointments": "updated_at",
+            "appointment_candidates": None,
+            "appointment_slots": None
+        }
+    }
+}
+
+# Métadonnées structurées des nœuds : type d'entité par table, et colonnes
+# fournissant la ville et le statut (dans l'ordre de préférence)
+ENTITY_TYPES = {
+    "offers": "offre",
+    "applications": "candidature",
+    "candidats": "candidat",
+    "recruteurs": "recruteur",
+    "profile_views": "vue_profil",
+    "appointments": "rendez_vous",
+    "appointment_candidates": "participant_rendez_vous",
+    "appointment_slots": "creneau"
+}
+VILLE_COLUMNS = ("ville", "localisation", "location")
+STATUT_COLUMNS = ("statut", "status", "application_status")
+
+# Métadonnées techniques exclues du texte envoyé au modèle d'embedding
+RECORD_EMBED_EXCLUDED_KEYS = ["source", "file_name", "service", "table", "record_id", "entity_id"]
+
+FETCH_SIZE = int(os.getenv("RAG_DB_SYNC_FETCH_SIZE", "500"))
+SYNC_STATE_FILE = "db_sync_state.json"
+
+# Présentation des enregistrements par table (titre et libellés des champs)
+TRANSFORMATIONS = {
+    'candidats': {
+        'title': 'Profil Candidat',
+        'fields': {
+            'id': 'ID',
+            'name': 'Nom',
+            'prenom': 'Prénom',
+            'email': 'Email',
+            'telephone': 'Téléphone',
+            'adresse': 'Adresse',
+            'ville': 'Ville',
+            'pays': 'Pays',
+            'code_postal': 'Code postal',
+            'resume_professionnel': 'Résumé professionnel',
+            'experience': 'Expériences',
+            'formation': 'Formation',
+            'competences': 'Compétences',
+            'langues': 'Langues',
+            'certifications': 'Certifications',
+            'projets': 'Projets',
+            'lien': 'Portfolio',
+            'cv': 'CV',
+            'date_creation': 'Date de création',
+            'progression': 'Progression du profil'
+        }
+    },
+    'recruteurs': {
+        'title': 'Profil Recruteur',
+        'fields': {
+            'id': 'ID',
+            'auth_user_id': 'ID utilisateur',
+            'nom_entreprise': 'Entreprise',
+            'secteur_activite': 'Secteur d\'activité',
+            'telephone': 'Téléphone',
+            'adresse': 'Adresse',
+            'ville': 'Ville',
+            'pays': 'Pays',
+            'code_postal': 'Code postal',
+            'site_web': 'Site web',
+            'description': 'Description',
+            'date_creation': 'Date de création'
+        }
+    },
+    'offers': {
+        'title': 'Offre d\'emploi',
+        'fields': {
+            'id': 'ID',
+            'title': 'Titre du poste',
+            'company': 'Entreprise',
+            'location': 'Localisation',
+            'salary': 'Salaire',
+            'contract_type': 'Type de contrat',
+            'description': 'Description',
+            'requirements': 'Exigences',
+            'benefits': 'Avantages',
+            'status': 'Statut',
+            'created_at': 'Date de publication',
+            'deadline': 'Date limite'
+        }
+    },
+    'applications': {
+        'title': 'Candidature',
+        'fields': {
+            'id': 'ID',
+            'offer_id': 'ID offre',
+            'candidate_id': 'ID candidat',
+            'status': 'Statut',
+            'cover_letter': 'Lettre de motivation',
+            'applied_at': 'Date de candidature',
+            'updated_at': 'Dernière modification'
+        }
+    },
+    'appointments': {
+        'title': 'Rendez-vous',
+        'fields': {
+            'id': 'ID',
+            'recruiter_id': 'ID recruteur',
+            'title': 'Titre',
+            'description': 'Description',
+            'date': 'Date',
+            'duration': 'Durée',
+            'location': 'Lieu',
+            'status': 'Statut',
+            'created_at': 'Créé le'
+        }
+    },
+    'appointment_candidates': {
+        'title': 'Participant au rendez-vous',
+        'fields': {
+            'id': 'ID',
+            'appointment_id': 'ID rendez-vous',
+            'candidate_id': 'ID candidat',
+            'status': 'Statut',
+            'confirmed_at': 'Confirmé le'
+        }
+    },
+    'appointment_slots': {
+        'title': 'Créneau de rendez-vous',
+        'fields': {
+            'id': 'ID',
+            'appointment_id': 'ID rendez-vous',
+            'start_time': 'Heure de début',
+            'end_time': 'Heure de fin',
+            'is_available': 'Disponible'
+        }
+    },
+    'profile_views': {
+        'title': 'Vue de profil',
+        'fields': {
+            'id': 'ID',
+            'profile_id': 'ID profil',
+            'viewer_id': 'ID visiteur',
+            'viewed_at': 'Vu le'
+        }
+    }
+}
+
+
+def parse_json_field(value):
+    """Parse les champs JSON stockés comme string"""
+    if not value or value in ['null', 'None', '']:
+        return None
+
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+            if parsed and parsed != 'null':
+                return parsed
+        except ValueError:
+            return value
+
+    return value
+
+
+def format_value(key, value):
+    """Formate une valeur selon son type"""
+    if value is None or value == '' or value == 'null':
+        return None
+
+    # Listes (expériences, formations, etc.)
+    if isinstance(value, list) and value:
+        formatted_items = []
+        for item in value:
+            if isinstance(item, dict):
+                # Filtrer les valeurs vides
+                filtered = {k: v for k, v in item.items() if v and v != ''}
+                if filtered:
+                    formatted_items.append(str(filtered))
+        return ', '.join(formatted_items) if formatted_items else None
+
+    # Dictionnaires
+    if isinstance(value, dict):
+        filtered = {k: v for k, v in value.items() if v and v != ''}
+        return str(filtered) if filtered else None
+
+    return str(value)
+
+
+def record_to_text(record: Dict, table_name: str) -> str:
+    """Convertit un enregistrement en texte lisible"""
+    config = TRANSFORMATIONS.get(table_name, {})
+    title = config.get('title', table_name)
+    fields_map = config.get('fields', {})
+
+    lines = [f"=== {title} ===\n"]
+
+    for key, value in record.items():
+        # Parser les valeurs JSON
+        parsed_value = parse_json_field(value)
+        formatted_value = format_value(key, parsed_value)
+
+        if formatted_value:
+            field_label = fields_map.get(key, key)
+            lines.append(f"{field_label}: {formatted_value}")
+
+    return '\n'.join(lines)
+
+
+def record_doc_id(service: str, table: str, record_id) -> str:
+    """Identifiant stable du document d'un enregistrement."""
+    return f"db:{service}:{table}:{record_id}"
+
+
+def load_sync_state(persist_dir: str) -> Dict:
+    """Charge l'état de synchronisation (watermark et empreintes par table) d'une version de l'index."""
+    state_path = os.path.join(persist_dir, SYNC_STATE_FILE)
+    if not os.path.exists(state_path):
+        return {"tables": {}}
+    with open(state_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_sync_state(persist_dir: str, state: Dict):
+    """Sauvegarde l'état de synchronisation avec la version de l'index qu'il décrit."""
+    os.makedirs(persist_dir, exist_ok=True)
+    with open(os.path.join(persist_dir, SYNC_STATE_FILE), "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+
+
+def _connect_readonly(db_path: str) -> Optional[sqlite3.Connection]:
+    """Ouvre une base en lecture seule (None si elle n'existe pas)."""
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _iter_rows(cursor: sqlite3.Cursor) -> Iterator[sqlite3.Row]:
+    """Parcourt le résultat d'une requête par lots de FETCH_SIZE lignes."""
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+
+def normalize_metadata_value(key: str, value):
+    """
+    Forme normalisée d'une valeur de métadonnée, identique à l'indexation
+    et dans les filtres de recherche (ex. "PUBLISHED" → "published",
+    " paris " → "Paris").
+    """
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    if key == "statut":
+        return value.lower()
+    if key == "ville":
+        return value.title()
+    return value
+
+
+def _first_value(record: Dict, columns) -> Optional[str]:
+    for column in columns:
+        value = record.get(column)
+        if value not in (None, "", "null"):
+            return str(value)
+    return None
+
+
+def _build_document(service: str, table: str, record: Dict, text: str) -> Document:
+    record_id = record.get("id")
+    metadata = {
+        "source": "database",
+        "file_name": f"{service}_{table}",
+        "service": service,
+        "table": table,
+        "record_id": record_id,
+        "entity_type": ENTITY_TYPES.get(table, table),
+        "entity_id": str(record_id)
+    }
+    # Champs absents pour la table : non renseignés plutôt que vides
+    for key, columns in (("ville", VILLE_COLUMNS), ("statut", STATUT_COLUMNS)):
+        value = _first_value(record, columns)
+        if value is not None:
+            metadata[key] = normalize_metadata_value(key, value)
+
+    return Document(
+        text=f"# BASE DE DONNÉES: {table.upper()}\n\n{text}",
+        doc_id=record_doc_id(service, table, record_id),
+        metadata=metadata,
+        excluded_embed_metadata_keys=RECORD_EMBED_EXCLUDED_KEYS
+    )
+
+
+def is_record_document(node: BaseNode) -> bool:
+    """Vrai si le nœud ou document provient d'un enregistrement de base."""
+    return node.metadata.get("source") == "database"
+
+
+class RecordNodeParser(TransformComponent):
+    """
+    Découpage des documents avant indexation : un enregistrement de base
+    donne exactement un nœud (jamais fusionné ni coupé), les autres
+    documents passent par le découpeur par défaut (Settings.node_parser).
+    """
+
+    def __call__(self, nodes: List[BaseNode], **kwargs) -> List[BaseNode]:
+        records = [node for node in nodes if is_record_document(node)]
+        others = [node for node in nodes if not is_record_document(node)]
+
+        result = Settings.node_parser(others, **kwargs) if others else []
+        for document in records:
+            result.append(TextNode(
+                text=document.get_content(),
+                metadata=dict(document.metadata),
+                excluded_embed_metadata_keys=list(document.excluded_embed_metadata_keys),
+                excluded_llm_metadata_keys=list(document.excluded_llm_metadata_keys),
+                relationships={NodeRelationship.SOURCE: document.as_related_node_info()}
+            ))
+        return result
+
+
+def _record_hash(record: Dict) -> str:
+    """Empreinte du contenu d'un enregistrement (indépendante de l'ordre des colonnes)."""
+    canonical = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _record_change(service: str, table: str, record: Dict, hashes: Dict[str, str]) -> Optional[Document]:
+    """Document de l'enregistrement s'il a changé depuis la dernière synchronisation, sinon None."""
+    record_id = str(record["id"])
+    record_hash = _record_hash(record)
+    if hashes.get(record_id) == record_hash:
+        return None
+    hashes[record_id] = record_hash
+    return _build_document(service, table, record, record_to_text(record, table))
+
+
+def record_event_change(state: Dict, event: Dict) -> Optional[Tuple[str, object]]:
+    """
+    Changement à appliquer pour un événement publié par un service
+    (ex. service_offers à la création d'une offre), ou None s'il n'y a rien
+    à faire (enregistrement identique à celui déjà indexé, suppression
+    d'un enregistrement inconnu).
+
+    L'événement contient l'enregistrement sous la forme d'une ligne de la
+    table ; l'état de synchronisation est mis à jour comme par
+    `iter_database_changes`, qui ne ré-embeddera donc pas cet enregistrement.
+    """
+    service, table = event["service"], event["table"]
+    hashes = state.setdefault("tables", {}).setdefault(f"{service}.{table}", {}).setdefault("rows", {})
+    record_id = str(event["record_id"])
+
+    if event["event"] == "deleted":
+        if hashes.pop(record_id, None) is None:
+            return None
+        return "delete", record_doc_id(service, table, record_id)
+
+    record = dict(event["record"])
+    record.setdefault("id", event["record_id"])
+    document = _record_change(service, table, record, hashes)
+    return ("upsert", document) if document is not None else None
+
+
+def _sync_table(
+    conn: sqlite3.Connection,
+    service: str,
+    table: str,
+    change_column: Optional[str],
+    table_state: Dict
+) -> Iterator[Tuple[str, object]]:
+    """
+    Produit les changements d'une table : ("upsert", Document) ou ("delete", doc_id).
+
+    Avec une colonne de modification, seules les lignes au-delà du watermark
+    (valeur, rowid) sont lues ; sinon toute la table est parcourue en flux et
+    comparée aux empreintes connues. Dans les deux cas, une ligne dont le
+    contenu n'a pas changé ne produit rien.
+    """
+    hashes: Dict[str, str] = table_state.setdefault("rows", {})
+    cursor = conn.cursor()
+
+    if change_column:
+        order_key = f"COALESCE({change_column}, '')"
+        query = f"SELECT rowid AS _rowid, * FROM {table}"
+        params: List = []
+        watermark = table_state.get("watermark")
+        if watermark:
+            query += f" WHERE {order_key} > ? OR ({order_key} = ? AND rowid > ?)"
+            params = [watermark[0], watermark[0], watermark[1]]
+        query += f" ORDER BY {order_key}, rowid"
+    else:
+        query = f"SELECT rowid AS _rowid, * FROM {table} ORDER BY rowid"
+        params = []
+
+    seen_ids = set()
+    cursor.execute(query, params)
+    for row in _iter_rows(cursor):
+        record = {key: row[key] for key in row.keys() if key != "_rowid"}
+        for key, value in record.items():
+            if isinstance(value, (bytes, bytearray)):
+                record[key] = str(value)
+        if record.get("id") is None:
+            record["id"] = row["_rowid"]
+
+        record_id = str(record["id"])
+        seen_ids.add(record_id)
+        if change_column:
+            table_state["watermark"] = [row[change_column] or "", row["_rowid"]]
+
+        document = _record_change(service, table, record, hashes)
+        if document is not None:
+            yield "upsert", document
+
+    # Suppressions : identifiants connus absents de la table
+    if change_column:
+        cursor.execute(f"SELECT COALESCE(id, rowid) FROM {table}")
+        seen_ids = {str(row[0]) for row in _iter_rows(cursor)}
+    for record_id in [record_id for record_id in hashes if record_id not in seen_ids]:
+        del hashes[record_id]
+        yield "delete", record_doc_id(service, table, record_id)
+
+
+def iter_database_changes(
+    state: Dict,
+    stats: Optional[Dict] = None,
+    services: Optional[List[str]] = None
+) -> Iterator[Tuple[str, object]]:
+    """
+    Parcourt toutes les tables configurées (ou celles des `services` demandés)
+    et produit leurs changements.
+
+    `state` est mis à jour au fil de l'eau (watermarks et empreintes) ; il ne
+    doit être enregistré qu'une fois les changements appliqués à l'index.
+    Avec un état vide, chaque enregistrement produit un document.
+    """
+    tables_state = state.setdefault("tables", {})
+    for service, config in DB_SOURCES.items():
+        if services is not None and service not in services:
+            continue
+        conn = _connect_readonly(config["db_path"])
+        if conn is None:
+            print(f"⚠️ Base de données non trouvée, ignorée: {config['db_path']}")
+            continue
+        try:
+            for table, change_column in config["tables"].items():
+                table_state = tables_state.setdefault(f"{service}.{table}", {})
+                try:
+                    for change in _sync_table(conn, service, table, change_column, table_state):
+                        if stats is not None:
+                            stats[change[0]] = stats.get(change[0], 0) + 1
+                        yield change
+                except sqlite3.OperationalError as e:
+                    print(f"❌ Erreur lors de la lecture de la table {service}.{table}: {e}")
+        finally:
+            conn.close()
+
+
+def load_database_documents(state: Dict, services: Optional[List[str]] = None) -> List[Document]:
+    """
+    Tous les enregistrements (ou ceux des `services` demandés) sous forme de
+    documents (construction complète de l'index ou d'un de ses domaines).
+    """
+    return [payload for kind, payload in iter_database_changes(state, services=services) if kind == "upsert"]
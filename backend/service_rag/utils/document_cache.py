@@ -0,0 +1,199 @@
+"""
+Cache des documents extraits des fichiers de ./data (PDF, DOCX, ...)
+Le texte et les métadonnées extraits d'un fichier sont conservés sous une clé
+dérivée de son empreinte de contenu et de la version du parseur : un fichier
+inchangé n'est ni relu ni reparsé lors d'une réindexation ou d'un démarrage
+Les documents sont identifiés par le nom du fichier dans ./data (suivi de
+"_part_<i>" pour les fichiers en plusieurs parties), et non par son chemin
+absolu : un index déplacé ou construit sur une autre machine garde les mêmes
+identifiants
+"""
+import hashlib
+import json
+import os
+import threading
+from importlib import metadata as package_metadata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import llama_index.core
+from llama_index.core import Document, SimpleDirectoryReader
+from llama_index.core.readers.file.base import default_file_metadata_func
+
+from utils.index_manifest import scan_data_dir
+
+
+# CONFIGURATION
+PARSED_CACHE_ENABLED = os.getenv("RAG_PARSED_CACHE_ENABLED", "true").lower() == "true"
+PARSED_CACHE_DIR = os.getenv("RAG_PARSED_CACHE_DIR", "./storage/parsed_cache")
+CACHE_FORMAT_VERSION = 1  # À incrémenter si le format des entrées change
+
+FILE_HASHES_FILE = "file_hashes.json"
+
+
+def _package_version(name: str) -> str:
+    try:
+        return package_metadata.version(name)
+    except package_metadata.PackageNotFoundError:
+        return "absent"
+
+
+def parser_version(suffix: str) -> str:
+    """
+    Version du parseur utilisé par SimpleDirectoryReader pour une extension.
+
+    Une mise à jour de llama_index ou des lecteurs de fichiers invalide les
+    entrées du cache des fichiers concernés.
+    """
+    reader_cls = SimpleDirectoryReader.supported_suffix_fn().get(suffix.lower())
+    reader = f"{reader_cls.__module__}.{reader_cls.__qualname__}" if reader_cls else "texte"
+    return (
+        f"{CACHE_FORMAT_VERSION}:{llama_index.core.__version__}:"
+        f"{_package_version('llama-index-readers-file')}:{reader}"
+    )
+
+
+class ParsedDocumentCache:
+    """
+    Documents extraits par fichier, indexés par (empreinte du contenu, version du parseur).
+
+    Une entrée par fichier dans `cache_dir` (JSON). Les métadonnées liées au
+    système de fichiers (chemin, dates, taille) sont recalculées à chaque
+    lecture par un simple `stat`, sans relire le fichier.
+    """
+
+    def __init__(self, cache_dir: str = PARSED_CACHE_DIR, enabled: bool = PARSED_CACHE_ENABLED):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "pruned": 0
+        }
+
+    def _entry_path(self, file_hash: str, suffix: str) -> str:
+        key = hashlib.sha256(f"{file_hash}:{parser_version(suffix)}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _write_json(self, path: str, data: Dict):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def scan_data_dir(self, data_dir: str) -> Dict[str, str]:
+        """
+        Empreintes des fichiers de `data_dir` (voir index_manifest.scan_data_dir),
+        sans relire les fichiers dont la taille et la date n'ont pas changé.
+
+        Les entrées du cache des fichiers supprimés ou modifiés sont retirées.
+        """
+        if not self.enabled:
+            return scan_data_dir(data_dir)
+
+        with self._lock:
+            hashes_path = os.path.join(self.cache_dir, FILE_HASHES_FILE)
+            stat_cache = {}
+            if os.path.exists(hashes_path):
+                with open(hashes_path, "r", encoding="utf-8") as f:
+                    stat_cache = json.load(f)
+
+            file_hashes = scan_data_dir(data_dir, stat_cache)
+            stat_cache = {name: entry for name, entry in stat_cache.items() if name in file_hashes}
+            self._write_json(hashes_path, stat_cache)
+            self._prune({
+                os.path.basename(self._entry_path(file_hash, Path(name).suffix))
+                for name, file_hash in file_hashes.items()
+            })
+            return file_hashes
+
+    def _prune(self, keep: set):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json") and name != FILE_HASHES_FILE and name not in keep:
+                os.remove(os.path.join(self.cache_dir, name))
+                self._stats["pruned"] += 1
+
+    def _read(self, path: str, name: str, file_hash: str) -> Optional[List[Document]]:
+        """Documents en cache pour ce fichier (chemin absolu, nom dans data_dir), ou None."""
+        entry_path = self._entry_path(file_hash, Path(path).suffix)
+        if not os.path.exists(entry_path):
+            return None
+        with open(entry_path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+
+        file_metadata = default_file_metadata_func(path)
+        documents = []
+        for cached in entry["documents"]:
+            document_metadata = dict(cached["metadata"])
+            document_metadata.update(file_metadata)
+            documents.append(Document(
+                id_=f"{name}{cached['id_suffix']}",
+                text=cached["text"],
+                metadata=document_metadata,
+                excluded_embed_metadata_keys=cached["excluded_embed_metadata_keys"],
+                excluded_llm_metadata_keys=cached["excluded_llm_metadata_keys"]
+            ))
+        return documents
+
+    def _write(self, path: str, name: str, file_hash: str, documents: List[Document]):
+        self._write_json(self._entry_path(file_hash, Path(path).suffix), {
+            "file_name": name,
+            "parser_version": parser_version(Path(path).suffix),
+            "documents": [
+                {
+                    # Identifiant relatif au nom du fichier ("" ou "_part_<i>", voir filename_as_id)
+                    "id_suffix": document.doc_id[len(name):],
+                    "text": document.text,
+                    "metadata": document.metadata,
+                    "excluded_embed_metadata_keys": document.excluded_embed_metadata_keys,
+                    "excluded_llm_metadata_keys": document.excluded_llm_metadata_keys
+                }
+                for document in documents
+            ]
+        })
+
+    def load_documents(self, data_dir: str, file_names: List[str], file_hashes: Dict[str, str]) -> List[Document]:
+        """
+        Charge les documents des fichiers demandés, dans leur ordre.
+
+        Seuls les fichiers absents du cache sont lus par SimpleDirectoryReader ;
+        leurs documents sont ensuite mis en cache (sauf échec de lecture).
+        """
+        paths = {name: os.path.abspath(os.path.join(data_dir, name)) for name in file_names}
+        documents_by_file: Dict[str, List[Document]] = {}
+        to_parse = []
+        for name in file_names:
+            cached = self._read(paths[name], name, file_hashes[name]) if self.enabled else None
+            if cached is None:
+                to_parse.append(name)
+            else:
+                documents_by_file[name] = cached
+        self._stats["hits"] += len(file_names) - len(to_parse)
+        self._stats["misses"] += len(to_parse)
+
+        if to_parse:
+            parsed = SimpleDirectoryReader(
+                input_files=[paths[name] for name in to_parse],
+                filename_as_id=True
+            ).load_data()
+            for document in parsed:
+                name = document.metadata.get("file_name")
+                # filename_as_id donne le chemin absolu : on le remplace par le nom du fichier
+                if name in paths and document.doc_id.startswith(paths[name]):
+                    document.id_ = f"{name}{document.doc_id[len(paths[name]):]}"
+                documents_by_file.setdefault(name, []).append(document)
+            if self.enabled:
+                for name in to_parse:
+                    if documents_by_file.get(name):
+                        self._write(paths[name], name, file_hashes[name], documents_by_file[name])
+
+        return [document for name in file_names for document in documents_by_file.get(name, [])]
+
+    def get_stats(self) -> Dict:
+        return {"enabled": self.enabled, **self._stats}
+
+
+# Instance globale
+parsed_documents = ParsedDocumentCache()
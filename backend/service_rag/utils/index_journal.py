@@ -0,0 +1,58 @@
+"""
+Journal des changements appliqués en place à la version active de l'index
+Les événements publiés par les services (voir utils/record_events.py) sont
+appliqués directement à l'index en mémoire ; chaque lot est ajouté à ce
+journal (nœuds avec leurs embeddings) pour être rejoué au chargement, sans
+nouvel appel au modèle d'embedding. La version suivante de l'index
+(réindexation, synchronisation des bases) intègre le journal et repart
+sans journal.
+"""
+import json
+import os
+from typing import Dict, List
+
+
+# CONFIGURATION
+JOURNAL_FILE = "events_journal.jsonl"
+EVENTS_JOURNAL_MAX = int(os.getenv("RAG_EVENTS_JOURNAL_MAX", "5000"))  # Enregistrements journalisés avant compaction
+
+
+def append_journal(persist_dir: str, entry: Dict):
+    """Ajoute un lot appliqué au journal (écrit sur disque avant de rendre la main)."""
+    with open(os.path.join(persist_dir, JOURNAL_FILE), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def journal_file_size(persist_dir: str) -> int:
+    """Taille du journal en octets (0 s'il n'existe pas) : elle change à chaque lot ajouté."""
+    try:
+        return os.path.getsize(os.path.join(persist_dir, JOURNAL_FILE))
+    except FileNotFoundError:
+        return 0
+
+
+def read_journal(persist_dir: str) -> List[Dict]:
+    """
+    Lots du journal, dans l'ordre d'application.
+
+    Une dernière ligne incomplète (arrêt pendant l'écriture) est ignorée :
+    ce lot n'avait pas encore été appliqué.
+    """
+    path = os.path.join(persist_dir, JOURNAL_FILE)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return entries
+
+
+def journal_size(entries: List[Dict]) -> int:
+    """Nombre d'enregistrements (ajoutés, modifiés ou supprimés) d'un journal."""
+    return sum(len(entry["deleted"]) + len(entry["hashes"]) for entry in entries)
@@ -0,0 +1,83 @@
+"""
+Manifeste des fichiers indexés (empreinte de contenu et documents associés)
+Permet une réindexation incrémentale : seuls les fichiers ajoutés ou modifiés
+sont ré-embeddés, et les documents des fichiers supprimés sont retirés
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+MANIFEST_FILE = "file_manifest.json"
+
+
+def compute_file_hash(file_path: Path) -> str:
+    """Calcule l'empreinte SHA-256 du contenu d'un fichier."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_data_dir(data_dir: str, stat_cache: Optional[Dict[str, Dict]] = None) -> Dict[str, str]:
+    """
+    Retourne {nom de fichier: empreinte} pour les fichiers lus par
+    SimpleDirectoryReader (non récursif, fichiers cachés exclus).
+
+    Avec `stat_cache` ({nom: {size, mtime_ns, hash}}, mis à jour sur place),
+    un fichier dont la taille et la date de modification n'ont pas changé
+    n'est pas relu : son empreinte précédente est réutilisée.
+    """
+    hashes = {}
+    for path in sorted(Path(data_dir).iterdir()):
+        if not path.is_file() or path.name.startswith("."):
+            continue
+        if stat_cache is None:
+            hashes[path.name] = compute_file_hash(path)
+            continue
+        stat = path.stat()
+        entry = stat_cache.get(path.name)
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": compute_file_hash(path)}
+            stat_cache[path.name] = entry
+        hashes[path.name] = entry["hash"]
+    return hashes
+
+
+def load_manifest(persist_dir: str) -> Dict[str, Dict]:
+    """Charge le manifeste ({nom de fichier: {hash, doc_ids}}), vide s'il n'existe pas."""
+    manifest_path = os.path.join(persist_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("files", {})
+
+
+def save_manifest(persist_dir: str, files: Dict[str, Dict]):
+    """Sauvegarde le manifeste dans le répertoire de l'index."""
+    os.makedirs(persist_dir, exist_ok=True)
+    manifest_path = os.path.join(persist_dir, MANIFEST_FILE)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"files": files}, f, ensure_ascii=False, indent=2)
+
+
+def group_doc_ids_by_file(documents: Iterable) -> Dict[str, List[str]]:
+    """Regroupe les identifiants des documents par fichier source."""
+    doc_ids: Dict[str, List[str]] = {}
+    for document in documents:
+        file_name = document.metadata.get("file_name")
+        if file_name:
+            doc_ids.setdefault(file_name, []).append(document.doc_id)
+    return doc_ids
+
+
+def build_manifest(file_hashes: Dict[str, str], documents: Iterable) -> Dict[str, Dict]:
+    """Construit le manifeste à partir des empreintes et des documents chargés."""
+    doc_ids = group_doc_ids_by_file(documents)
+    return {
+        file_name: {"hash": file_hash, "doc_ids": doc_ids.get(file_name, [])}
+        for file_name, file_hash in file_hashes.items()
+    }
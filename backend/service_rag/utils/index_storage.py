@@ -0,0 +1,147 @@
+"""
+Stockage versionné de l'index (bascule blue/green)
+Chaque reconstruction est écrite dans un sous-répertoire distinct ; le fichier
+CURRENT désigne la version active et n'est remplacé qu'une fois la nouvelle
+version complète, de façon atomique
+"""
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import List
+
+from utils.index_journal import JOURNAL_FILE
+
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"  # Verrou entre workers des tâches qui modifient le stockage (voir utils/locks.FileLock)
+PENDING_DELETE_FILE = "PENDING_DELETE"  # Versions dont la suppression a échoué, réessayée à chaque bascule
+BUILD_PREFIX = "index_"
+INDEX_SUBDIRS = ("shards",)  # Sous-répertoires d'un index (vector store partitionné par domaine)
+
+
+def has_index(persist_dir: str) -> bool:
+    """Indique si un index persistant existe dans ce répertoire."""
+    return os.path.exists(os.path.join(persist_dir, "docstore.json"))
+
+
+def get_active_dir(root: str) -> str:
+    """
+    Retourne le répertoire de l'index actif.
+
+    Sans fichier CURRENT (ancienne disposition), l'index est directement à la racine.
+    """
+    current_path = os.path.join(root, CURRENT_FILE)
+    if os.path.exists(current_path):
+        with open(current_path, "r", encoding="utf-8") as f:
+            name = f.read().strip()
+        if name:
+            return os.path.join(root, name)
+    return root
+
+
+def new_build_dir(root: str) -> str:
+    """Crée un répertoire vide pour construire une nouvelle version de l'index."""
+    name = f"{BUILD_PREFIX}{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    build_dir = os.path.join(root, name)
+    os.makedirs(build_dir)
+    return build_dir
+
+
+def copy_index_files(source_dir: str, target_dir: str):
+    """
+    Copie les fichiers d'un index et ses INDEX_SUBDIRS (sans les sous-répertoires
+    de versions ni le journal, que la nouvelle version rejoue puis intègre).
+    """
+    for name in os.listdir(source_dir):
+        path = os.path.join(source_dir, name)
+        if os.path.isfile(path) and name not in (CURRENT_FILE, PENDING_DELETE_FILE, LOCK_FILE, JOURNAL_FILE):
+            shutil.copy2(path, os.path.join(target_dir, name))
+        elif os.path.isdir(path) and name in INDEX_SUBDIRS:
+            shutil.copytree(path, os.path.join(target_dir, name))
+
+
+def _remove_path(path: str) -> bool:
+    """
+    Supprime un fichier ou un répertoire de l'index.
+
+    Retourne False, avec un avertissement, si la suppression échoue (ex. sous
+    Windows, fichiers encore mappés par une requête en cours ou un autre worker).
+    """
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        return True
+    except OSError as e:
+        print(f"⚠️ Suppression impossible de {path} (nouvel essai à la prochaine bascule): {e}")
+        return False
+
+
+def _read_pending(root: str) -> List[str]:
+    path = os.path.join(root, PENDING_DELETE_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _write_pending(root: str, names: List[str]):
+    path = os.path.join(root, PENDING_DELETE_FILE)
+    if not names:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(names) + "\n")
+    os.replace(tmp_path, path)
+
+
+def _remove_versions(root: str, names: List[str], keep: str):
+    """
+    Supprime les entrées `names` de `root` ainsi que celles restées en attente ;
+    celles qui échouent sont enregistrées pour la prochaine bascule.
+    """
+    pending = [name for name in dict.fromkeys(_read_pending(root) + names) if name != keep]
+    _write_pending(root, [name for name in pending if not _remove_path(os.path.join(root, name))])
+
+
+def activate_dir(root: str, build_dir: str):
+    """
+    Désigne `build_dir` comme version active puis supprime l'ancienne version.
+
+    Le pointeur est écrit dans un fichier temporaire puis renommé (os.replace),
+    si bien qu'un redémarrage voit toujours soit l'ancienne, soit la nouvelle version.
+    Une ancienne version qui ne peut pas être supprimée (fichiers encore
+    ouverts) est signalée puis supprimée lors d'une bascule suivante.
+    """
+    previous_dir = get_active_dir(root)
+
+    tmp_path = os.path.join(root, f"{CURRENT_FILE}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(build_dir))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+
+    obsolete = []
+    if os.path.abspath(previous_dir) == os.path.abspath(root):
+        # Ancienne disposition : fichiers de l'index directement à la racine
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if os.path.isfile(path) and name not in (CURRENT_FILE, PENDING_DELETE_FILE, LOCK_FILE):
+                obsolete.append(name)
+            elif os.path.isdir(path) and name in INDEX_SUBDIRS:
+                obsolete.append(name)
+    elif os.path.abspath(previous_dir) != os.path.abspath(build_dir):
+        obsolete.append(os.path.basename(previous_dir))
+    _remove_versions(root, obsolete, keep=os.path.basename(build_dir))
+
+
+def discard_build_dir(build_dir: str):
+    """Supprime une version abandonnée (échec de construction)."""
+    if not _remove_path(build_dir):
+        root = os.path.dirname(build_dir)
+        _write_pending(root, list(dict.fromkeys(_read_pending(root) + [os.path.basename(build_dir)])))
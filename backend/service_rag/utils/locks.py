@@ -0,0 +1,172 @@
+"""
+Verrous par clé (conversation, utilisateur...) pour le service RAG
+- AsyncKeyedLock : sérialise les coroutines portant sur une même clé
+- FileLock : verrou réentrant valable entre threads et entre processus
+- LockStripes : verrous de fichiers répartis par hachage de la clé, valables
+  entre threads et entre processus (plusieurs workers uvicorn)
+- ReadWriteLock : lectures simultanées, écriture exclusive (index modifié en place)
+"""
+import asyncio
+import os
+import threading
+import zlib
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+DEFAULT_STRIPES = 64
+
+
+def _lock_file(fd: int):
+    if os.name == "nt":
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                # LK_LOCK réessaie pendant ~10 s avant de lever OSError
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+    fcntl.flock(fd, fcntl.LOCK_EX)
+
+
+def _unlock_file(fd: int):
+    if os.name == "nt":
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        return
+    fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class AsyncKeyedLock:
+    """Un asyncio.Lock par clé, créé à la demande et libéré quand plus personne ne l'attend."""
+
+    def __init__(self):
+        self._locks: Dict[str, List] = {}  # clé -> [verrou, nombre de détenteurs/attente]
+
+    @asynccontextmanager
+    async def hold(self, key: Optional[str]):
+        """Attend son tour pour `key` (sans effet si `key` est None)."""
+        if key is None:
+            yield
+            return
+
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class FileLock:
+    """Verrou réentrant : un RLock dans le processus, un verrou de fichier entre processus."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+                _lock_file(self._fd)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._depth -= 1
+                self._rlock.release()
+                raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                _unlock_file(self._fd)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._rlock.release()
+
+
+class LockStripes:
+    """
+    Ensemble fixe de verrous de fichiers ; une clé est associée à un verrou
+    par un hachage stable (identique dans tous les workers).
+
+    Le nombre de fichiers de verrou reste borné quel que soit le nombre de
+    clés ; deux clés du même groupe peuvent simplement partager un verrou.
+    """
+
+    def __init__(self, lock_dir: str, prefix: str, stripes: int = DEFAULT_STRIPES):
+        os.makedirs(lock_dir, exist_ok=True)
+        self._stripes = [
+            FileLock(os.path.join(lock_dir, f"{prefix}_{i:02d}.lock"))
+            for i in range(stripes)
+        ]
+
+    def lock(self, key: str) -> FileLock:
+        """Verrou (context manager) associé à `key`."""
+        return self._stripes[zlib.crc32(key.encode("utf-8")) % len(self._stripes)]
+
+
+class ReadWriteLock:
+    """
+    Verrou lecteurs/rédacteur entre threads : les lectures sont simultanées,
+    une écriture est exclusive. Un rédacteur en attente passe avant les
+    nouvelles lectures, qui ne peuvent donc pas le bloquer indéfiniment.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
@@ -0,0 +1,658 @@
+"""
+Vector store à matrice mappée en mémoire avec index approximatif IVF
+Remplace le SimpleVectorStore JSON : les embeddings sont stockés dans une
+matrice float32 (.npy) ouverte en mmap, partagée entre les workers uvicorn,
+et la recherche top-k ne parcourt que les listes IVF les plus proches.
+
+Avec RAG_VECTOR_QUANTIZATION=int8 (ou binary), la recherche parcourt une
+copie quantifiée de la matrice (4x, ou 32x, plus petite) puis recalcule le
+score exact des meilleurs candidats à partir des vecteurs float32
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+
+# CONFIGURATION
+IVF_MIN_VECTORS = int(os.getenv("RAG_IVF_MIN_VECTORS", "4096"))
+IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8"))
+IVF_TRAIN_SAMPLE = 20000
+IVF_ITERATIONS = 10
+VECTOR_QUANTIZATION = os.getenv("RAG_VECTOR_QUANTIZATION", "none")  # "none", "int8" ou "binary"
+RESCORE_FACTOR = int(os.getenv("RAG_RESCORE_FACTOR", "8"))  # Candidats rescorés en float32 : top_k x facteur
+SCORE_CHUNK_ROWS = 8192  # Lignes quantifiées décodées à la fois (borne la mémoire temporaire)
+
+# Fichiers persistés à côté du docstore
+VECTORS_FILE = "mmap_vectors.npy"
+ROWS_FILE = "mmap_rows.json"
+CENTROIDS_FILE = "mmap_ivf_centroids.npy"
+ORDER_FILE = "mmap_ivf_order.npy"
+OFFSETS_FILE = "mmap_ivf_offsets.npy"
+CODES_FILE = "mmap_codes.npy"
+SCALES_FILE = "mmap_scales.npy"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normalise des vecteurs (L2) pour que le produit scalaire soit le cosinus."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def _flat_metadata(metadata: Dict) -> Dict:
+    """Ne conserve que les métadonnées scalaires (utilisées pour les filtres)."""
+    return {
+        key: value for key, value in metadata.items()
+        if isinstance(value, (str, int, float, bool)) or value is None
+    }
+
+
+def _match_filter(metadata: Dict, metadata_filter) -> bool:
+    """Évalue un filtre (simple ou imbriqué) sur les métadonnées d'un nœud."""
+    if isinstance(metadata_filter, MetadataFilters):
+        return _match_filters(metadata, metadata_filter)
+
+    value = metadata.get(metadata_filter.key)
+    expected = metadata_filter.value
+    operator = metadata_filter.operator
+
+    if operator == FilterOperator.EQ:
+        return value == expected
+    if operator == FilterOperator.NE:
+        return value != expected
+    if operator == FilterOperator.IN:
+        return value in (expected or [])
+    if operator == FilterOperator.NIN:
+        return value not in (expected or [])
+    if value is None:
+        return False
+    if operator == FilterOperator.GT:
+        return value > expected
+    if operator == FilterOperator.GTE:
+        return value >= expected
+    if operator == FilterOperator.LT:
+        return value < expected
+    if operator == FilterOperator.LTE:
+        return value <= expected
+    if operator == FilterOperator.TEXT_MATCH:
+        return str(expected) in str(value)
+    raise ValueError(f"Opérateur de filtre non supporté: {operator}")
+
+
+def _match_filters(metadata: Dict, filters: MetadataFilters) -> bool:
+    results = (_match_filter(metadata, f) for f in filters.filters)
+    if filters.condition == FilterCondition.OR:
+        return any(results)
+    return all(results)
+
+
+def _filter_mask(values_index: Dict[str, Dict[Any, List[int]]], total: int, metadata_filter) -> np.ndarray:
+    """
+    Lignes vérifiant un filtre (simple ou imbriqué), sous forme de masque.
+
+    Le filtre est évalué sur les valeurs distinctes de la clé (`values_index` :
+    clé -> valeur -> lignes) et non ligne par ligne ; une ligne sans la clé
+    a la valeur None, comme dans `_match_filter`.
+    """
+    if isinstance(metadata_filter, MetadataFilters):
+        masks = [_filter_mask(values_index, total, f) for f in metadata_filter.filters]
+        if not masks:
+            return np.full(total, metadata_filter.condition != FilterCondition.OR)
+        if metadata_filter.condition == FilterCondition.OR:
+            return np.logical_or.reduce(masks)
+        return np.logical_and.reduce(masks)
+
+    buckets = values_index.get(metadata_filter.key, {})
+    mask = np.zeros(total, dtype=bool)
+    for value, rows in buckets.items():
+        if _match_filter({metadata_filter.key: value}, metadata_filter):
+            mask[rows] = True
+    if _match_filter({}, metadata_filter):
+        # Lignes sans la clé (valeur None)
+        with_key = np.zeros(total, dtype=bool)
+        for rows in buckets.values():
+            with_key[rows] = True
+        mask |= ~with_key
+    return mask
+
+
+def train_ivf(vectors: np.ndarray, nlist: int, seed: int = 0):
+    """
+    Entraîne un quantificateur grossier (k-means sphérique) et répartit les vecteurs.
+
+    Retourne (centroids, order, offsets) : les lignes de la liste `c` sont
+    `order[offsets[c]:offsets[c + 1]]`.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_idx = np.sort(rng.choice(n, size=min(n, IVF_TRAIN_SAMPLE), replace=False))
+    sample = np.asarray(vectors[sample_idx], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(IVF_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+
+    assignments = np.empty(n, dtype=np.int32)
+    for start in range(0, n, 65536):
+        chunk = np.asarray(vectors[start:start + 65536], dtype=np.float32)
+        assignments[start:start + 65536] = np.argmax(chunk @ centroids.T, axis=1)
+
+    order = np.argsort(assignments, kind="stable").astype(np.int32)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64)
+    return centroids, order, offsets
+
+
+def quantize(vectors: np.ndarray, quantization: str):
+    """
+    Quantifie des vecteurs normalisés.
+
+    - "int8" : un entier signé par dimension et une échelle float32 par vecteur
+    - "binary" : le signe de chaque dimension, 8 dimensions par octet
+
+    Retourne (codes, échelles) ; les échelles valent None en binaire.
+    """
+    if quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    if quantization == "binary":
+        return np.packbits(vectors > 0, axis=1), None
+    raise ValueError(f"Quantification inconnue: {quantization}")
+
+
+# Signes ±1 des 8 dimensions codées par chaque octet (ordre de np.packbits)
+_BYTE_SIGNS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).astype(np.float32) * 2 - 1
+
+
+def _read_rows(matrix: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Lit des lignes d'une matrice mappée, par accès triés (pages du mmap lues dans l'ordre)."""
+    sorter = np.argsort(rows)
+    out = np.empty((len(rows),) + matrix.shape[1:], dtype=matrix.dtype)
+    out[sorter] = matrix[rows[sorter]]
+    return out
+
+
+def _save_npy(path: str, array: np.ndarray):
+    """Écrit un .npy de façon atomique (les mmaps existants restent valides)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    Vector store dont les embeddings persistés sont une matrice float32 mappée en mémoire.
+
+    Les vecteurs ajoutés depuis le dernier `persist` restent dans un tampon en
+    mémoire (recherche exhaustive) ; `persist` compacte tampon et suppressions
+    dans une nouvelle matrice et ré-entraîne l'index IVF.
+    """
+
+    stores_text: bool = False
+    flat_metadata: bool = True
+    quantization: str = VECTOR_QUANTIZATION  # Appliquée au prochain `persist`
+
+    _vectors: Optional[np.ndarray] = PrivateAttr(default=None)
+    _node_ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[Optional[str]] = PrivateAttr(default_factory=list)
+    _metadata: List[Dict] = PrivateAttr(default_factory=list)
+    _pending: List[np.ndarray] = PrivateAttr(default_factory=list)
+    _deleted: set = PrivateAttr(default_factory=set)
+    _row_by_id: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _rows_by_ref_doc: Dict[str, List[int]] = PrivateAttr(default_factory=dict)
+    _values_index: Dict[str, Dict[Any, List[int]]] = PrivateAttr(default_factory=dict)  # Clé -> valeur -> lignes
+    _centroids: Optional[np.ndarray] = PrivateAttr(default=None)
+    _ivf_order: Optional[np.ndarray] = PrivateAttr(default=None)
+    _ivf_offsets: Optional[np.ndarray] = PrivateAttr(default=None)
+    _codes: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: Optional[np.ndarray] = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.RLock)
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @classmethod
+    def exists(cls, persist_dir: str) -> bool:
+        return os.path.exists(os.path.join(persist_dir, ROWS_FILE))
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str) -> "MmapVectorStore":
+        """Ouvre un store persistant (chargement quasi instantané grâce au mmap)."""
+        store = cls()
+        store._load(persist_dir)
+        return store
+
+    @classmethod
+    def from_simple_vector_store(cls, simple_store) -> "MmapVectorStore":
+        """Convertit un SimpleVectorStore (JSON) existant."""
+        store = cls()
+        data = simple_store.data
+        for node_id, embedding in data.embedding_dict.items():
+            store._append(
+                node_id,
+                data.text_id_to_ref_doc_id.get(node_id),
+                data.metadata_dict.get(node_id, {}),
+                embedding
+            )
+        return store
+
+    def iter_rows(self):
+        """Parcourt les vecteurs actifs : (node_id, ref_doc_id, métadonnées, embedding normalisé)."""
+        with self._lock:
+            base_count = self._base_count
+            for row, node_id in enumerate(self._node_ids):
+                if row in self._deleted:
+                    continue
+                embedding = self._vectors[row] if row < base_count else self._pending[row - base_count]
+                # Copie : aucune vue ne garde le fichier mappé ouvert
+                yield node_id, self._ref_doc_ids[row], self._metadata[row], np.array(embedding, dtype=np.float32)
+
+    @property
+    def _base_count(self) -> int:
+        return 0 if self._vectors is None else len(self._vectors)
+
+    def _index_row(self, row: int):
+        """Enregistre une ligne dans les tables de correspondance (nœud, document, valeurs de métadonnées)."""
+        self._row_by_id[self._node_ids[row]] = row
+        ref_doc_id = self._ref_doc_ids[row]
+        if ref_doc_id is not None:
+            self._rows_by_ref_doc.setdefault(ref_doc_id, []).append(row)
+        for key, value in self._metadata[row].items():
+            self._values_index.setdefault(key, {}).setdefault(value, []).append(row)
+
+    def _set_rows(self, vectors: Optional[np.ndarray], node_ids: List[str], ref_doc_ids: List[Optional[str]], metadata: List[Dict]):
+        """Remplace toutes les lignes (sans tampon ni suppressions, index IVF et codes retirés)."""
+        self._vectors = vectors
+        self._node_ids = node_ids
+        self._ref_doc_ids = ref_doc_ids
+        self._metadata = metadata
+        self._pending = []
+        self._deleted = set()
+        self._row_by_id = {node_id: row for row, node_id in enumerate(node_ids)}
+
+        # Tables construites en une passe (variables locales : ~10x plus rapide que `_index_row`)
+        rows_by_ref_doc: Dict[str, List[int]] = {}
+        for row, ref_doc_id in enumerate(ref_doc_ids):
+            if ref_doc_id is not None:
+                rows_by_ref_doc.setdefault(ref_doc_id, []).append(row)
+        values_index: Dict[str, Dict[Any, List[int]]] = {}
+        for row, row_metadata in enumerate(metadata):
+            for key, value in row_metadata.items():
+                buckets = values_index.get(key)
+                if buckets is None:
+                    buckets = values_index[key] = {}
+                rows = buckets.get(value)
+                if rows is None:
+                    buckets[value] = [row]
+                else:
+                    rows.append(row)
+        self._rows_by_ref_doc = rows_by_ref_doc
+        self._values_index = values_index
+
+        self._centroids = None
+        self._ivf_order = None
+        self._ivf_offsets = None
+        self._codes = None
+        self._scales = None
+
+    def _append(self, node_id: str, ref_doc_id: Optional[str], metadata: Dict, embedding):
+        """Ajoute une ligne au tampon (remplace la précédente version du nœud)."""
+        previous = self._row_by_id.get(node_id)
+        if previous is not None:
+            self._deleted.add(previous)
+
+        row = len(self._node_ids)
+        self._node_ids.append(node_id)
+        self._ref_doc_ids.append(ref_doc_id)
+        self._metadata.append(_flat_metadata(metadata or {}))
+        self._pending.append(_normalize(np.asarray(embedding, dtype=np.float32)))
+        self._index_row(row)
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        with self._lock:
+            for node in nodes:
+                self._append(node.node_id, node.ref_doc_id, node.metadata, node.get_embedding())
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._lock:
+            for row in self._rows_by_ref_doc.pop(ref_doc_id, []):
+                self._deleted.add(row)
+                if self._row_by_id.get(self._node_ids[row]) == row:
+                    del self._row_by_id[self._node_ids[row]]
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None, **delete_kwargs: Any) -> None:
+        with self._lock:
+            for node_id in node_ids or []:
+                row = self._row_by_id.pop(node_id, None)
+                if row is not None:
+                    self._deleted.add(row)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._set_rows(None, [], [], [])
+
+    def _candidate_rows(self, query_vector: np.ndarray, query: VectorStoreQuery) -> np.ndarray:
+        """Lignes à évaluer : listes IVF sondées, ou toutes si pas d'IVF / filtres."""
+        total = len(self._node_ids)
+        if query.filters is not None:
+            return np.flatnonzero(_filter_mask(self._values_index, total, query.filters)).astype(np.int64)
+        if query.node_ids:
+            return np.array(
+                [self._row_by_id[node_id] for node_id in query.node_ids if node_id in self._row_by_id],
+                dtype=np.int64
+            )
+        if self._centroids is None:
+            return np.arange(total, dtype=np.int64)
+
+        nprobe = min(IVF_NPROBE, len(self._centroids))
+        centroid_scores = self._centroids @ query_vector
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        base_rows = np.concatenate([
+            self._ivf_order[self._ivf_offsets[c]:self._ivf_offsets[c + 1]] for c in probes
+        ]).astype(np.int64)
+        pending_rows = np.arange(self._base_count, total, dtype=np.int64)
+        return np.concatenate([base_rows, pending_rows])
+
+    def _score_rows(
+        self,
+        rows: np.ndarray,
+        query_vector: np.ndarray,
+        rescore_top_k: Optional[int] = None,
+        mask: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Produit scalaire (= cosinus) entre la requête et les lignes demandées.
+
+        `query_vector` peut aussi être une matrice (dimension × requêtes) :
+        le résultat a alors une colonne par requête. `mask` (mêmes dimensions
+        que le résultat) exclut des couples ligne / requête (score -inf).
+
+        Si le store est quantifié et `rescore_top_k` fourni, les lignes
+        persistées sont d'abord notées sur les codes quantifiés ; seules les
+        `rescore_top_k × RESCORE_FACTOR` meilleures de chaque requête reçoivent
+        leur score exact (float32), les autres valent -inf.
+        """
+        base_count = self._base_count
+        scores = np.empty((len(rows),) + query_vector.shape[1:], dtype=np.float32)
+        in_base = rows < base_count
+        if in_base.any():
+            base_rows = rows[in_base]
+            base_mask = None if mask is None else mask[in_base]
+            if self._codes is not None and rescore_top_k is not None:
+                scores[in_base] = self._rescore(base_rows, query_vector, rescore_top_k * RESCORE_FACTOR, base_mask)
+            else:
+                scores[in_base] = _read_rows(self._vectors, base_rows) @ query_vector
+        if (~in_base).any():
+            pending = np.stack([self._pending[row - base_count] for row in rows[~in_base]])
+            scores[~in_base] = pending @ query_vector
+        if mask is not None:
+            scores[~mask] = -np.inf
+        return scores
+
+    def _approximate_scores(self, rows: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+        """Scores approchés à partir des codes quantifiés, par blocs de lignes."""
+        scores = np.empty((len(rows),) + query_vector.shape[1:], dtype=np.float32)
+        dim = self._vectors.shape[1]
+        for start in range(0, len(rows), SCORE_CHUNK_ROWS):
+            chunk = rows[start:start + SCORE_CHUNK_ROWS]
+            codes = _read_rows(self._codes, chunk)
+            if self._scales is not None:
+                chunk_scores = codes.astype(np.float32) @ query_vector
+                chunk_scores *= self._scales[chunk].reshape((-1,) + (1,) * (query_vector.ndim - 1))
+            else:
+                # Signes ±1 : le score approché est Σ signe(x_i) · q_i
+                signs = _BYTE_SIGNS[codes].reshape(len(chunk), -1)[:, :dim]
+                chunk_scores = signs @ query_vector
+            scores[start:start + SCORE_CHUNK_ROWS] = chunk_scores
+        return scores
+
+    def _rescore(
+        self,
+        rows: np.ndarray,
+        query_vector: np.ndarray,
+        shortlist: int,
+        mask: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """Présélection sur les codes quantifiés puis score exact des `shortlist` meilleurs par requête."""
+        approximate = self._approximate_scores(rows, query_vector).reshape(len(rows), -1)
+        if mask is not None:
+            approximate[~mask.reshape(len(rows), -1)] = -np.inf
+        if shortlist < len(rows):
+            best = np.argpartition(-approximate, shortlist - 1, axis=0)[:shortlist]
+            keep = np.zeros(approximate.shape, dtype=bool)
+            np.put_along_axis(keep, best, True, axis=0)
+        else:
+            keep = np.ones(approximate.shape, dtype=bool)
+
+        scores = np.full(approximate.shape, -np.inf, dtype=np.float32)
+        selected = np.flatnonzero(keep.any(axis=1))
+        exact = (_read_rows(self._vectors, rows[selected]) @ query_vector).reshape(len(selected), -1)
+        scores[selected] = np.where(keep[selected], exact, -np.inf)
+        return scores.reshape((len(rows),) + query_vector.shape[1:])
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.query_embedding is None:
+            raise ValueError("Un embedding de requête est requis.")
+
+        query_vector = _normalize(np.asarray(query.query_embedding, dtype=np.float32))
+        top_k = query.similarity_top_k
+
+        with self._lock:
+            rows = self._candidate_rows(query_vector, query)
+            if self._deleted and len(rows):
+                rows = rows[~np.isin(rows, np.fromiter(self._deleted, dtype=np.int64))]
+            if len(rows) == 0:
+                return VectorStoreQueryResult(nodes=None, similarities=[], ids=[])
+
+            scores = self._score_rows(rows, query_vector, rescore_top_k=top_k)
+            best = np.flatnonzero(np.isfinite(scores))
+            if len(best) > top_k:
+                best = best[np.argpartition(-scores[best], top_k - 1)[:top_k]]
+            best = best[np.argsort(-scores[best])]
+
+            return VectorStoreQueryResult(
+                nodes=None,
+                similarities=[float(scores[i]) for i in best],
+                ids=[self._node_ids[rows[i]] for i in best]
+            )
+
+    def query_batch(
+        self,
+        query_embeddings: List[List[float]],
+        similarity_top_k: int,
+        filters: Optional[MetadataFilters] = None
+    ) -> List[VectorStoreQueryResult]:
+        """
+        Plusieurs requêtes (mêmes top_k et filtres) évaluées ensemble.
+
+        Les lignes candidates de toutes les requêtes sont réunies et lues une
+        seule fois, puis notées par un unique produit matriciel ; chaque
+        requête ne garde que ses propres candidats (listes IVF sondées).
+        """
+        if not query_embeddings:
+            return []
+        query_vectors = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+
+        with self._lock:
+            candidates = [
+                self._candidate_rows(vector, VectorStoreQuery(
+                    query_embedding=vector.tolist(),
+                    similarity_top_k=similarity_top_k,
+                    filters=filters
+                ))
+                for vector in (query_vectors[:1] if filters is not None or self._centroids is None else query_vectors)
+            ]
+            rows = np.unique(np.concatenate(candidates)) if candidates else np.zeros(0, dtype=np.int64)
+            if self._deleted and len(rows):
+                rows = rows[~np.isin(rows, np.fromiter(self._deleted, dtype=np.int64))]
+            if len(rows) == 0:
+                return [VectorStoreQueryResult(nodes=None, similarities=[], ids=[]) for _ in query_vectors]
+
+            mask = None
+            if len(candidates) > 1:
+                mask = np.stack([np.isin(rows, candidate_rows) for candidate_rows in candidates], axis=1)
+            scores = self._score_rows(rows, query_vectors.T, rescore_top_k=similarity_top_k, mask=mask)
+
+            results = []
+            for column in range(len(query_vectors)):
+                column_scores = scores[:, column]
+                valid = np.flatnonzero(np.isfinite(column_scores))
+                if len(valid) > similarity_top_k:
+                    valid = valid[np.argpartition(-column_scores[valid], similarity_top_k - 1)[:similarity_top_k]]
+                best = valid[np.argsort(-column_scores[valid])]
+                results.append(VectorStoreQueryResult(
+                    nodes=None,
+                    similarities=[float(column_scores[i]) for i in best],
+                    ids=[self._node_ids[rows[i]] for i in best]
+                ))
+            return results
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """
+        Compacte et écrit le store dans le répertoire de `persist_path`.
+
+        `persist_path` est le chemin fourni par StorageContext pour le vector
+        store JSON ; seuls les fichiers mmap_* de son répertoire sont écrits.
+        """
+        persist_dir = os.path.dirname(persist_path) or "."
+        os.makedirs(persist_dir, exist_ok=True)
+
+        with self._lock:
+            keep = [row for row in range(len(self._node_ids)) if row not in self._deleted]
+            base_count = self._base_count
+            base_keep = np.array([row for row in keep if row < base_count], dtype=np.int64)
+            parts = []
+            if len(base_keep):
+                parts.append(np.asarray(self._vectors[base_keep]))
+            pending_keep = [self._pending[row - base_count] for row in keep if row >= base_count]
+            if pending_keep:
+                parts.append(np.stack(pending_keep))
+            dim = parts[0].shape[1] if parts else 0
+            vectors = np.concatenate(parts) if parts else np.zeros((0, dim), dtype=np.float32)
+            vectors = vectors.astype(np.float32, copy=False)
+
+            # Compacter en mémoire d'abord : les matrices mappées sont libérées
+            # avant de remplacer ou supprimer leurs fichiers (refusé sous Windows
+            # tant qu'un fichier est mappé), et le store reste utilisable si
+            # l'écriture échoue
+            parts = pending_keep = None
+            self._set_rows(
+                vectors,
+                [self._node_ids[row] for row in keep],
+                [self._ref_doc_ids[row] for row in keep],
+                [self._metadata[row] for row in keep]
+            )
+
+            _save_npy(os.path.join(persist_dir, VECTORS_FILE), self._vectors)
+
+            for name in (CENTROIDS_FILE, ORDER_FILE, OFFSETS_FILE, CODES_FILE, SCALES_FILE):
+                path = os.path.join(persist_dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            if len(vectors) >= IVF_MIN_VECTORS:
+                nlist = max(1, min(4096, int(np.sqrt(len(vectors)))))
+                centroids, order, offsets = train_ivf(vectors, nlist)
+                _save_npy(os.path.join(persist_dir, CENTROIDS_FILE), centroids)
+                _save_npy(os.path.join(persist_dir, ORDER_FILE), order)
+                _save_npy(os.path.join(persist_dir, OFFSETS_FILE), offsets)
+            if self.quantization != "none" and len(vectors):
+                codes, scales = quantize(vectors, self.quantization)
+                _save_npy(os.path.join(persist_dir, CODES_FILE), codes)
+                if scales is not None:
+                    _save_npy(os.path.join(persist_dir, SCALES_FILE), scales)
+
+            rows_path = os.path.join(persist_dir, ROWS_FILE)
+            with open(f"{rows_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({
+                    "dim": dim,
+                    "node_ids": self._node_ids,
+                    "ref_doc_ids": self._ref_doc_ids,
+                    "metadata": self._metadata
+                }, f, ensure_ascii=False)
+            os.replace(f"{rows_path}.tmp", rows_path)
+
+            # Rouvrir en mmap : la mémoire redevient partagée avec les autres workers
+            self._open_matrices(persist_dir)
+
+    def _load(self, persist_dir: str):
+        """Ouvre les fichiers persistés (matrices en mmap lecture seule) et indexe les lignes."""
+        with open(os.path.join(persist_dir, ROWS_FILE), "r", encoding="utf-8") as f:
+            rows = json.load(f)
+
+        with self._lock:
+            self._set_rows(None, rows["node_ids"], rows["ref_doc_ids"], rows["metadata"])
+            self._open_matrices(persist_dir)
+
+    def _open_matrices(self, persist_dir: str):
+        """Ouvre la matrice des vecteurs, l'index IVF et les codes quantifiés d'un répertoire."""
+        self._vectors = np.load(os.path.join(persist_dir, VECTORS_FILE), mmap_mode="r")
+
+        centroids_path = os.path.join(persist_dir, CENTROIDS_FILE)
+        if os.path.exists(centroids_path):
+            self._centroids = np.load(centroids_path, mmap_mode="r")
+            self._ivf_order = np.load(os.path.join(persist_dir, ORDER_FILE), mmap_mode="r")
+            self._ivf_offsets = np.load(os.path.join(persist_dir, OFFSETS_FILE))
+        else:
+            self._centroids = None
+            self._ivf_order = None
+            self._ivf_offsets = None
+
+        codes_path = os.path.join(persist_dir, CODES_FILE)
+        scales_path = os.path.join(persist_dir, SCALES_FILE)
+        self._codes = np.load(codes_path, mmap_mode="r") if os.path.exists(codes_path) else None
+        self._scales = np.load(scales_path) if os.path.exists(scales_path) else None
+
+    def _loaded_quantization(self) -> str:
+        """Quantification des fichiers ouverts (la configuration ne s'applique qu'au prochain `persist`)."""
+        if self._codes is None:
+            return "none"
+        return "binary" if self._scales is None else "int8"
+
+    def get_stats(self) -> Dict:
+        """Retourne la taille du store, l'état de l'index IVF et la mémoire de la quantification."""
+        with self._lock:
+            full_bytes = 0 if self._vectors is None else int(self._vectors.nbytes)
+            scan_bytes = full_bytes
+            if self._codes is not None:
+                scan_bytes = int(self._codes.nbytes) + (0 if self._scales is None else int(self._scales.nbytes))
+            return {
+                "backend": "mmap",
+                "vectors": len(self._node_ids) - len(self._deleted),
+                "pending": len(self._pending),
+                "dim": int(self._vectors.shape[1]) if self._vectors is not None and len(self._vectors) else None,
+                "ivf_lists": None if self._centroids is None else len(self._centroids),
+                "nprobe": IVF_NPROBE,
+                "quantization": self._loaded_quantization(),
+                "rescore_factor": RESCORE_FACTOR,
+                "full_precision_bytes": full_bytes,
+                "scan_bytes": scan_bytes,
+                "memory_saved": round(1 - scan_bytes / full_bytes, 4) if full_bytes else 0.0
+            }
@@ -0,0 +1,219 @@
+"""
+Pool de clients LLM et de moteurs de requête réutilisables
+Évite de recréer un client (et sa connexion HTTP) à chaque requête
+"""
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from llama_index.core import get_response_synthesizer
+from llama_index.core.indices.vector_store.retrievers import VectorIndexRetriever
+from llama_index.core.prompts import PromptTemplate
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.vector_stores import MetadataFilters
+
+from utils.locks import ReadWriteLock
+
+
+logger = logging.getLogger("service_rag")
+
+RESPONSE_MODE = "compact"
+
+
+def _template_key(template: Optional[PromptTemplate]) -> Optional[Tuple]:
+    """Identifie un prompt par son texte et ses variables déjà renseignées (partial_format)."""
+    if template is None:
+        return None
+    return template.template, tuple(sorted((name, repr(value)) for name, value in template.kwargs.items()))
+
+
+class IndexReadRetriever(VectorIndexRetriever):
+    """
+    Retriever dont la recherche (vector store puis docstore) attend la fin
+    des écritures en place sur l'index (événements, voir `index_lock`).
+
+    L'embedding de la question est calculé avant de prendre le verrou.
+    Aucune liste de nœuds n'est figée à la création (contrairement à
+    `VectorStoreIndex.as_retriever`) : les nœuds ajoutés ensuite à l'index
+    sont trouvés par les retrievers existants.
+    """
+
+    def __init__(self, index, index_lock: ReadWriteLock, **kwargs):
+        super().__init__(index, **kwargs)
+        self._index_lock = index_lock
+
+    def _get_nodes_with_embeddings(self, query_bundle):
+        with self._index_lock.read():
+            return super()._get_nodes_with_embeddings(query_bundle)
+
+
+class ModelPool:
+    """
+    Registre des LLM, retrievers et query engines, indexés par configuration.
+
+    - un client LLM par (model_type, model_name), dont la connexion HTTP
+      est conservée entre les requêtes (keep-alive)
+    - un retriever par (top_k, domaines interrogés), lié à l'index courant
+    - un query engine par (model_type, model_name, top_k, domaines) pour le prompt par défaut
+    - un synthétiseur de réponse par (model_type, model_name, prompt), pour
+      les passages déjà retrouvés (requêtes par lot)
+    """
+
+    def __init__(self, llm_factory: Callable[[str, str], object], index_lock: ReadWriteLock):
+        self._llm_factory = llm_factory
+        self._index_lock = index_lock
+        self._llms: Dict[Tuple[str, str], object] = {}
+        self._retrievers: Dict[Tuple, object] = {}
+        self._query_engines: Dict[Tuple, RetrieverQueryEngine] = {}
+        self._synthesizers: Dict[Tuple, object] = {}
+        self._index = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_llm(self, model_type: str, model_name: str):
+        """Retourne le client LLM partagé pour ce modèle (créé à la première demande)."""
+        key = (model_type, model_name)
+        llm = self._llms.get(key)
+        if llm is not None:
+            self._hits += 1
+            return llm
+
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is None:
+                self._misses += 1
+                llm = self._llm_factory(model_type, model_name)
+                self._llms[key] = llm
+        return llm
+
+    def get_retriever(
+        self,
+        index,
+        top_k: int,
+        filters: Optional[MetadataFilters] = None,
+        shards: Optional[List[str]] = None
+    ):
+        """
+        Retourne le retriever partagé pour ce top_k sur l'index courant.
+
+        Avec des filtres de métadonnées, un retriever dédié (non mis en cache)
+        est créé. `shards` restreint la recherche à ces domaines d'un index
+        partitionné (voir utils/sharded_vector_store.py).
+        """
+        self._bind_index(index)
+        retriever_kwargs = {"vector_store_kwargs": {"shards": shards}} if shards else {}
+        if filters is not None:
+            return IndexReadRetriever(index, self._index_lock, similarity_top_k=top_k, filters=filters, **retriever_kwargs)
+        key = (top_k, tuple(shards) if shards else None)
+        retriever = self._retrievers.get(key)
+        if retriever is None:
+            with self._lock:
+                retriever = self._retrievers.get(key)
+                if retriever is None:
+                    retriever = IndexReadRetriever(index, self._index_lock, similarity_top_k=top_k, **retriever_kwargs)
+                    self._retrievers[key] = retriever
+        return retriever
+
+    def get_query_engine(
+        self,
+        index,
+        model_type: str,
+        model_name: str,
+        top_k: int,
+        text_qa_template: Optional[PromptTemplate] = None,
+        cache_key: Optional[str] = "default",
+        streaming: bool = False,
+        filters: Optional[MetadataFilters] = None,
+        shards: Optional[List[str]] = None
+    ) -> RetrieverQueryEngine:
+        """
+        Retourne un query engine pour cette configuration.
+
+        Le moteur est mis en cache lorsque `cache_key` est fourni (prompt fixe).
+        Avec `cache_key=None` (prompt propre à la requête, ex. contexte de
+        conversation), un moteur léger est assemblé à partir du LLM et du
+        retriever partagés. Avec `streaming=True`, la réponse expose un
+        générateur de tokens (`response_gen`). Avec des filtres de métadonnées,
+        la recherche est restreinte aux nœuds correspondants et le moteur n'est
+        pas mis en cache ; avec `shards`, elle est restreinte à ces domaines.
+        """
+        self._bind_index(index)
+        if filters is not None:
+            cache_key = None
+        key = (model_type, model_name, top_k, tuple(shards) if shards else None, cache_key, streaming)
+
+        if cache_key is not None:
+            engine = self._query_engines.get(key)
+            if engine is not None:
+                return engine
+
+        llm = self.get_llm(model_type, model_name)
+        retriever = self.get_retriever(index, top_k, filters=filters, shards=shards)
+        synthesizer = get_response_synthesizer(
+            llm=llm,
+            text_qa_template=text_qa_template,
+            response_mode=RESPONSE_MODE,
+            streaming=streaming
+        )
+        engine = RetrieverQueryEngine(
+            retriever=retriever,
+            response_synthesizer=synthesizer
+        )
+
+        if cache_key is not None:
+            with self._lock:
+                self._query_engines.setdefault(key, engine)
+                engine = self._query_engines[key]
+        return engine
+
+    def get_synthesizer(self, model_type: str, model_name: str, text_qa_template: Optional[PromptTemplate] = None):
+        """
+        Retourne le synthétiseur partagé pour ce modèle et ce prompt.
+
+        Il ne dépend pas de l'index : il génère la réponse à partir des
+        passages qui lui sont fournis.
+        """
+        key = (model_type, model_name, _template_key(text_qa_template))
+        synthesizer = self._synthesizers.get(key)
+        if synthesizer is None:
+            llm = self.get_llm(model_type, model_name)
+            with self._lock:
+                synthesizer = self._synthesizers.get(key)
+                if synthesizer is None:
+                    synthesizer = get_response_synthesizer(
+                        llm=llm,
+                        text_qa_template=text_qa_template,
+                        response_mode=RESPONSE_MODE
+                    )
+                    self._synthesizers[key] = synthesizer
+        return synthesizer
+
+    def _bind_index(self, index):
+        """Invalide les retrievers et moteurs si l'index a changé."""
+        if index is not self._index:
+            with self._lock:
+                if index is not self._index:
+                    self._retrievers.clear()
+                    self._query_engines.clear()
+                    self._index = index
+                    logger.debug("Pool de modèles lié à un nouvel index")
+
+    def reset_index(self):
+        """Oublie les retrievers et moteurs liés à l'index (après réindexation)."""
+        with self._lock:
+            self._retrievers.clear()
+            self._query_engines.clear()
+            self._index = None
+
+    def get_stats(self) -> Dict:
+        """Retourne l'état du pool."""
+        return {
+            "llms": [f"{model_type}/{model_name}" for model_type, model_name in self._llms],
+            "retrievers": sorted({top_k for top_k, _ in self._retrievers}),
+            "sharded_retrievers": sum(1 for _, shards in self._retrievers if shards),
+            "query_engines": len(self._query_engines),
+            "synthesizers": len(self._synthesizers),
+            "llm_hits": self._hits,
+            "llm_misses": self._misses
+        }
@@ -0,0 +1,138 @@
+"""
+Backends hors ligne et déterministes (model_type "offline")
+Permettent de faire tourner et de mesurer le service RAG sans clé OpenAI ni
+Ollama (CI, benchmarks) : un embedding par hachage des mots et un LLM qui
+renvoie une réponse fixe ou l'écho de la question, avec une latence simulée
+configurable pour reproduire le coût d'un appel réseau
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+from typing import Any, List
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import CompletionResponse, CompletionResponseGen, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+
+# CONFIGURATION
+HASH_EMBEDDING_DIM = int(os.getenv("RAG_OFFLINE_EMBED_DIM", "256"))
+EMBED_LATENCY = float(os.getenv("RAG_OFFLINE_EMBED_LATENCY_MS", "0")) / 1000  # Par appel (un lot = un appel)
+LLM_LATENCY = float(os.getenv("RAG_OFFLINE_LLM_LATENCY_MS", "0")) / 1000  # Avant le premier token
+LLM_TOKEN_LATENCY = float(os.getenv("RAG_OFFLINE_LLM_TOKEN_LATENCY_MS", "0")) / 1000  # Entre deux tokens
+CANNED_RESPONSE = os.getenv(
+    "RAG_OFFLINE_LLM_RESPONSE",
+    "Ceci est une réponse simulée de TalentBot (backend hors ligne)."
+)
+
+OFFLINE_LLM_MODELS = ["echo", "canned"]
+
+_WORD_PATTERN = re.compile(r"\w+")
+_QUESTION_PATTERN = re.compile(r"Question\s*:\s*(.+)")
+
+
+class HashEmbedding(BaseEmbedding):
+    """
+    Embedding déterministe par hachage des mots (feature hashing signé).
+
+    Deux textes partageant des mots ont des vecteurs proches : la recherche
+    reste pertinente sur un corpus synthétique, sans modèle à charger.
+    """
+
+    dimension: int = HASH_EMBEDDING_DIM
+    latency: float = EMBED_LATENCY
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in _WORD_PATTERN.findall(text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimension] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._embed(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+
+class EchoLLM(CustomLLM):
+    """
+    LLM simulé : renvoie `response` si elle est fournie, sinon l'écho de la
+    question trouvée dans le prompt. Le streaming émet la réponse mot par mot.
+    """
+
+    model_name: str = "echo"
+    response: str = ""  # Réponse fixe ("" : écho de la question)
+    latency: float = LLM_LATENCY
+    token_latency: float = LLM_TOKEN_LATENCY
+    context_window: int = 16384
+    num_output: int = 512
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "EchoLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(
+            context_window=self.context_window,
+            num_output=self.num_output,
+            model_name=self.model_name
+        )
+
+    def _answer(self, prompt: str) -> str:
+        if self.response:
+            return self.response
+        questions = _QUESTION_PATTERN.findall(prompt)
+        question = questions[-1].strip() if questions else prompt.strip().splitlines()[-1]
+        return f"Réponse simulée à la question : {question}"
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        text = self._answer(prompt)
+        time.sleep(self.latency + self.token_latency * len(text.split()))
+        return CompletionResponse(text=text)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        text = self._answer(prompt)
+
+        def generate():
+            time.sleep(self.latency)
+            emitted = ""
+            for token in re.findall(r"\S+\s*", text):
+                time.sleep(self.token_latency)
+                emitted += token
+                yield CompletionResponse(text=emitted, delta=token)
+
+        return generate()
+
+
+def create_offline_llm(model_name: str) -> EchoLLM:
+    """LLM hors ligne : "echo" (écho de la question) ou "canned" (RAG_OFFLINE_LLM_RESPONSE)."""
+    if model_name == "echo":
+        return EchoLLM(model_name=model_name)
+    if model_name == "canned":
+        return EchoLLM(model_name=model_name, response=CANNED_RESPONSE)
+    raise ValueError(f"Modèle hors ligne inconnu: {model_name} (disponibles: {', '.join(OFFLINE_LLM_MODELS)})")
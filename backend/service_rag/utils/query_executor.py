@@ -0,0 +1,137 @@
+"""
+Exécuteur borné pour les requêtes RAG bloquantes
+Évite que les appels LLM synchrones ne figent la boucle d'événements
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from fastapi import HTTPException
+
+
+# CONFIGURATION
+QUERY_WORKERS = int(os.getenv("RAG_QUERY_WORKERS", "8"))
+MAX_PENDING_QUERIES = int(os.getenv("RAG_MAX_PENDING_QUERIES", "32"))
+QUEUE_TIMEOUT = float(os.getenv("RAG_QUEUE_TIMEOUT", "10"))
+QUERY_TIMEOUT = float(os.getenv("RAG_QUERY_TIMEOUT", "120"))
+
+# Nombre maximal de requêtes simultanées par backend de modèle
+BACKEND_CONCURRENCY = {
+    "openai": int(os.getenv("RAG_MAX_CONCURRENT_OPENAI", "8")),
+    "ollama": int(os.getenv("RAG_MAX_CONCURRENT_OLLAMA", "2")),
+}
+DEFAULT_BACKEND_CONCURRENCY = int(os.getenv("RAG_MAX_CONCURRENT_DEFAULT", "4"))
+
+
+class QueryExecutor:
+    """Exécute les appels bloquants dans un pool de threads avec limites par backend."""
+
+    def __init__(
+        self,
+        max_workers: int = QUERY_WORKERS,
+        max_pending: int = MAX_PENDING_QUERIES,
+        queue_timeout: float = QUEUE_TIMEOUT,
+        query_timeout: float = QUERY_TIMEOUT,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.query_timeout = query_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="rag-query"
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._running: Dict[str, int] = {}
+        self._pending = 0
+        self._rejected = 0
+        self._timeouts = 0
+
+    def _get_semaphore(self, backend: str) -> asyncio.Semaphore:
+        """Retourne le sémaphore associé à un backend (créé à la demande)."""
+        if backend not in self._semaphores:
+            limit = BACKEND_CONCURRENCY.get(backend, DEFAULT_BACKEND_CONCURRENCY)
+            self._semaphores[backend] = asyncio.Semaphore(limit)
+            self._running[backend] = 0
+        return self._semaphores[backend]
+
+    def _release(self, backend: str):
+        """Libère une place pour le backend une fois le thread réellement terminé."""
+        self._running[backend] -= 1
+        self._semaphores[backend].release()
+
+    async def run(self, backend: str, func: Callable, *args, **kwargs):
+        """
+        Exécute `func` dans le pool de threads.
+
+        Lève une HTTPException 503 si la file d'attente est saturée ou si aucune
+        place ne se libère pour ce backend avant `queue_timeout`, et 504 si
+        l'appel dépasse `query_timeout`.
+        """
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Le service est saturé, veuillez réessayer dans quelques instants."
+            )
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(backend)
+
+        self._pending += 1
+        try:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Trop de requêtes en cours pour le backend '{backend}', veuillez réessayer."
+                )
+        finally:
+            self._pending -= 1
+
+        self._running[backend] += 1
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except BaseException:
+            self._release(backend)
+            raise
+
+        # Le sémaphore n'est libéré qu'à la fin effective du thread,
+        # même si l'appelant a abandonné suite à un timeout
+        future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self._release, backend)
+        )
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                timeout=self.query_timeout
+            )
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise HTTPException(
+                status_code=504,
+                detail="Le modèle n'a pas répondu dans le délai imparti."
+            )
+
+    def get_stats(self) -> Dict:
+        """Retourne l'état courant de l'exécuteur."""
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "running": dict(self._running),
+            "rejected": self._rejected,
+            "timeouts": self._timeouts
+        }
+
+    def shutdown(self):
+        """Arrête le pool de threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Instance globale
+query_executor = QueryExecutor()
@@ -0,0 +1,72 @@
+"""
+Déduction de filtres de métadonnées à partir de la question
+Une question portant sur un type d'entité ET un statut (ex. "offres publiées",
+"rendez-vous confirmés") ne cherche que parmi les nœuds correspondants
+(voir les métadonnées entity_type / statut posées par utils/db_sync.py)
+"""
+import os
+import re
+import unicodedata
+from typing import Dict, Optional
+
+
+# CONFIGURATION
+AUTO_FILTERS_ENABLED = os.getenv("RAG_AUTO_FILTERS", "true").lower() == "true"
+
+# Par type d'entité : motif désignant l'entité, puis motifs des statuts
+# (sur la question en minuscules et sans accents)
+ENTITY_STATUS_PATTERNS = {
+    "offre": (
+        r"\boffres?\b",
+        {
+            "published": r"\b(publiees?|ouvertes?|en ligne)\b",
+            "draft": r"\bbrouillons?\b",
+            "closed": r"\b(fermees?|cloturees?|expirees?)\b"
+        }
+    ),
+    "candidature": (
+        r"\bcandidatures?\b",
+        {
+            "submitted": r"\b(soumises?|envoyees?|deposees?)\b",
+            "in_review": r"\ben cours (d'|d )?(examen|etude)\b",
+            "interview": r"\ben entretien\b",
+            "offered": r"\b(acceptees?|retenues?)\b",
+            "rejected": r"\b(refusees?|rejetees?)\b",
+            "withdrawn": r"\b(retirees?|annulees?)\b"
+        }
+    ),
+    "rendez_vous": (
+        r"\b(rendez-vous|rdv)\b",
+        {
+            "pending": r"\ben attente\b",
+            "confirmed": r"\bconfirmes?\b",
+            "completed": r"\b(termines?|passes?)\b",
+            "cancelled": r"\bannules?\b",
+            "refused": r"\brefuses?\b"
+        }
+    )
+}
+
+
+def fold_text(text: str) -> str:
+    """Minuscules sans accents, pour des motifs indépendants de l'orthographe."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def infer_metadata_filters(question: str) -> Optional[Dict]:
+    """
+    Retourne {"entity_type": ..., "statut": ...} si la question désigne un
+    type d'entité et un seul de ses statuts, sinon None (recherche sur tout l'index).
+    """
+    if not AUTO_FILTERS_ENABLED:
+        return None
+
+    folded = fold_text(question)
+    for entity_type, (entity_pattern, status_patterns) in ENTITY_STATUS_PATTERNS.items():
+        if not re.search(entity_pattern, folded):
+            continue
+        statuses = [status for status, pattern in status_patterns.items() if re.search(pattern, folded)]
+        if len(statuses) == 1:
+            return {"entity_type": entity_type, "statut": statuses[0]}
+    return None
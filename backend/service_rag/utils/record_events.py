@@ -0,0 +1,86 @@
+"""
+File d'attente des événements de changement publiés par les services
+(ex. service_offers : offre créée, modifiée, publiée, fermée, supprimée)
+Les événements sont regroupés par enregistrement (le dernier l'emporte)
+puis appliqués à l'index par lots, pour un seul calcul d'embeddings par lot
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+
+# CONFIGURATION
+EVENTS_BATCH_WINDOW = float(os.getenv("RAG_EVENTS_BATCH_WINDOW", "2"))  # Secondes d'attente pour grouper les événements
+EVENTS_BATCH_SIZE = int(os.getenv("RAG_EVENTS_BATCH_SIZE", "256"))  # Enregistrements par lot au maximum
+
+
+def event_key(event: Dict) -> str:
+    """Clé de regroupement : un enregistrement d'une table d'un service."""
+    return f"{event['service']}:{event['table']}:{event['record_id']}"
+
+
+class RecordEventBuffer:
+    """
+    Tampon des événements en attente d'indexation, dans leur ordre d'arrivée.
+
+    Un nouvel événement sur un enregistrement déjà en attente remplace le
+    précédent : seul l'état le plus récent est indexé.
+    """
+
+    def __init__(self):
+        self._events: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "received": 0,
+            "coalesced": 0,
+            "requeued": 0,
+            "discarded": 0
+        }
+
+    def add(self, events: List[Dict]) -> int:
+        """Ajoute des événements ; retourne le nombre d'enregistrements en attente."""
+        with self._lock:
+            for event in events:
+                key = event_key(event)
+                if self._events.pop(key, None) is not None:
+                    self._stats["coalesced"] += 1
+                self._events[key] = event
+            self._stats["received"] += len(events)
+            return len(self._events)
+
+    def drain(self, limit: int = EVENTS_BATCH_SIZE) -> List[Dict]:
+        """Retire et retourne les `limit` événements les plus anciens."""
+        with self._lock:
+            batch = []
+            while self._events and len(batch) < limit:
+                batch.append(self._events.popitem(last=False)[1])
+            return batch
+
+    def requeue(self, events: List[Dict]):
+        """
+        Remet en tête un lot qui n'a pas pu être appliqué, sans écraser les
+        événements plus récents reçus entre-temps pour les mêmes enregistrements.
+        """
+        with self._lock:
+            for event in reversed(events):
+                key = event_key(event)
+                if key not in self._events:
+                    self._events[key] = event
+                    self._events.move_to_end(key, last=False)
+            self._stats["requeued"] += len(events)
+
+    def discard(self) -> int:
+        """Abandonne tous les événements en attente (aucun index à mettre à jour) ; retourne leur nombre."""
+        with self._lock:
+            count = len(self._events)
+            self._events.clear()
+            self._stats["discarded"] += count
+            return count
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {"pending": len(self._events), **self._stats}
@@ -0,0 +1,106 @@
+"""
+Suivi des tâches de réindexation exécutées en arrière-plan
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+
+MAX_JOBS_KEPT = 20
+
+
+class ReindexJobRegistry:
+    """
+    Registre en mémoire des tâches de réindexation (une seule active à la fois).
+
+    Le registre est propre à chaque worker : entre workers, les tâches sont
+    sérialisées par le verrou du stockage de l'index (voir index_storage.LOCK_FILE).
+    """
+
+    def __init__(self, max_jobs: int = MAX_JOBS_KEPT):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, mode: str) -> Optional[Dict]:
+        """Crée une tâche en attente, ou retourne None si une autre est déjà en cours."""
+        with self._lock:
+            if self._get_active_unlocked() is not None:
+                return None
+
+            job_id = str(uuid.uuid4())
+            job = {
+                "job_id": job_id,
+                "mode": mode,
+                "status": "pending",
+                "stage": "en attente",
+                "progress": {},
+                "created_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None
+            }
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            return dict(job)
+
+    def start(self, job_id: str):
+        self.update(job_id, status="running", started_at=datetime.now().isoformat())
+
+    def update(self, job_id: str, stage: Optional[str] = None, progress: Optional[Dict] = None, **fields):
+        """Met à jour l'étape, la progression ou d'autres champs d'une tâche."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if stage is not None:
+                job["stage"] = stage
+            if progress:
+                job["progress"].update(progress)
+            job.update(fields)
+
+    def succeed(self, job_id: str, result: Dict):
+        self.update(
+            job_id,
+            stage="terminée",
+            status="succeeded",
+            result=result,
+            finished_at=datetime.now().isoformat()
+        )
+
+    def fail(self, job_id: str, error: str):
+        self.update(
+            job_id,
+            stage="échec",
+            status="failed",
+            error=error,
+            finished_at=datetime.now().isoformat()
+        )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, progress=dict(job["progress"])) if job else None
+
+    def get_active(self) -> Optional[Dict]:
+        with self._lock:
+            job = self._get_active_unlocked()
+            return dict(job) if job else None
+
+    def list_jobs(self):
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
+
+    def _get_active_unlocked(self) -> Optional[Dict]:
+        for job in self._jobs.values():
+            if job["status"] in ("pending", "running"):
+                return job
+        return None
+
+
+# Instance globale
+reindex_jobs = ReindexJobRegistry()
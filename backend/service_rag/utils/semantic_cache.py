@@ -0,0 +1,196 @@
+"""
+Cache sémantique des réponses de TalentBot
+Réutilise la réponse d'une question déjà posée (ou très proche) sans refaire
+l'appel d'embedding, la recherche et la génération par le LLM
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# CONFIGURATION
+CACHE_ENABLED = os.getenv("RAG_CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("RAG_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL = float(os.getenv("RAG_CACHE_TTL", "3600"))
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RAG_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_question(question: str) -> str:
+    """Normalise une question : minuscules, sans ponctuation ni espaces superflus."""
+    text = unicodedata.normalize("NFC", question).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class SemanticCache:
+    """Cache LRU avec expiration, indexé par question normalisée et par embedding."""
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl: float = CACHE_TTL,
+        threshold: float = CACHE_SIMILARITY_THRESHOLD,
+        enabled: bool = CACHE_ENABLED,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0  # Incrémenté à chaque invalidation (changement de l'index)
+        self._stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "stale_puts": 0
+        }
+
+    @property
+    def generation(self) -> int:
+        """Génération courante, à relever avant de calculer une réponse (voir `put`)."""
+        return self._generation
+
+    def _is_expired(self, entry: Dict, now: float) -> bool:
+        return self.ttl > 0 and now - entry["created_at"] > self.ttl
+
+    def get_exact(self, normalized: str, scope: str) -> Optional[Dict]:
+        """Cherche une entrée pour exactement la même question normalisée."""
+        if not self.enabled:
+            return None
+
+        key = (scope, normalized)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._is_expired(entry, time.time()):
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["exact_hits"] += 1
+            return entry
+
+    def get_similar(self, embedding: List[float], scope: str) -> Optional[Dict]:
+        """Cherche l'entrée la plus proche au-dessus du seuil de similarité."""
+        if not self.enabled:
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if key[0] == scope
+            ]
+            if not candidates:
+                self._stats["misses"] += 1
+                return None
+
+            matrix = np.stack([entry["embedding"] for _, entry in candidates])
+            scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * query_norm + 1e-12)
+            best = int(np.argmax(scores))
+
+            if scores[best] < self.threshold:
+                self._stats["misses"] += 1
+                return None
+
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            self._stats["semantic_hits"] += 1
+            return entry
+
+    def put(
+        self,
+        normalized: str,
+        embedding: List[float],
+        scope: str,
+        answer: str,
+        sources: List[dict],
+        generation: Optional[int] = None
+    ):
+        """
+        Ajoute (ou remplace) une réponse dans le cache.
+
+        Avec `generation` (relevée avant le calcul de la réponse), la réponse
+        n'est pas mise en cache si le cache a été invalidé entre-temps : elle
+        a pu être calculée sur l'ancien index.
+        """
+        if not self.enabled:
+            return
+
+        key = (scope, normalized)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self._stats["stale_puts"] += 1
+                return
+            self._entries[key] = {
+                "question": normalized,
+                "embedding": np.asarray(embedding, dtype=np.float32),
+                "answer": answer,
+                "sources": sources,
+                "created_at": time.time()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _purge_expired(self, now: float):
+        """Supprime les entrées expirées (appelé avec le verrou acquis)."""
+        expired = [key for key, entry in self._entries.items() if self._is_expired(entry, now)]
+        for key in expired:
+            del self._entries[key]
+        self._stats["expirations"] += len(expired)
+
+    def clear(self):
+        """Vide le cache (ex. après une réindexation)."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+    def invalidate(self, predicate: Callable[[str], bool]):
+        """Supprime les entrées dont la portée vérifie `predicate` (ex. après la reconstruction d'un domaine)."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key[0])]:
+                del self._entries[key]
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict:
+        """Retourne les compteurs du cache."""
+        with self._lock:
+            hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "threshold": self.threshold,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "generation": self._generation,
+                **self._stats
+            }
+
+
+# Instance globale
+semantic_cache = SemanticCache()
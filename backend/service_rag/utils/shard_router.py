@@ -0,0 +1,82 @@
+"""
+Choix des domaines de l'index à interroger pour une question
+Avec un index partitionné (RAG_INDEX_SHARDS), une question qui ne porte que
+sur les offres, les profils ou les rendez-vous n'interroge que les domaines
+correspondants et la documentation du projet (voir utils/sharded_vector_store.py)
+"""
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from utils.db_sync import DB_SOURCES, ENTITY_TYPES
+from utils.query_filters import fold_text
+from utils.sharded_vector_store import SHARDS, SHARD_BY_SERVICE, DEFAULT_SHARD
+
+
+# CONFIGURATION
+SHARD_ROUTING_ENABLED = os.getenv("RAG_SHARD_ROUTING", "true").lower() == "true"
+
+# Par domaine : motif des sujets qui le concernent (sur la question en
+# minuscules et sans accents) ; une question peut concerner plusieurs domaines
+# (ex. les compétences figurent dans les offres comme dans les profils)
+SHARD_PATTERNS = {
+    "docs": r"\b(conception|architecture|diagrammes?|cas d'utilisation|use cases?|sprints?|exigences|specifications?|documentation|cahier des charges|maquettes?|fonctionnalites?|talentlink)\b",
+    "offers": r"\b(offres?|postes?|emplois?|candidatures?|postul\w*|recrutements?|cdi|cdd|stages?|alternances?|salaires?|competences?)\b",
+    "profiles": r"\b(candidats?|profils?|recruteurs?|competences?|cv|experiences?|diplomes?|formations?)\b",
+    "appointments": r"\b(rendez-vous|rdv|entretiens?|creneaux?|disponibilites?|agenda)\b"
+}
+
+# Domaine de chaque type d'entité (filtre "entity_type")
+ENTITY_SHARDS = {
+    ENTITY_TYPES.get(table, table): SHARD_BY_SERVICE[service]
+    for service, config in DB_SOURCES.items()
+    for table in config["tables"]
+}
+
+
+def validate_shards(shards: List[str]) -> List[str]:
+    """Domaines demandés explicitement, dans l'ordre de SHARDS ; ValueError si l'un est inconnu."""
+    unknown = sorted(set(shards) - set(SHARDS))
+    if unknown:
+        raise ValueError(
+            f"Domaine(s) d'index inconnu(s): {', '.join(unknown)} "
+            f"(domaines disponibles: {', '.join(SHARDS)})"
+        )
+    return [name for name in SHARDS if name in shards]
+
+
+def route_shards(
+    question: str,
+    filters: Optional[Dict[str, Any]] = None,
+    shards: Optional[List[str]] = None
+) -> Optional[List[str]]:
+    """
+    Retourne les domaines à interroger, ou None pour interroger tout l'index.
+
+    Par ordre de priorité : les domaines demandés explicitement, ceux des
+    types d'entité filtrés (filtre "entity_type"), puis ceux dont la question
+    évoque les sujets. Seuls les deux premiers restreignent strictement la
+    recherche : les sujets reconnus dans la question ne sont qu'un indice, et
+    la documentation ("docs") est toujours interrogée avec eux (ex. "Comment
+    postuler à une offre ?" trouve aussi le guide du candidat).
+    """
+    if shards:
+        return validate_shards(shards)
+
+    entity_types = (filters or {}).get("entity_type")
+    if entity_types:
+        entity_types = entity_types if isinstance(entity_types, list) else [entity_types]
+        if all(entity_type in ENTITY_SHARDS for entity_type in entity_types):
+            return [name for name in SHARDS if name in {ENTITY_SHARDS[e] for e in entity_types}]
+
+    if not SHARD_ROUTING_ENABLED:
+        return None
+
+    folded = fold_text(question)
+    matched = {name for name, pattern in SHARD_PATTERNS.items() if re.search(pattern, folded)}
+    if not matched:
+        return None
+    matched.add(DEFAULT_SHARD)
+    if len(matched) == len(SHARDS):
+        return None
+    return [name for name in SHARDS if name in matched]
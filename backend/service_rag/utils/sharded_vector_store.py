@@ -0,0 +1,327 @@
+"""
+Vector store partitionné par domaine de données
+Les passages des documents de conception, des offres, des profils et des
+rendez-vous sont rangés dans des sous-stores distincts (un répertoire par
+domaine sous shards/). Une recherche n'interroge que les domaines demandés,
+en parallèle, puis fusionne les résultats par score ; un domaine reconstruit
+est réécrit sans toucher aux fichiers des autres
+"""
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+from utils.mmap_vector_store import (
+    MmapVectorStore,
+    VECTORS_FILE,
+    ROWS_FILE,
+    CENTROIDS_FILE,
+    ORDER_FILE,
+    OFFSETS_FILE,
+    CODES_FILE,
+    SCALES_FILE
+)
+
+
+# CONFIGURATION
+SHARDS_ENABLED = os.getenv("RAG_INDEX_SHARDS", "false").lower() == "true"
+SHARD_QUERY_WORKERS = int(os.getenv("RAG_SHARD_QUERY_WORKERS", "4"))  # Domaines interrogés simultanément
+CONVERSION_CHUNK = 5000  # Vecteurs répartis à la fois lors de la conversion d'un index non partitionné
+
+# Domaines de l'index, et domaine des enregistrements de chaque service
+# (voir DB_SOURCES dans utils/db_sync.py) ; les fichiers de ./data vont dans "docs"
+SHARDS = ["docs", "offers", "profiles", "appointments"]
+SHARD_BY_SERVICE = {
+    "service_offers": "offers",
+    "service_profile": "profiles",
+    "service_appointment": "appointments"
+}
+DEFAULT_SHARD = "docs"
+
+SHARDS_DIR = "shards"
+SHARD_STORE_FILE = "default__vector_store.json"
+
+# Recherches des domaines exécutées en parallèle (NumPy libère le GIL pendant le calcul des scores)
+_query_pool = ThreadPoolExecutor(max_workers=SHARD_QUERY_WORKERS, thread_name_prefix="rag-shard")
+
+
+def shard_for(metadata: Optional[Dict], ref_doc_id: Optional[str]) -> str:
+    """
+    Domaine d'un nœud : celui du service de l'enregistrement (métadonnée
+    "service" ou identifiant "db:<service>:..."), sinon "docs".
+    """
+    service = (metadata or {}).get("service")
+    if service is None and ref_doc_id and ref_doc_id.startswith("db:"):
+        service = ref_doc_id.split(":", 2)[1]
+    return SHARD_BY_SERVICE.get(service, DEFAULT_SHARD)
+
+
+def _store_size(store) -> int:
+    if isinstance(store, MmapVectorStore):
+        return store.get_stats()["vectors"]
+    return len(store.data.embedding_dict)
+
+
+def _iter_store_rows(store):
+    """Parcourt les vecteurs d'un store : (node_id, ref_doc_id, métadonnées, embedding)."""
+    if isinstance(store, MmapVectorStore):
+        yield from store.iter_rows()
+        return
+    data = store.data
+    for node_id, embedding in data.embedding_dict.items():
+        yield node_id, data.text_id_to_ref_doc_id.get(node_id), data.metadata_dict.get(node_id) or {}, embedding
+
+
+def _merge_results(results: List[VectorStoreQueryResult], top_k: int) -> VectorStoreQueryResult:
+    """Fusionne les résultats de plusieurs domaines : les `top_k` meilleurs scores."""
+    if len(results) == 1:
+        return results[0]
+    best = heapq.nlargest(
+        top_k,
+        (
+            (similarity, node_id)
+            for result in results
+            for similarity, node_id in zip(result.similarities or [], result.ids or [])
+        ),
+        key=lambda pair: pair[0]
+    )
+    return VectorStoreQueryResult(
+        nodes=None,
+        similarities=[similarity for similarity, _ in best],
+        ids=[node_id for _, node_id in best]
+    )
+
+
+class ShardedVectorStore(BasePydanticVectorStore):
+    """
+    Un vector store par domaine (SHARDS), du type configuré (`backend` : "simple" ou "mmap").
+
+    Les nœuds sont répartis à l'ajout selon leur domaine (`shard_for`). Une
+    requête accepte `shards=[...]` (transmis par le retriever via
+    `vector_store_kwargs`) ; sans précision, tous les domaines non vides sont
+    interrogés. `persist` n'écrit que les domaines modifiés depuis le
+    chargement : les autres restent tels que copiés de la version active.
+    """
+
+    stores_text: bool = False
+    flat_metadata: bool = True
+    backend: str = "simple"
+
+    _shards: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _dirty: set = PrivateAttr(default_factory=set)
+
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        for name in SHARDS:
+            self._shards[name] = self._new_shard()
+            self._dirty.add(name)
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ShardedVectorStore"
+
+    @classmethod
+    def exists(cls, persist_dir: str) -> bool:
+        return os.path.isdir(os.path.join(persist_dir, SHARDS_DIR))
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, backend: str = "simple") -> "ShardedVectorStore":
+        """
+        Ouvre les domaines persistés d'un index.
+
+        Un domaine au format JSON est converti lorsque le backend "mmap" est
+        configuré ; un domaine absent est créé vide.
+        """
+        store = cls(backend=backend)
+        for name in SHARDS:
+            shard_dir = os.path.join(persist_dir, SHARDS_DIR, name)
+            json_path = os.path.join(shard_dir, SHARD_STORE_FILE)
+            if MmapVectorStore.exists(shard_dir):
+                store._shards[name] = MmapVectorStore.from_persist_dir(shard_dir)
+                store._dirty.discard(name)
+            elif os.path.exists(json_path):
+                simple_store = SimpleVectorStore.from_persist_path(json_path)
+                if backend == "mmap":
+                    store._shards[name] = MmapVectorStore.from_simple_vector_store(simple_store)
+                else:
+                    store._shards[name] = simple_store
+                    store._dirty.discard(name)
+        return store
+
+    @classmethod
+    def from_vector_store(cls, vector_store, backend: str = "simple") -> "ShardedVectorStore":
+        """
+        Répartit par domaine les vecteurs d'un store non partitionné (JSON ou mmap).
+
+        Le store source est ensuite vidé : ses fichiers ne sont plus mappés et
+        `persist` peut les retirer (Windows refuse de supprimer un fichier mappé).
+        """
+        store = cls(backend=backend)
+        nodes_by_shard: Dict[str, List[BaseNode]] = {name: [] for name in SHARDS}
+
+        def flush(name: str):
+            store._shards[name].add(nodes_by_shard[name])
+            nodes_by_shard[name] = []
+
+        for node_id, ref_doc_id, metadata, embedding in _iter_store_rows(vector_store):
+            name = shard_for(metadata, ref_doc_id)
+            relationships = {}
+            if ref_doc_id is not None:
+                relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=ref_doc_id)
+            nodes_by_shard[name].append(TextNode(
+                id_=node_id,
+                text="",
+                metadata=dict(metadata),
+                embedding=[float(value) for value in embedding],
+                relationships=relationships
+            ))
+            if len(nodes_by_shard[name]) >= CONVERSION_CHUNK:
+                flush(name)
+        for name in SHARDS:
+            if nodes_by_shard[name]:
+                flush(name)
+        vector_store.clear()
+        return store
+
+    def _new_shard(self):
+        return MmapVectorStore() if self.backend == "mmap" else SimpleVectorStore()
+
+    def _selected(self, shards: Optional[Iterable[str]]) -> List[str]:
+        """Domaines à interroger (tous par défaut), sans les domaines vides."""
+        names = SHARDS if not shards else [name for name in SHARDS if name in set(shards)]
+        return [name for name in names if _store_size(self._shards[name])]
+
+    def get_shard(self, name: str):
+        return self._shards[name]
+
+    def reset_shard(self, name: str):
+        """Vide un domaine (avant sa reconstruction) ; les autres ne sont pas modifiés."""
+        self._shards[name] = self._new_shard()
+        self._dirty.add(name)
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        nodes_by_shard: Dict[str, List[BaseNode]] = {}
+        for node in nodes:
+            nodes_by_shard.setdefault(shard_for(node.metadata, node.ref_doc_id), []).append(node)
+        for name, shard_nodes in nodes_by_shard.items():
+            self._shards[name].add(shard_nodes, **add_kwargs)
+            self._dirty.add(name)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        name = shard_for(None, ref_doc_id)
+        shard = self._shards[name]
+        size = _store_size(shard)
+        shard.delete(ref_doc_id, **delete_kwargs)
+        if _store_size(shard) != size:
+            self._dirty.add(name)
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None, **delete_kwargs: Any) -> None:
+        for name, shard in self._shards.items():
+            size = _store_size(shard)
+            shard.delete_nodes(node_ids, filters=filters, **delete_kwargs)
+            if _store_size(shard) != size:
+                self._dirty.add(name)
+
+    def clear(self) -> None:
+        for name in SHARDS:
+            self.reset_shard(name)
+
+    def query(self, query: VectorStoreQuery, shards: Optional[List[str]] = None, **kwargs: Any) -> VectorStoreQueryResult:
+        names = self._selected(shards)
+        if not names:
+            return VectorStoreQueryResult(nodes=None, similarities=[], ids=[])
+        if len(names) == 1:
+            return self._shards[names[0]].query(query, **kwargs)
+        results = list(_query_pool.map(lambda name: self._shards[name].query(query, **kwargs), names))
+        return _merge_results(results, query.similarity_top_k)
+
+    def query_batch(
+        self,
+        query_embeddings: List[List[float]],
+        similarity_top_k: int,
+        filters: Optional[MetadataFilters] = None,
+        shards: Optional[List[str]] = None
+    ) -> List[VectorStoreQueryResult]:
+        """
+        Plusieurs requêtes (mêmes top_k, filtres et domaines) : chaque domaine
+        évalue le lot (en un produit matriciel pour un domaine mmap), les
+        domaines en parallèle, puis les résultats sont fusionnés par requête.
+        """
+        names = self._selected(shards)
+        if not query_embeddings or not names:
+            return [VectorStoreQueryResult(nodes=None, similarities=[], ids=[]) for _ in query_embeddings]
+
+        def query_shard(name: str) -> List[VectorStoreQueryResult]:
+            shard = self._shards[name]
+            if isinstance(shard, MmapVectorStore):
+                return shard.query_batch(query_embeddings, similarity_top_k, filters)
+            return [
+                shard.query(VectorStoreQuery(
+                    query_embedding=embedding,
+                    similarity_top_k=similarity_top_k,
+                    filters=filters
+                ))
+                for embedding in query_embeddings
+            ]
+
+        results_by_shard = list(_query_pool.map(query_shard, names))
+        return [
+            _merge_results([results[position] for results in results_by_shard], similarity_top_k)
+            for position in range(len(query_embeddings))
+        ]
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """
+        Écrit les domaines modifiés sous `<répertoire de persist_path>/shards/<domaine>/`.
+
+        Les fichiers d'un vector store non partitionné (index converti) sont
+        retirés du répertoire.
+        """
+        persist_dir = os.path.dirname(persist_path) or "."
+        for name, shard in self._shards.items():
+            shard_dir = os.path.join(persist_dir, SHARDS_DIR, name)
+            shard_path = os.path.join(shard_dir, SHARD_STORE_FILE)
+            if name not in self._dirty and (MmapVectorStore.exists(shard_dir) or os.path.exists(shard_path)):
+                continue
+            os.makedirs(shard_dir, exist_ok=True)
+            if isinstance(shard, MmapVectorStore) and os.path.exists(shard_path):
+                os.remove(shard_path)  # Domaine converti depuis le format JSON
+            shard.persist(shard_path)
+        self._dirty.clear()
+
+        for name in (os.path.basename(persist_path), VECTORS_FILE, ROWS_FILE, CENTROIDS_FILE,
+                     ORDER_FILE, OFFSETS_FILE, CODES_FILE, SCALES_FILE):
+            path = os.path.join(persist_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def get_stats(self) -> Dict:
+        """Retourne le backend et les statistiques de chaque domaine."""
+        shards = {}
+        for name, shard in self._shards.items():
+            if isinstance(shard, MmapVectorStore):
+                shards[name] = shard.get_stats()
+            else:
+                shards[name] = {"backend": "simple", "vectors": _store_size(shard)}
+        return {
+            "backend": "sharded",
+            "shard_backend": self.backend,
+            "query_workers": SHARD_QUERY_WORKERS,
+            "vectors": sum(stats["vectors"] for stats in shards.values()),
+            "shards": shards
+        }
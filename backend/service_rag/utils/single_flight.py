@@ -0,0 +1,47 @@
+"""
+Regroupement des requêtes identiques simultanées (single-flight)
+Quand plusieurs utilisateurs posent la même question au même modèle au même
+moment, un seul calcul (recherche + appel LLM) est lancé ; les autres
+requêtes attendent son résultat au lieu de solliciter le LLM à nouveau
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Un calcul en cours au plus par clé ; les appels suivants avec la même
+    clé partagent son résultat (ou son exception).
+
+    Le calcul s'exécute dans sa propre tâche : si le client qui l'a lancé se
+    déconnecte, les autres continuent d'attendre le même résultat.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            "leaders": 0,
+            "followers": 0
+        }
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Exécute `func()` pour `key`, ou attend le calcul déjà en cours pour cette clé."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["followers"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marque l'exception comme lue si plus personne n'attendait le résultat
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict:
+        return {"in_flight": len(self._inflight), **self._stats}
@@ -0,0 +1,61 @@
+"""
+Comptage de tokens avec le tokenizer du modèle (tiktoken)
+Utilisé pour faire tenir l'historique de conversation dans un budget de tokens
+"""
+import logging
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken est normalement installé avec llama-index
+    tiktoken = None
+
+
+logger = logging.getLogger("service_rag")
+
+DEFAULT_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 4  # Approximation si aucun tokenizer n'est disponible
+
+
+@lru_cache(maxsize=32)
+def get_encoding(model_name: str = ""):
+    """
+    Retourne l'encodage tiktoken du modèle.
+
+    Les modèles inconnus de tiktoken (ex. modèles Ollama) utilisent
+    l'encodage par défaut, qui donne une estimation proche. Retourne None si
+    aucun encodage n'est disponible (tiktoken absent, ou fichiers de
+    vocabulaire non téléchargeables hors ligne).
+    """
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            logger.debug("Tokenizer inconnu pour %s, utilisation de %s", model_name, DEFAULT_ENCODING)
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        print(f"⚠️ Tokenizer indisponible pour {model_name or DEFAULT_ENCODING}, estimation approximative: {e}")
+        return None
+
+
+def count_tokens(text: str, model_name: str = "") -> int:
+    """Nombre de tokens de `text` pour ce modèle."""
+    if not text:
+        return 0
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str = "") -> str:
+    """Tronque `text` à `max_tokens` tokens."""
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
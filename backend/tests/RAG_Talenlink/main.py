@@ -1,5 +1,10 @@
 import os
+import io
+import json
+import hashlib
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import base64
 from pdf2image import convert_from_path
 import chromadb
@@ -9,9 +14,24 @@ from dotenv import load_dotenv
 # Charger les variables d'environnement
 load_dotenv()
 
-# Initialisation du client OpenAI
+# Initialisation du client OpenAI (utilisable depuis plusieurs threads)
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# Analyse des pages avec Vision
+VISION_MODEL = "gpt-4o-mini"
+VISION_DPI = 200
+VISION_WORKERS = int(os.getenv("VISION_WORKERS", "4"))  # Pages analysées en parallèle
+VISION_CACHE_DIR = os.getenv("VISION_CACHE_DIR", "./vision_cache")  # Analyses déjà faites, par image de page
+VISION_PROMPT = (
+    "Analyse cette page de documentation technique et extrais TOUT le contenu:\n"
+    "- Le texte écrit\n"
+    "- Les diagrammes (décris-les en détail: cas d'utilisation, séquence, classes, etc.)\n"
+    "- Les tableaux (reproduis leur structure)\n"
+    "- Les schémas et graphiques (explique ce qu'ils représentent)\n"
+    "- Les relations entre les éléments\n\n"
+    "Sois très détaillé et exhaustif. C'est pour un système RAG."
+)
+
 class TalenlinkRAG:
     def __init__(self, data_dir="./data", persist_dir="./chroma_db"):
         self.data_dir = Path(data_dir)
@@ -28,84 +48,135 @@ class TalenlinkRAG:
         
         print("✅ RAG initialisé\n")
     
-    def encode_image(self, image_path):
-        """Encoder une image en base64 pour l'API OpenAI"""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+    def encode_image(self, image):
+        """Encoder une image (PIL) en PNG base64 pour l'API OpenAI, sans fichier temporaire"""
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        return base64.b64encode(buffer.getvalue()).decode('utf-8')
+    
+    def hash_image(self, image):
+        """Empreinte des pixels d'une page, du modèle et du prompt (clé du cache d'analyse)"""
+        digest = hashlib.sha256()
+        digest.update(f"{VISION_MODEL}|{VISION_PROMPT}|{image.mode}|{image.size}".encode('utf-8'))
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+    
+    def hash_file(self, file_path):
+        """Empreinte SHA-256 du contenu d'un fichier"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def pdf_cache_key(self, pdf_path):
+        """Clé du manifeste d'un PDF : contenu du fichier, résolution, modèle et prompt d'analyse"""
+        digest = hashlib.sha256()
+        digest.update(f"{VISION_MODEL}|{VISION_PROMPT}|{VISION_DPI}|".encode('utf-8'))
+        digest.update(self.hash_file(pdf_path).encode('utf-8'))
+        return f"pdf_{digest.hexdigest()}"
+    
+    def _cache_path(self, key):
+        return Path(VISION_CACHE_DIR) / f"{key}.json"
+    
+    def _read_cache(self, key):
+        path = self._cache_path(key)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    def _write_cache(self, key, data):
+        path = self._cache_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Nom propre au thread : deux pages identiques (vierges, répétées) écrivent la même clé en parallèle
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def analyze_page(self, image, page_num, total):
+        """Analyser une page avec GPT-4 Vision (ou reprendre l'analyse en cache)"""
+        image_hash = self.hash_image(image)
+        cached = self._read_cache(image_hash)
+        if cached is not None:
+            print(f"   ♻️ Page {page_num}/{total} inchangée, analyse reprise du cache")
+            return image_hash, cached['content']
+        
+        print(f"   🔍 Analyse de la page {page_num}/{total} avec GPT-4 Vision...")
+        try:
+            # Utiliser GPT-4 Vision pour extraire TOUT le contenu de la page
+            response = client.chat.completions.create(
+                model=VISION_MODEL,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": VISION_PROMPT
+                            },
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": f"data:image/png;base64,{self.encode_image(image)}"
+                                }
+                            }
+                        ]
+                    }
+                ],
+                max_tokens=4096
+            )
+        except Exception as e:
+            # Page non mise en cache : elle sera réessayée au prochain chargement
+            print(f"   ❌ Erreur analyse page {page_num}: {e}")
+            return image_hash, None
+        
+        page_content = response.choices[0].message.content
+        self._write_cache(image_hash, {'content': page_content})
+        print(f"   ✅ Page {page_num} analysée ({len(page_content)} caractères extraits)")
+        return image_hash, page_content
     
     def extract_text_from_pdf_with_vision(self, pdf_path):
         """Extraire le texte ET analyser les images avec GPT-4 Vision"""
+        # PDF inchangé et toutes ses pages en cache : pas de conversion en images
+        pdf_key = self.pdf_cache_key(pdf_path)
+        manifest = self._read_cache(pdf_key)
+        if manifest is not None:
+            pages = [self._read_cache(page_hash) for page_hash in manifest['pages']]
+            if all(page is not None for page in pages):
+                print(f"   ♻️ PDF inchangé, {len(pages)} pages reprises du cache")
+                return [
+                    {'page': i + 1, 'content': page['content']}
+                    for i, page in enumerate(pages)
+                ]
+        
         print(f"   📄 Conversion du PDF en images...")
         
-        # Convertir le PDF en images (une image par page)
+        # Convertir le PDF en images (une image par page, en mémoire)
         try:
-            images = convert_from_path(pdf_path, dpi=200)
+            images = convert_from_path(pdf_path, dpi=VISION_DPI, thread_count=VISION_WORKERS)
         except Exception as e:
             print(f"   ❌ Erreur conversion PDF: {e}")
             return []
         
-        print(f"   → {len(images)} pages à analyser")
+        print(f"   → {len(images)} pages à analyser ({VISION_WORKERS} en parallèle)")
         
-        all_page_texts = []
+        # Analyser les pages en parallèle (au plus VISION_WORKERS appels simultanés)
+        with ThreadPoolExecutor(max_workers=VISION_WORKERS) as executor:
+            results = list(executor.map(
+                lambda item: self.analyze_page(item[1], item[0] + 1, len(images)),
+                enumerate(images)
+            ))
         
-        for i, image in enumerate(images):
-            print(f"   🔍 Analyse de la page {i+1}/{len(images)} avec GPT-4 Vision...")
-            
-            # Sauvegarder temporairement l'image
-            temp_image_path = f"temp_page_{i}.png"
-            image.save(temp_image_path, 'PNG')
-            
-            # Encoder l'image en base64
-            base64_image = self.encode_image(temp_image_path)
-            
-            try:
-                # Utiliser GPT-4 Vision pour extraire TOUT le contenu de la page
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": (
-                                        "Analyse cette page de documentation technique et extrais TOUT le contenu:\n"
-                                        "- Le texte écrit\n"
-                                        "- Les diagrammes (décris-les en détail: cas d'utilisation, séquence, classes, etc.)\n"
-                                        "- Les tableaux (reproduis leur structure)\n"
-                                        "- Les schémas et graphiques (explique ce qu'ils représentent)\n"
-                                        "- Les relations entre les éléments\n\n"
-                                        "Sois très détaillé et exhaustif. C'est pour un système RAG."
-                                    )
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{base64_image}"
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    max_tokens=4096
-                )
-                
-                page_content = response.choices[0].message.content
-                all_page_texts.append({
-                    'page': i + 1,
-                    'content': page_content
-                })
-                
-                print(f"   ✅ Page {i+1} analysée ({len(page_content)} caractères extraits)")
-                
-            except Exception as e:
-                print(f"   ❌ Erreur analyse page {i+1}: {e}")
-            
-            # Supprimer l'image temporaire
-            try:
-                os.remove(temp_image_path)
-            except:
-                pass
+        all_page_texts = [
+            {'page': i + 1, 'content': content}
+            for i, (_, content) in enumerate(results)
+            if content is not None
+        ]
+        
+        if len(all_page_texts) == len(images):
+            self._write_cache(pdf_key, {'pages': [image_hash for image_hash, _ in results]})
         
         return all_page_texts
     
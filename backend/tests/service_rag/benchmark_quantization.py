@@ -0,0 +1,125 @@
+"""
+Benchmark de la quantification du vector store mmap (RAG_VECTOR_QUANTIZATION)
+Compare les stores int8 et binaire au store float32 actuel sur des embeddings
+synthétiques de la dimension de text-embedding-3-small : mémoire parcourue
+par la recherche, recall@k par rapport au store float32 et latence (p50 / p95).
+
+Usage :
+    cd backend/tests/service_rag
+    python benchmark_quantization.py                      # 10k et 100k vecteurs, dimension 1536
+    python benchmark_quantization.py --sizes 50000 --top-k 10 --rescore-factor 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "service_rag"))
+QUANTIZATIONS = ["none", "int8", "binary"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de la quantification du vector store mmap")
+    parser.add_argument("--sizes", default="10000,100000", help="Nombres de vecteurs, séparés par des virgules")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimension des embeddings (1536 : text-embedding-3-small)")
+    parser.add_argument("--clusters", type=int, default=200, help="Thèmes autour desquels les vecteurs sont regroupés")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--query-noise", type=float, default=2.0, help="Norme du bruit ajouté aux passages pour former les questions")
+    parser.add_argument("--rescore-factor", type=int, default=None, help="RAG_RESCORE_FACTOR (défaut : configuration)")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def synthetic_embeddings(size: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Vecteurs normalisés regroupés en thèmes, comme des passages sur des sujets voisins."""
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size=size)] + 0.8 * rng.normal(size=(size, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_store(vectors: np.ndarray, quantization: str, persist_dir: str):
+    from llama_index.core.schema import TextNode
+    from utils.mmap_vector_store import MmapVectorStore
+
+    store = MmapVectorStore(quantization=quantization)
+    # Par blocs : le store garde des tableaux NumPy, les listes Python sont libérées au fur et à mesure
+    for start in range(0, len(vectors), 5000):
+        store.add([
+            TextNode(id_=f"n{i}", text="", embedding=vectors[i].tolist())
+            for i in range(start, min(start + 5000, len(vectors)))
+        ])
+    store.persist(os.path.join(persist_dir, "default__vector_store.json"))
+    return MmapVectorStore.from_persist_dir(persist_dir)
+
+
+def run_queries(store, queries: np.ndarray, top_k: int):
+    from llama_index.core.vector_stores.types import VectorStoreQuery
+
+    results, durations = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=top_k))
+        durations.append(time.perf_counter() - start)
+        results.append(result.ids)
+    return results, durations
+
+
+def recall_at_k(results, reference) -> float:
+    hits = sum(len(set(ids) & set(expected)) for ids, expected in zip(results, reference))
+    total = sum(len(expected) for expected in reference)
+    return hits / total if total else 1.0
+
+
+def main():
+    args = parse_args()
+    if args.rescore_factor is not None:
+        os.environ["RAG_RESCORE_FACTOR"] = str(args.rescore_factor)
+    sys.path.insert(0, SERVICE_DIR)
+    from utils.mmap_vector_store import RESCORE_FACTOR
+
+    print("=" * 60)
+    print("BENCHMARK DE LA QUANTIFICATION DU VECTOR STORE")
+    print("=" * 60)
+    print(f"dimension={args.dim}  top_k={args.top_k}  rescore_factor={RESCORE_FACTOR}")
+
+    rng = np.random.default_rng(args.seed)
+    workdir = tempfile.mkdtemp(prefix="rag-quantization-")
+    try:
+        for size in [int(size) for size in args.sizes.split(",") if size.strip()]:
+            print(f"\n📚 {size} vecteurs")
+            vectors = synthetic_embeddings(size, args.dim, args.clusters, rng)
+            # Questions voisines de passages existants (paraphrases plus ou moins éloignées)
+            noise = rng.normal(size=(args.queries, args.dim)) * args.query_noise / np.sqrt(args.dim)
+            queries = vectors[rng.integers(0, size, size=args.queries)] + noise
+
+            reference = None
+            for quantization in QUANTIZATIONS:
+                persist_dir = os.path.join(workdir, f"{size}-{quantization}")
+                store = build_store(vectors, quantization, persist_dir)
+                run_queries(store, queries[:5], args.top_k)  # Préchauffage du mmap
+                results, durations = run_queries(store, queries, args.top_k)
+                if reference is None:
+                    reference = results
+                stats = store.get_stats()
+                ms = np.array(durations) * 1000
+                print(
+                    f"   {quantization:<7} mémoire parcourue={stats['scan_bytes'] / 2**20:8.1f} Mo "
+                    f"(économie {stats['memory_saved']:6.1%})  "
+                    f"recall@{args.top_k}={recall_at_k(results, reference):6.3f}  "
+                    f"p50={np.percentile(ms, 50):7.2f} ms  p95={np.percentile(ms, 95):7.2f} ms"
+                )
+                del store
+                shutil.rmtree(persist_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\n✅ Benchmark terminé")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Benchmark de latence du service RAG, sans OpenAI ni Ollama
+Utilise les backends hors ligne (embedding par hachage, LLM "echo") pour
+mesurer le coût propre du service sur des corpus synthétiques :
+chargement de l'index, recherche, construction du prompt, persistance des
+conversations et /rag/chat de bout en bout (p50 / p95 / p99).
+
+Usage :
+    cd backend/tests/service_rag
+    python benchmark_rag.py                          # corpus de 1k, 10k et 100k passages
+    python benchmark_rag.py --sizes 1000 --runs 50
+    python benchmark_rag.py --vector-store mmap --llm-latency-ms 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "service_rag"))
+
+VILLES = ["Paris", "Lyon", "Marseille", "Toulouse", "Nantes", "Lille", "Bordeaux", "Rennes"]
+METIERS = [
+    "développeur python", "data scientist", "chef de projet", "comptable",
+    "commercial", "designer ux", "ingénieur devops", "juriste", "infirmier", "technicien réseau"
+]
+COMPETENCES = [
+    "fastapi", "react", "sql", "docker", "kubernetes", "excel", "négociation",
+    "figma", "linux", "gestion d'équipe", "anglais", "machine learning"
+]
+STATUTS = ["published", "draft", "closed"]
+QUESTIONS = [
+    "Quelles offres de {metier} à {ville} ?",
+    "Je cherche un poste de {metier} avec {competence}",
+    "Y a-t-il des offres publiées à {ville} ?",
+    "Quelles compétences pour un {metier} ?",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de latence du service RAG (backends hors ligne)")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Tailles des corpus (passages), séparées par des virgules")
+    parser.add_argument("--runs", type=int, default=200, help="Mesures par étape (recherche, prompt, persistance)")
+    parser.add_argument("--chat-runs", type=int, default=100, help="Requêtes /rag/chat par corpus")
+    parser.add_argument("--load-runs", type=int, default=3, help="Chargements de l'index par corpus")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--vector-store", choices=["simple", "mmap"], default=os.getenv("RAG_VECTOR_STORE", "simple"))
+    parser.add_argument("--embed-latency-ms", type=float, default=0, help="Latence simulée d'un appel d'embedding")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Latence simulée d'un appel au LLM")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def configure_environment(args, workdir: str):
+    """Configure le service (avant son import) : backends hors ligne, sans cache ni synchronisation."""
+    os.environ["RAG_EMBEDDING_BACKEND"] = "offline"
+    os.environ["RAG_VECTOR_STORE"] = args.vector_store
+    os.environ["RAG_OFFLINE_EMBED_LATENCY_MS"] = str(args.embed_latency_ms)
+    os.environ["RAG_OFFLINE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["RAG_CACHE_ENABLED"] = "false"  # Mesurer le calcul, pas le cache
+    os.environ["RAG_AUTO_FILTERS"] = "false"
+    os.environ["RAG_DB_SYNC_INTERVAL"] = "0"
+    os.environ["RAG_CONVERSATIONS_DB"] = os.path.join(workdir, "conversations", "conversations.db")
+    # Le service utilise des chemins relatifs (./storage, ./data, ./conversations)
+    os.chdir(workdir)
+    sys.path.insert(0, SERVICE_DIR)
+
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def report(stage: str, durations):
+    ms = [d * 1000 for d in durations]
+    print(
+        f"   {stage:<28} n={len(ms):<5} "
+        f"p50={percentile(ms, 50):9.2f} ms  p95={percentile(ms, 95):9.2f} ms  p99={percentile(ms, 99):9.2f} ms"
+    )
+
+
+def measure(func, runs: int):
+    durations = []
+    for i in range(runs):
+        start = time.perf_counter()
+        func(i)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def random_question(rng: random.Random) -> str:
+    return rng.choice(QUESTIONS).format(
+        metier=rng.choice(METIERS),
+        ville=rng.choice(VILLES),
+        competence=rng.choice(COMPETENCES)
+    )
+
+
+def synthetic_nodes(size: int, rng: random.Random, embed_model):
+    """Passages d'offres synthétiques, avec leurs embeddings (calculés par lots)."""
+    from llama_index.core.schema import TextNode
+
+    nodes = []
+    for i in range(size):
+        metier, ville, statut = rng.choice(METIERS), rng.choice(VILLES), rng.choice(STATUTS)
+        competences = ", ".join(rng.sample(COMPETENCES, 3))
+        nodes.append(TextNode(
+            id_=f"offre-{i}",
+            text=(
+                f"Offre {i} : poste de {metier} à {ville}. "
+                f"Compétences recherchées : {competences}. Statut : {statut}."
+            ),
+            metadata={
+                "file_name": "offers",
+                "entity_type": "offre",
+                "entity_id": str(i),
+                "ville": ville,
+                "statut": statut
+            }
+        ))
+    texts = [node.get_content(metadata_mode="embed") for node in nodes]
+    for node, embedding in zip(nodes, embed_model.get_text_embedding_batch(texts)):
+        node.embedding = embedding
+    return nodes
+
+
+def build_index(controller, nodes, persist_dir: str):
+    from llama_index.core import VectorStoreIndex
+
+    index = VectorStoreIndex(
+        nodes,
+        storage_context=controller._new_storage_context(),
+        embed_model=controller.embed_model
+    )
+    index.storage_context.persist(persist_dir=persist_dir)
+
+
+async def benchmark_chat(app, args, rng: random.Random):
+    """/rag/chat de bout en bout : la moitié des tours poursuit une conversation existante."""
+    import httpx
+
+    durations = []
+    conversation_ids = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for _ in range(args.chat_runs):
+            payload = {
+                "question": random_question(rng),
+                "user_id": "benchmark",
+                "top_k": args.top_k,
+                "model_type": "offline",
+                "model_name": "echo"
+            }
+            if conversation_ids and rng.random() < 0.5:
+                payload["conversation_id"] = rng.choice(conversation_ids)
+            start = time.perf_counter()
+            r = await client.post("/rag/chat", json=payload)
+            durations.append(time.perf_counter() - start)
+            if r.status_code != 200:
+                raise RuntimeError(f"/rag/chat a répondu {r.status_code}: {r.text[:200]}")
+            if "conversation_id" not in payload:
+                conversation_ids.append(r.json()["conversation_id"])
+    return durations
+
+
+def run_size(size: int, args, workdir: str):
+    from fastapi import FastAPI
+    from controllers.rag_controller import rag_controller
+    from controllers.conversation_manager import conversation_manager
+    from routes import router
+
+    rng = random.Random(args.seed)
+    print(f"\n📚 Corpus de {size} passages ({args.vector_store})")
+
+    start = time.perf_counter()
+    nodes = synthetic_nodes(size, rng, rag_controller.embed_model)
+    persist_dir = os.path.join(workdir, "storage", f"bench-{size}")
+    build_index(rag_controller, nodes, persist_dir)
+    del nodes
+    print(f"   Index construit en {time.perf_counter() - start:.1f} s")
+
+    # Chargement de l'index persistant
+    durations = measure(
+        lambda _: setattr(rag_controller, "index", rag_controller._load_index(persist_dir, rag_controller.embed_model)),
+        args.load_runs
+    )
+    rag_controller.model_pool.reset_index()
+    report("chargement de l'index", durations)
+
+    # Recherche seule (embedding de la question + recherche vectorielle)
+    retriever = rag_controller.model_pool.get_retriever(rag_controller.index, args.top_k)
+    questions = [random_question(rng) for _ in range(args.runs)]
+    report("recherche", measure(lambda i: retriever.retrieve(questions[i]), args.runs))
+
+    # Persistance d'un message, puis construction du prompt avec l'historique
+    conversation_id = conversation_manager.create_conversation(user_id="benchmark", title="Benchmark")
+    report("persistance d'un message", measure(
+        lambda i: conversation_manager.add_message(
+            conversation_id, "user" if i % 2 == 0 else "assistant", questions[i]
+        ),
+        args.runs
+    ))
+    report("construction du prompt", measure(
+        lambda _: rag_controller._build_conversation_prompt(conversation_id, "offline", "echo"),
+        args.runs
+    ))
+
+    # /rag/chat de bout en bout
+    app = FastAPI()
+    app.include_router(router, prefix="/rag")
+    report("/rag/chat (bout en bout)", asyncio.run(benchmark_chat(app, args, rng)))
+
+    shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+def main():
+    args = parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    workdir = tempfile.mkdtemp(prefix="rag-benchmark-")
+    configure_environment(args, workdir)
+
+    from controllers.rag_controller import rag_controller
+
+    print("=" * 60)
+    print("BENCHMARK DU SERVICE RAG (backends hors ligne)")
+    print("=" * 60)
+    rag_controller.embed_model = rag_controller.get_embedding_model("offline")
+
+    try:
+        for size in sizes:
+            run_size(size, args, workdir)
+    finally:
+        os.chdir(SERVICE_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\n✅ Benchmark terminé")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Tests de la pagination par curseur des conversations d'un utilisateur
+(database/conversation_store.py), pour les backends JSON et SQLite :
+ordre par `updated_at` décroissant, départage des dates identiques par
+identifiant, aucune conversation manquante ni répétée d'une page à l'autre,
+et curseur invalide refusé (ValueError).
+
+Usage :
+    cd backend/tests/service_rag
+    python test_conversation_pagination.py        # ou : python -m pytest test_conversation_pagination.py
+"""
+import base64
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "service_rag"))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+from database.conversation_store import create_conversation_store
+
+BACKENDS = ("json", "sqlite")
+USER_ID = "user_42"
+PAGE_SIZE = 2
+
+# 7 conversations dont plusieurs modifiées au même instant
+UPDATED_AT = {
+    "conv_a": "2026-03-01T10:00:00",
+    "conv_b": "2026-03-02T09:30:00",
+    "conv_c": "2026-03-02T09:30:00",
+    "conv_d": "2026-03-02T09:30:00",
+    "conv_e": "2026-03-03T18:00:00",
+    "conv_f": "2026-03-03T18:00:00",
+    "conv_g": "2026-03-04T08:15:00",
+}
+EXPECTED_ORDER = ["conv_g", "conv_f", "conv_e", "conv_d", "conv_c", "conv_b", "conv_a"]
+
+
+@contextmanager
+def conversation_store(backend: str):
+    """Store vide dans un dossier temporaire, avec les 7 conversations de USER_ID et une d'un autre utilisateur."""
+    storage_dir = tempfile.mkdtemp(prefix="rag_conversations_test_")
+    try:
+        store = create_conversation_store(
+            backend,
+            storage_path=storage_dir,
+            db_path=os.path.join(storage_dir, "conversations.db")
+        )
+        # Insertion dans un ordre quelconque : le tri ne dépend pas de l'ordre de création
+        for conversation_id in ["conv_d", "conv_a", "conv_f", "conv_b", "conv_g", "conv_c", "conv_e"]:
+            store.create_conversation(make_conversation(conversation_id, USER_ID, UPDATED_AT[conversation_id]))
+        store.create_conversation(make_conversation("conv_other", "user_7", "2026-03-05T12:00:00"))
+        yield store
+    finally:
+        shutil.rmtree(storage_dir, ignore_errors=True)
+
+
+def make_conversation(conversation_id: str, user_id: str, updated_at: str) -> dict:
+    return {
+        "conversation_id": conversation_id,
+        "user_id": user_id,
+        "title": f"Conversation {conversation_id}",
+        "created_at": "2026-03-01T08:00:00",
+        "updated_at": updated_at,
+        "messages": [],
+        "is_active": True
+    }
+
+
+def read_all_pages(store, limit: int = PAGE_SIZE):
+    """Parcourt toutes les pages ; retourne la liste des pages (identifiants)."""
+    pages = []
+    cursor = None
+    while True:
+        page = store.page_user_conversations(USER_ID, limit=limit, cursor=cursor)
+        pages.append([summary["conversation_id"] for summary in page["conversations"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+        assert len(pages) <= len(EXPECTED_ORDER), "pagination sans fin"
+
+
+def test_pages_follow_updated_at_with_ties():
+    for backend in BACKENDS:
+        with conversation_store(backend) as store:
+            pages = read_all_pages(store)
+            assert pages == [["conv_g", "conv_f"], ["conv_e", "conv_d"], ["conv_c", "conv_b"], ["conv_a"]], \
+                f"{backend}: {pages}"
+            flat = [conversation_id for page in pages for conversation_id in page]
+            # Ni doublon ni trou, et jamais la conversation d'un autre utilisateur
+            assert flat == EXPECTED_ORDER, f"{backend}: {flat}"
+
+
+def test_single_page_has_no_next_cursor():
+    for backend in BACKENDS:
+        with conversation_store(backend) as store:
+            first = store.page_user_conversations(USER_ID, limit=len(EXPECTED_ORDER))
+            assert [s["conversation_id"] for s in first["conversations"]] == EXPECTED_ORDER, backend
+            assert first["next_cursor"] is None, backend
+
+            unpaged = store.page_user_conversations(USER_ID)
+            assert [s["conversation_id"] for s in unpaged["conversations"]] == EXPECTED_ORDER, backend
+            assert unpaged["next_cursor"] is None, backend
+
+
+def test_pagination_is_stable_across_backends():
+    pages = {}
+    for backend in BACKENDS:
+        with conversation_store(backend) as store:
+            page = store.page_user_conversations(USER_ID, limit=3)
+            # Un curseur émis par un backend est compris par l'autre (même format)
+            pages[backend] = page
+    for backend in BACKENDS:
+        with conversation_store(backend) as store:
+            for source, page in pages.items():
+                following = store.page_user_conversations(USER_ID, limit=3, cursor=page["next_cursor"])
+                assert [s["conversation_id"] for s in following["conversations"]] == EXPECTED_ORDER[3:6], \
+                    f"{backend} avec un curseur {source}"
+
+
+def test_invalid_cursor_raises_value_error():
+    invalid_cursors = [
+        "n'importe quoi",
+        "%%%",
+        base64.urlsafe_b64encode(b"sans-separateur").decode("ascii"),
+        base64.urlsafe_b64encode(b"|conv_a").decode("ascii"),
+        base64.urlsafe_b64encode(b"\xff\xfe").decode("ascii"),
+    ]
+    for backend in BACKENDS:
+        with conversation_store(backend) as store:
+            for cursor in invalid_cursors:
+                try:
+                    store.page_user_conversations(USER_ID, limit=PAGE_SIZE, cursor=cursor)
+                except ValueError:
+                    continue
+                raise AssertionError(f"{backend}: curseur {cursor!r} accepté")
+
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failures = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {name}: {e}")
+    print(f"\n{len(tests) - failures}/{len(tests)} test(s) réussi(s)")
+    sys.exit(1 if failures else 0)
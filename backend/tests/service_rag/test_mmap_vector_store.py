@@ -0,0 +1,290 @@
+"""
+Tests du vector store mmap (utils/mmap_vector_store.py)
+Sur un petit corpus synthétique, les résultats sont comparés à une recherche
+exhaustive en float32 calculée avec NumPy : top-k après ajout, suppression et
+persist / rechargement, index IVF, filtres de métadonnées vectorisés et
+recherche quantifiée (int8, binaire) avec rescoring.
+
+Usage :
+    cd backend/tests/service_rag
+    python test_mmap_vector_store.py        # ou : python -m pytest test_mmap_vector_store.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "service_rag"))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import (
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+)
+
+import utils.mmap_vector_store as mmap_module
+from utils.mmap_vector_store import MmapVectorStore
+
+SIZE = 2000
+DIM = 128
+CLUSTERS = 40
+TOP_K = 5
+QUERIES = 25
+SERVICES = ["service_offers", "service_profile", "service_appointment"]
+
+
+@contextmanager
+def config(**values):
+    """Modifie temporairement la configuration du module (IVF_NPROBE, RESCORE_FACTOR...)."""
+    previous = {name: getattr(mmap_module, name) for name in values}
+    for name, value in values.items():
+        setattr(mmap_module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(mmap_module, name, value)
+
+
+@contextmanager
+def temporary_dir():
+    path = tempfile.mkdtemp(prefix="rag_mmap_test_")
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class Corpus:
+    """Vecteurs regroupés en thèmes, métadonnées et documents sources (3 nœuds par document)."""
+
+    def __init__(self, size: int = SIZE, seed: int = 42):
+        rng = np.random.default_rng(seed)
+        centers = rng.normal(size=(CLUSTERS, DIM))
+        vectors = centers[rng.integers(0, CLUSTERS, size=size)] + 0.7 * rng.normal(size=(size, DIM))
+        self.vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+        self.ids = [f"n{i}" for i in range(size)]
+        self.ref_doc_ids = [f"doc{i // 3}" for i in range(size)]
+        self.metadata = []
+        for i in range(size):
+            metadata = {"service": SERVICES[i % 3], "salaire": int(rng.integers(20, 80)) * 1000}
+            if i % 5:
+                # Un nœud sur cinq n'a pas de statut (clé absente)
+                metadata["statut"] = "published" if i % 2 else "closed"
+            self.metadata.append(metadata)
+        self.alive = np.ones(size, dtype=bool)
+        # Questions proches d'un nœud du corpus (bruit de norme ~0.5)
+        noise = 0.5 / np.sqrt(DIM) * rng.normal(size=(QUERIES, DIM))
+        queries = self.vectors[rng.integers(0, size, size=QUERIES)] + noise
+        self.queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+    def nodes(self, rows):
+        return [
+            TextNode(
+                id_=self.ids[i],
+                text="",
+                embedding=self.vectors[i].tolist(),
+                metadata=self.metadata[i],
+                relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=self.ref_doc_ids[i])}
+            )
+            for i in rows
+        ]
+
+    def delete_ref_doc(self, store, ref_doc_id: str):
+        store.delete(ref_doc_id)
+        self.alive &= np.array([ref != ref_doc_id for ref in self.ref_doc_ids])
+
+    def delete_node(self, store, node_id: str):
+        store.delete_nodes([node_id])
+        self.alive[self.ids.index(node_id)] = False
+
+    def expected(self, query: np.ndarray, predicate=None, top_k: int = TOP_K):
+        """Top-k exhaustif en float32 (ids et scores) parmi les nœuds restants vérifiant `predicate`."""
+        allowed = self.alive.copy()
+        if predicate is not None:
+            allowed &= np.array([predicate(metadata) for metadata in self.metadata])
+        rows = np.flatnonzero(allowed)
+        scores = self.vectors[rows] @ query
+        best = np.argsort(-scores)[:top_k]
+        return [self.ids[rows[i]] for i in best], scores[best]
+
+
+def build_store(corpus: Corpus, quantization: str = "none") -> MmapVectorStore:
+    store = MmapVectorStore(quantization=quantization)
+    store.add(corpus.nodes(range(len(corpus.ids))))
+    return store
+
+
+def persist_and_reload(store: MmapVectorStore, persist_dir: str) -> MmapVectorStore:
+    store.persist(os.path.join(persist_dir, "default__vector_store.json"))
+    return MmapVectorStore.from_persist_dir(persist_dir)
+
+
+def search(store: MmapVectorStore, query: np.ndarray, filters=None, top_k: int = TOP_K):
+    result = store.query(VectorStoreQuery(
+        query_embedding=query.tolist(),
+        similarity_top_k=top_k,
+        filters=filters
+    ))
+    return result.ids, np.array(result.similarities, dtype=np.float32)
+
+
+def assert_matches_brute_force(store: MmapVectorStore, corpus: Corpus, filters=None, predicate=None):
+    for query in corpus.queries:
+        ids, scores = search(store, query, filters)
+        expected_ids, expected_scores = corpus.expected(query, predicate)
+        assert ids == expected_ids, f"top-{TOP_K} différent: {ids} != {expected_ids}"
+        np.testing.assert_allclose(scores, expected_scores, rtol=0, atol=1e-5)
+
+
+def test_top_k_after_insert():
+    corpus = Corpus()
+    store = build_store(corpus)
+    assert_matches_brute_force(store, corpus)
+
+
+def test_top_k_after_delete():
+    corpus = Corpus()
+    store = build_store(corpus)
+    for query in corpus.queries[:10]:
+        # Supprimer les documents des meilleurs résultats actuels
+        corpus.delete_ref_doc(store, corpus.ref_doc_ids[corpus.ids.index(search(store, query)[0][0])])
+    corpus.delete_node(store, search(store, corpus.queries[10])[0][0])
+    assert_matches_brute_force(store, corpus)
+
+
+def test_top_k_after_persist_and_reload():
+    corpus = Corpus()
+    store = build_store(corpus)
+    corpus.delete_ref_doc(store, "doc7")
+    with temporary_dir() as persist_dir:
+        store = persist_and_reload(store, persist_dir)
+        assert store.get_stats()["vectors"] == int(corpus.alive.sum())
+        assert_matches_brute_force(store, corpus)
+
+        # Suppressions dans la matrice persistée, ajouts dans le tampon, puis compaction
+        for query in corpus.queries[:5]:
+            corpus.delete_ref_doc(store, corpus.ref_doc_ids[corpus.ids.index(search(store, query)[0][0])])
+        extra = Corpus(size=SIZE + 30, seed=7)
+        for i in range(SIZE, SIZE + 30):
+            corpus.ids.append(f"extra{i}")
+            corpus.ref_doc_ids.append(f"extra_doc{i}")
+            corpus.metadata.append(extra.metadata[i])
+        corpus.vectors = np.concatenate([corpus.vectors, extra.vectors[SIZE:]])
+        corpus.alive = np.concatenate([corpus.alive, np.ones(30, dtype=bool)])
+        store.add(corpus.nodes(range(SIZE, SIZE + 30)))
+        assert_matches_brute_force(store, corpus)
+
+        store = persist_and_reload(store, persist_dir)
+        assert store.get_stats()["vectors"] == int(corpus.alive.sum())
+        assert_matches_brute_force(store, corpus)
+
+
+def test_ivf_with_every_list_probed_is_exact():
+    corpus = Corpus()
+    with temporary_dir() as persist_dir, config(IVF_MIN_VECTORS=100):
+        store = persist_and_reload(build_store(corpus), persist_dir)
+        assert store._centroids is not None, "l'index IVF n'a pas été entraîné"
+        query = VectorStoreQuery(query_embedding=corpus.queries[0].tolist(), similarity_top_k=TOP_K)
+        with config(IVF_NPROBE=1):
+            assert len(store._candidate_rows(corpus.queries[0], query)) < SIZE
+        with config(IVF_NPROBE=len(store._centroids)):
+            # Toutes les listes sondées : chaque ligne persistée est candidate une seule fois
+            assert sorted(store._candidate_rows(corpus.queries[0], query)) == list(range(SIZE))
+            assert_matches_brute_force(store, corpus)
+            corpus.delete_ref_doc(store, corpus.ref_doc_ids[corpus.ids.index(search(store, corpus.queries[0])[0][0])])
+            assert_matches_brute_force(store, corpus)
+
+            # Requêtes groupées : mêmes résultats que les requêtes une à une
+            batch = store.query_batch([query.tolist() for query in corpus.queries], TOP_K)
+            for query, result in zip(corpus.queries, batch):
+                assert result.ids == search(store, query)[0]
+
+
+def test_metadata_filters():
+    corpus = Corpus()
+    cases = [
+        (
+            MetadataFilters(filters=[MetadataFilter(key="service", value="service_offers")]),
+            lambda m: m["service"] == "service_offers"
+        ),
+        (
+            MetadataFilters(filters=[
+                MetadataFilter(key="statut", value=["published"], operator=FilterOperator.IN),
+                MetadataFilter(key="salaire", value=40000, operator=FilterOperator.GTE)
+            ]),
+            lambda m: m.get("statut") in ["published"] and m["salaire"] >= 40000
+        ),
+        (
+            # NE inclut les nœuds sans la clé (valeur None)
+            MetadataFilters(filters=[
+                MetadataFilter(key="service", value="service_profile"),
+                MetadataFilter(key="statut", value="published", operator=FilterOperator.NE)
+            ], condition=FilterCondition.OR),
+            lambda m: m["service"] == "service_profile" or m.get("statut") != "published"
+        ),
+        (
+            MetadataFilters(filters=[
+                MetadataFilters(filters=[
+                    MetadataFilter(key="service", value="service_appointment"),
+                    MetadataFilter(key="statut", value="closed")
+                ], condition=FilterCondition.OR),
+                MetadataFilter(key="salaire", value=50000, operator=FilterOperator.LT)
+            ]),
+            lambda m: (m["service"] == "service_appointment" or m.get("statut") == "closed") and m["salaire"] < 50000
+        ),
+    ]
+
+    store = build_store(corpus)
+    corpus.delete_ref_doc(store, "doc3")
+    for filters, predicate in cases:
+        assert_matches_brute_force(store, corpus, filters, predicate)
+    with temporary_dir() as persist_dir:
+        store = persist_and_reload(store, persist_dir)
+        for filters, predicate in cases:
+            assert_matches_brute_force(store, corpus, filters, predicate)
+
+
+def test_quantized_search_with_rescoring():
+    # Le binaire (1 bit par dimension) demande une présélection plus large que l'int8
+    for quantization, rescore_factor in (("int8", 8), ("binary", 16)):
+        corpus = Corpus()
+        with temporary_dir() as persist_dir, config(RESCORE_FACTOR=rescore_factor):
+            store = persist_and_reload(build_store(corpus, quantization), persist_dir)
+            assert store.get_stats()["quantization"] == quantization
+            # La présélection ne couvre qu'une partie du corpus : le rescoring est bien exercé
+            assert TOP_K * mmap_module.RESCORE_FACTOR < SIZE
+            assert_matches_brute_force(store, corpus)
+            filters = MetadataFilters(filters=[MetadataFilter(key="service", value="service_offers")])
+            assert_matches_brute_force(store, corpus, filters, lambda m: m["service"] == "service_offers")
+
+        # Sans rescoring, les scores quantifiés seuls ne retrouvent pas toujours l'ordre exact
+        rows = np.arange(SIZE)
+        approximate_orders = [
+            [corpus.ids[i] for i in np.argsort(-store._approximate_scores(rows, query))[:TOP_K]]
+            for query in corpus.queries
+        ]
+        assert any(order != corpus.expected(query)[0] for order, query in zip(approximate_orders, corpus.queries)), \
+            f"{quantization}: corpus trop facile, le rescoring n'est pas vérifié"
+
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failures = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {name}: {e}")
+    print(f"\n{len(tests) - failures}/{len(tests)} test(s) réussi(s)")
+    sys.exit(1 if failures else 0)